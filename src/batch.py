@@ -0,0 +1,320 @@
+#!/usr/bin/env python
+
+"""
+
+Plays whole seasons from the round files under resources without prompting,
+resolving invalid data by a configured error policy rather than asking the
+user to correct it.
+
+"""
+
+import argparse
+import os
+import time
+
+from config import BATCH_ERROR_POLICY, MAX_ROUNDS, RESOURCES
+from hash_table import HashTable
+from journal import find_season
+from loader import compact_circuit, iter_round, load_circuit, round_file
+
+# Stop at the first invalid round.
+FAIL = 'fail'
+
+# Leave the track at the first invalid round, and carry on with the other tracks.
+SKIP = 'skip'
+
+# Withdraw a player from any match with invalid scores, as if they were injured, fill the place of any player who can
+# not play with the player left without a match, and otherwise skip.
+FORFEIT = 'forfeit'
+
+ERROR_POLICIES = (FAIL, SKIP, FORFEIT)
+
+
+class BatchError(Exception):
+    """Raised when a round can not be played from its file as recorded."""
+    pass
+
+
+class Batch:
+    """Plays the rounds of a circuit from their files, without prompting.
+
+    Each round is read and checked in full before any of its matches are
+    applied, so a round is either played entirely or not at all.
+
+    Attributes:
+        circuit: The circuit to play the rounds in.
+        policy: How invalid rounds are handled, one of ERROR_POLICIES.
+        matches: The number of matches played.
+        skipped: The number of tracks left incomplete by an invalid round.
+    """
+
+    def __init__(self, circuit, policy=BATCH_ERROR_POLICY):
+        self.circuit = circuit
+        self.policy = policy
+        self.matches = 0
+        self.skipped = 0
+
+    def run_season(self, season_name, tournament_names=None):
+        """Plays every round of the given tournaments of a season, starting
+        the season if it does not exist yet.
+
+        :param season_name: The name of the season.
+        :param tournament_names: The names of the tournaments to play, or None
+                                 to play every tournament with round files.
+        :return: The season.
+        """
+        if tournament_names is None:
+            tournament_names = self.find_tournaments(season_name)
+
+        for tournament_name in tournament_names:
+            if self.circuit.tournament_types.find(tournament_name) is None:
+                raise BatchError('A tournament by the name %s does not exist' % tournament_name)
+
+        season = find_season(self.circuit, season_name)
+
+        if season is None:
+            current = self.circuit.current_season
+
+            if current is not None and not current.complete:
+                raise BatchError('Season %s must be complete before season %s may start' %
+                                 (current.name, season_name))
+
+            season = self.circuit.create_season(season_name)
+
+        if season.complete:
+            print('Season %s is already complete' % season.name)
+            return season
+
+        for tournament_name in tournament_names:
+            self.run_tournament(season, tournament_name)
+
+        # The season is complete once every tournament type has been played in full.
+        if len(season.tournaments) == len(self.circuit.tournament_types) and \
+                all(tournament.complete for name, tournament in season.tournaments):
+            season.complete_season()
+            print('Season %s has successfully complete!' % season.name)
+
+        return season
+
+    def find_tournaments(self, season_name):
+        """Finds every tournament with round files for a season.
+
+        :param season_name: The name of the season.
+        :return: The tournament names, in order of name.
+        """
+        directory = '%s/%s' % (RESOURCES, season_name)
+
+        if not os.path.isdir(directory):
+            raise BatchError('No round files were found for season %s under %s' % (season_name, directory))
+
+        names = []
+
+        for tournament_name, tournament_type in self.circuit.tournament_types:
+            if os.path.isdir('%s/%s' % (directory, tournament_name.lower())):
+                names.append(tournament_name)
+
+        return sorted(names)
+
+    def run_tournament(self, season, tournament_name):
+        """Plays every remaining round of both tracks of a tournament,
+        starting the tournament if it does not exist yet.
+
+        :param season: The season of the tournament.
+        :param tournament_name: The name of the tournament.
+        """
+        tournament = season.tournaments.find(tournament_name)
+
+        if tournament is None:
+            tournament = season.create_tournament(tournament_name)
+
+        for gender in ('men', 'women'):
+            self.run_track(tournament, tournament.get_track(gender))
+
+    def run_track(self, tournament, track):
+        """Plays every remaining round of a track. An invalid round stops the
+        track, and is raised unless the error policy skips it.
+
+        :param tournament: The tournament of the track.
+        :param track: The track to play.
+        """
+        first_round = track.round
+
+        while track.round <= MAX_ROUNDS:
+            try:
+                self.play_round(tournament, track)
+            except BatchError as error:
+                if self.policy == FAIL:
+                    raise
+
+                print('Skipping %s %s from round %d: %s' % (tournament.type.name, track.name, track.round, error))
+                self.skipped += 1
+                return
+
+        if track.round > first_round:
+            print('Played %s %s rounds %d to %d' % (tournament.type.name, track.name, first_round, track.round - 1))
+
+    def play_round(self, tournament, track):
+        """Plays the current round of a track from its round file.
+
+        :param tournament: The tournament of the track.
+        :param track: The track to play.
+        """
+        filename = round_file(tournament.season.name, tournament.type.name, track.name, track.round)
+
+        if not os.path.isfile(filename):
+            raise BatchError('Round file %s does not exist' % filename)
+
+        results = self.read_round(track, filename)
+        winners = HashTable()
+        winner = None
+
+        for winner, winner_score, loser, loser_score in results:
+            track.remaining.delete(winner.player.name)
+            track.remaining.delete(loser.player.name)
+            winners.insert(winner.player.name, winner)
+            tournament.apply_match(track, winner, winner_score, loser, loser_score)
+
+        tournament.complete_round(track, winners, winner)
+        self.matches += len(results)
+
+    def read_round(self, track, filename):
+        """Reads and checks every match of a round, without applying any.
+
+        :param track: The track of the round.
+        :param filename: The round file.
+        :return: The winner, winner score, loser and loser score of each match.
+        """
+        # Lines which can not be parsed are handled by the error policy like
+        # any other invalid round.
+        try:
+            matches = list(iter_round(filename, track))
+        except ValueError as error:
+            raise BatchError(str(error)) from None
+
+        remaining = track.remaining.clone()
+        vacancies = []  # <(match, whether the first player), for each player who can not play this round>
+
+        # Both players must still be able to play this round.
+        for match in matches:
+            for first, player_name in ((True, match.player_name_a), (False, match.player_name_b)):
+                if remaining.find(player_name) is None:
+                    vacancies.append((match, first))
+                else:
+                    remaining.delete(player_name)
+
+        unmatched = sorted(name for name, stats in remaining)
+
+        if len(vacancies) > 0:
+            match, first = vacancies[0]
+
+            if self.policy != FORFEIT or len(vacancies) != len(unmatched):
+                player_name = match.player_name_a if first else match.player_name_b
+                raise BatchError('%s cannot play this match in %s' % (player_name, filename))
+
+            # Players left without a match take the places of those who can
+            # not play, such as players withdrawn in an earlier round.
+            for (match, first), player_name in zip(vacancies, unmatched):
+                if first:
+                    print('%s cannot play this match, %s takes their place' % (match.player_name_a, player_name))
+                    match.player_name_a = player_name
+                else:
+                    print('%s cannot play this match, %s takes their place' % (match.player_name_b, player_name))
+                    match.player_name_b = player_name
+
+        elif len(unmatched) > 0:
+            raise BatchError('%s have no match in %s' % (', '.join(unmatched), filename))
+
+        results = []
+
+        for match in matches:
+            stats_a = track.remaining.find(match.player_name_a)
+            stats_b = track.remaining.find(match.player_name_b)
+            score_a, score_b = self.check_scores(track, match)
+
+            if score_a > score_b:
+                results.append((stats_a, score_a, stats_b, score_b))
+            else:
+                results.append((stats_b, score_b, stats_a, score_a))
+
+        return results
+
+    def check_scores(self, track, match):
+        """Checks only one player of a match reached the winning score, and
+        neither score is out of bounds. Under the forfeit policy, invalid
+        scores are replaced by the lower scoring player withdrawing, or the
+        first player when tied, as the interactive prompts default to.
+
+        :param track: The track of the match.
+        :param match: The match to check.
+        :return: The scores of the first and second player.
+        """
+        score_a = match.score_a
+        score_b = match.score_b
+        winning_score = track.winning_score
+
+        if score_a < 0 or score_b < 0 or score_a > winning_score or score_b > winning_score:
+            problem = 'Scores must be between 0 and %d' % winning_score
+        elif score_a == winning_score and score_b == winning_score:
+            problem = 'Both players cannot be winners'
+        elif score_a != winning_score and score_b != winning_score:
+            problem = 'Incomplete scores'
+        else:
+            return score_a, score_b
+
+        if self.policy != FORFEIT:
+            raise BatchError('%s for %s with %d, vs %s with %d' %
+                             (problem, match.player_name_a, score_a, match.player_name_b, score_b))
+
+        if score_a <= score_b:
+            withdrawn = match.player_name_a
+        else:
+            withdrawn = match.player_name_b
+
+        print('%s for %s with %d, vs %s with %d. %s has been withdrawn from the tournament' %
+              (problem, match.player_name_a, score_a, match.player_name_b, score_b, withdrawn))
+
+        if withdrawn == match.player_name_a:
+            return track.forfeit_score, track.winning_score
+
+        return track.winning_score, track.forfeit_score
+
+
+def run_batch(args):
+    """Runs the batch mode from the command line, then saves the circuit.
+
+    :param args: The command line arguments following "batch".
+    :return: The exit status, which is 1 if the batch stopped at an error.
+    """
+    parser = argparse.ArgumentParser(prog='main.py batch',
+                                     description='Plays whole seasons from the round files under resources.')
+    parser.add_argument('--season', required=True, help='the season to play, started if it does not exist')
+    tournaments = parser.add_mutually_exclusive_group(required=True)
+    tournaments.add_argument('--tournament', action='append', dest='tournaments', help='a tournament to play')
+    tournaments.add_argument('--all-tournaments', action='store_true',
+                             help='play every tournament with round files for the season')
+    parser.add_argument('--errors', choices=ERROR_POLICIES, default=BATCH_ERROR_POLICY,
+                        help='how rounds with invalid data are handled')
+    options = parser.parse_args(args)
+
+    circuit = load_circuit()
+    batch = Batch(circuit, options.errors)
+    status = 0
+    start = time.perf_counter()
+
+    try:
+        batch.run_season(options.season, options.tournaments)
+    except BatchError as error:
+        print('Batch stopped: %s' % error)
+        status = 1
+
+    elapsed = time.perf_counter() - start
+    rate = batch.matches / elapsed if elapsed > 0 else 0
+    print('Played %d matches in %.3f seconds (%.0f matches per second)' % (batch.matches, elapsed, rate))
+
+    if batch.skipped > 0:
+        print('%d tracks were left incomplete by invalid rounds' % batch.skipped)
+
+    # Every round played is complete, so the circuit is saved even when stopped.
+    compact_circuit(circuit)
+    circuit.journal.close()
+    return status
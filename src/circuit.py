@@ -1,8 +1,11 @@
+from config import SEASON_CACHE_SIZE, get_scoreboard_tree
 from hash_table import HashTable
+from leaderboard import Leaderboard
 from linked_list import List
-from player import SeasonStats, CircuitStats
+from pipe_sort import Sorter
+from player import SeasonStats, CircuitStats, SeasonStatsView
 from ranked_tree import Tree
-from season import Season
+from season import Season, print_combined_page, print_ranked_page
 from user_input import next_string
 
 
@@ -19,6 +22,16 @@ class Circuit:
         tournament_types: All types of tournaments, mapped by name.
         ranking_points: The number of points earned for a given rank, mapped by
                         rank.
+        stats_store: The store keeping the numeric player statistics, or None
+                     if they are kept only in memory.
+        dirty: True when the seasons or player statistics of the circuit have
+               changed since they were last saved.
+        journal: The journal recording every change since the circuit was
+                 last saved, or None if changes are not journalled.
+        season_clock: Counts every use of a season, to find the least recently
+                      used seasons.
+        leaderboards: The wins, losses and win rate leaderboards of the
+                      circuit, mapped by gender, built when first used.
     """
 
     def __init__(self, ordered_seasons=List(), seasons=HashTable(), men=HashTable(), women=HashTable(),
@@ -33,6 +46,11 @@ class Circuit:
         self.ranking_points = ranking_points.clone()
         self.men_scoreboard = men_scoreboard
         self.women_scoreboard = women_scoreboard
+        self.stats_store = None
+        self.dirty = False
+        self.journal = None
+        self.season_clock = 0
+        self.leaderboards = HashTable()  # <gender, leaderboard>
 
     def next_incomplete_season(self):
         """Fetches the next incomplete season for this circuit. Asks the user
@@ -54,18 +72,35 @@ class Circuit:
                 print('A season by that name already exists')
                 continue
 
-            previous_season = self.current_season
-            men_season_stats = self.create_season_stats(season_name, self.men)
-            women_season_stats = self.create_season_stats(season_name, self.women)
-            men_scoreboard = self.create_scoreboard(men_season_stats)
-            women_scoreboard = self.create_scoreboard(women_season_stats)
-            season = Season(self, previous_season, season_name, False, men_season_stats, women_season_stats,
-                            men_scoreboard, women_scoreboard)
-
-            self.current_season = season
-            self.seasons.insert(season_name.lower(), season)
-            self.ordered_seasons.append(season)
-            return self.current_season
+            return self.create_season(season_name)
+
+    def create_season(self, season_name):
+        """Creates a new season following the current season, and records it
+        in the journal.
+
+        :param season_name: The name of the new season.
+        :return: The newly created season, now the current season.
+        """
+        previous_season = self.current_season
+        men_columns = self.open_columns((season_name,), 'men', True)
+        women_columns = self.open_columns((season_name,), 'women', True)
+        men_season_stats = self.create_season_stats(season_name, self.men, men_columns)
+        women_season_stats = self.create_season_stats(season_name, self.women, women_columns)
+        men_scoreboard = self.create_scoreboard(men_season_stats)
+        women_scoreboard = self.create_scoreboard(women_season_stats)
+        season = Season(self, previous_season, season_name, False, men_season_stats, women_season_stats,
+                        men_scoreboard, women_scoreboard)
+        season.dirty = True
+
+        self.current_season = season
+        self.seasons.insert(season_name.lower(), season)
+        self.ordered_seasons.append(season)
+        self.dirty = True
+
+        if self.journal is not None:
+            self.journal.commit(('season', season_name))
+
+        return self.current_season
 
     @staticmethod
     def create_scoreboard(profiles):
@@ -74,31 +109,75 @@ class Circuit:
         :param profiles: The player profiles used add to the new scoreboard.
         :return: The newly created, unordered, scoreboard.
         """
-        scoreboard = Tree(lambda a, b: b - a)
-        for name, stats in profiles:
-            scoreboard.insert(stats.points, stats)
-        return scoreboard
+        pairs = ((stats.points, stats) for name, stats in profiles)
+        return get_scoreboard_tree().bulk_load(pairs, lambda a, b: b - a, lambda points: -points)
 
     @staticmethod
-    def create_season_stats(season_name, profiles):
+    def create_season_stats(season_name, profiles, columns=None):
         """Creates player statistics for a given season, and adds them all into
         the players circuit profiles.
 
         :param season_name: The name of the season to create the statistics for.
         :param profiles: The player circuit profiles to create season
                          statistics for.
+        :param columns: The stats store columns to keep the statistics in, or
+                        None to keep them only in memory.
         :return: The newly created player season statistic mappings.
         """
-        target = HashTable()
+        target = HashTable.with_capacity(len(profiles))
 
         for player_name, player_profile in profiles:
             circuit_stats: CircuitStats = player_profile.stats
-            season_stats = SeasonStats(player_profile, circuit_stats)
+
+            if columns is None:
+                season_stats = SeasonStats(player_profile, circuit_stats)
+            else:
+                season_stats = SeasonStatsView(player_profile, circuit_stats, columns, player_profile.player_id)
+
             circuit_stats.season_stats.insert(season_name, season_stats)
             target.insert(player_name, season_stats)
 
         return target
 
+    def evict_seasons(self, used=None):
+        """Evicts the least recently used seasons from memory, until no more
+        than SEASON_CACHE_SIZE seasons are loaded. The current and previous
+        seasons, and seasons with unsaved changes, are never evicted.
+
+        :param used: The season being used, which is not evicted.
+        """
+        loaded = [season for season in self.ordered_seasons if season.loaded]
+
+        if len(loaded) <= SEASON_CACHE_SIZE:
+            return
+
+        pinned = self.current_season
+        sorter = Sorter(key=lambda season: season.last_used)
+
+        for season in loaded:
+            if season.loader is None or season.dirty or season is used or season is pinned or season is pinned.previous:
+                continue
+            sorter.consume(season)
+
+        for season in sorter.sort()[:len(loaded) - SEASON_CACHE_SIZE]:
+            season.unload()
+
+    def open_columns(self, scope, gender, reset=False):
+        """Opens the stats store columns for the players of a gender within a
+        scope of this circuit.
+
+        :param scope: The path of the scope, such as the season name followed
+                      by the tournament name.
+        :param gender: The gender of the players.
+        :param reset: Whether the scope is new, so its statistics should start
+                      from defaults.
+        :return: The columns, or None if there is no stats store.
+        """
+        if self.stats_store is None:
+            return None
+
+        return self.stats_store.columns(scope, gender, len(self.get_players(gender)), reset)
+
     def get_players(self, gender):
         """Gets the player circuit mappings for a given gender.
 
@@ -110,10 +189,36 @@ class Circuit:
     def get_scoreboard(self, gender):
         return self.men_scoreboard if gender == 'men' else self.women_scoreboard
 
-    def print_scoreboard(self, gender):
+    def get_leaderboard(self, gender):
+        """Gets the wins, losses and win rate leaderboard for a given gender,
+        building it from the circuit stats when first used. It is then kept up
+        to date by every win and loss.
+
+        :param gender: The gender of the players.
+        :return: The leaderboard.
+        """
+        leaderboard = self.leaderboards.find(gender)
+
+        if leaderboard is None:
+            leaderboard = Leaderboard((name, player.stats) for name, player in self.get_players(gender))
+            self.leaderboards.insert(gender, leaderboard)
+
+        return leaderboard
+
+    def print_scoreboard(self, gender, page=None):
         print('Circuit scoreboard for track %s' % gender)
-        rank = 1
-        scoreboard = self.get_scoreboard(gender)
-        for points, stats in scoreboard:
-            print('#%d. %s at %.2f points' % (rank, stats.player.name, stats.points))
-            rank += 1
+        print_ranked_page(self.get_scoreboard(gender), page)
+
+    def print_combined_scoreboard(self, gender, page=None):
+        """Prints the scoreboards of every season as one ranking of season
+        points, merged lazily from the season scoreboards, so each season is
+        only visited up to the requested page.
+
+        :param gender: The gender of the scoreboards.
+        :param page: The page of the ranking to print, or None to print the
+                     entire ranking.
+        """
+        print('Combined scoreboard for track %s across every season' % gender)
+        scoreboards = [(season.name, (stats for points, stats in season.get_scoreboard(gender)))
+                       for season in self.ordered_seasons]
+        print_combined_page(scoreboards, lambda stats: stats.points, page)
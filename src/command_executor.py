@@ -1,9 +1,10 @@
-from config import HELP_MESSAGE
+import time
+
+from config import HELP_MESSAGE, JOURNAL_COMPACT_SIZE, SCOREBOARD_PAGE_SIZE
 from hash_table import HashTable
-from linked_list import List
-from loader import save_circuit
-from pipe_sort import Sorter
-from player import CircuitStats, SeasonStats, TournamentStats, Player
+from loader import compact_circuit
+from rescore import rescore_circuit
+from player import SeasonStats, TournamentStats, Player
 from season import Season
 from tournament import Tournament
 from user_input import next_string
@@ -32,10 +33,13 @@ class CommandExecutor:
         self.commands.insert('start', self.start)
         self.commands.insert('scoreboard', self.scoreboard)
         self.commands.insert('stats', self.stats)
+        self.commands.insert('rescore', self.rescore)
         self.stats_commands = HashTable()
         self.stats_commands.insert('score', self.stats_score)
         self.stats_commands.insert('wins', self.stats_wins)
         self.stats_commands.insert('losses', self.stats_wins)
+        self.stats_commands.insert('rank', self.stats_rank)
+        self.stats_commands.insert('top', self.stats_top)
 
     def run(self):
         """Runs the command executor."""
@@ -74,11 +78,13 @@ class CommandExecutor:
         print(HELP_MESSAGE)
 
     def quit(self, args):
-        """Quits the program.
+        """Quits the program, folding the journal into the CSV files and a
+        snapshot of the circuit for the next session.
 
         :param args: The user arguments.
         """
-        save_circuit(self.circuit)
+        compact_circuit(self.circuit)
+        self.circuit.journal.close()
         self.running = False
 
     def start(self, args):
@@ -96,21 +102,49 @@ class CommandExecutor:
         # Start the tournament.
         season.run(tournament_name)
 
+        # Fold a long journal into the output files, so it is quick to replay.
+        if self.circuit.journal.size > JOURNAL_COMPACT_SIZE:
+            compact_circuit(self.circuit)
+
+    def rescore(self, args):
+        """Recomputes the points of every player from the ranking points and
+        tournament difficulties in resources, then saves the circuit.
+
+        :param args: The user arguments.
+        """
+        start = time.perf_counter()
+        changed = rescore_circuit(self.circuit)
+
+        # Rescoring is not journalled, so save it straight away.
+        compact_circuit(self.circuit)
+        print('Rescored the circuit in %.2f seconds, changing the points of %d tournament players' %
+              (time.perf_counter() - start, changed))
+
     def scoreboard(self, args):
         """Displays a scoreboard for a given season or tournament, depending on
         the arguments the user has supplied.
 
         :param args: The user arguments.
         """
+        # A trailing number selects a single page of the scoreboard.
+        page = None
+
+        if len(args) > 0 and args[-1].isdigit():
+            page = max(1, int(args[-1]))
+            args = args[:-1]
+
+        if len(args) > 0 and args[0] == '--combined':
+            self.combined_scoreboard(args[1:], page)
+            return
+
         if len(args) == 0:
-            self.circuit.print_scoreboard('men')
-            self.circuit.print_scoreboard('women')
+            self.circuit.print_scoreboard('men', page)
+            self.circuit.print_scoreboard('women', page)
             return
 
-        season: Season = self.circuit.seasons.find(args[0])
+        season: Season = self.find_season(args[0])
 
         if season is None:
-            print('No season by the name %s was found' % args[0])
             return
 
         if len(args) > 1:
@@ -121,16 +155,41 @@ class CommandExecutor:
 
             if len(args) > 2:
                 gender = 'men' if args[2] == 'men' else 'women'
-                tournament.print_scoreboard(gender)
+                tournament.print_scoreboard(gender, page)
             else:
                 print('Displaying scoreboards for both men and women tracks')
-                tournament.print_scoreboard('men')
-                tournament.print_scoreboard('women')
+                tournament.print_scoreboard('men', page)
+                tournament.print_scoreboard('women', page)
             return
 
         print('Displaying scoreboards for both men and women tracks')
-        season.print_scoreboard('men')
-        season.print_scoreboard('women')
+        season.print_scoreboard('men', page)
+        season.print_scoreboard('women', page)
+
+    def combined_scoreboard(self, args, page):
+        """Displays the scoreboards of every season combined into one ranking,
+        or of every tournament of a given season.
+
+        :param args: The user arguments following --combined.
+        :param page: The page of the ranking to display, or None for all.
+        """
+        if len(args) == 0:
+            # Every season is looked up, and one which fails to load is left
+            # unloaded. Printing changes nothing, so the session may carry on.
+            try:
+                self.circuit.print_combined_scoreboard('men', page)
+                self.circuit.print_combined_scoreboard('women', page)
+            except (OSError, ValueError) as error:
+                print('A season could not be loaded: %s' % error)
+            return
+
+        season: Season = self.find_season(args[0])
+
+        if season is None:
+            return
+
+        season.print_combined_scoreboard('men', page)
+        season.print_combined_scoreboard('women', page)
 
     def stats(self, args):
         """Displays circuit statistics or executes a statistics sub-command,
@@ -207,6 +266,81 @@ class CommandExecutor:
         print('%s has won %d times and lost %d times with %d percent success' % (
             player.name, stats.wins, stats.losses, percent_success))
 
+    def stats_rank(self, args):
+        """Displays the rank of a player on the circuit scoreboard, or on the
+        scoreboard of a given season.
+
+        :param args: The user arguments.
+        """
+        player: Player = self.get_player(args)
+        if player is None:
+            return
+
+        gender = 'men' if self.circuit.men.find(player.name) is player else 'women'
+
+        if len(args) >= 2:
+            season: Season = self.find_season(args[1])
+            if season is None:
+                return
+            stats = season.get_stats(gender).find(player.name)
+            scoreboard = season.get_scoreboard(gender)
+            scope = 'season %s' % season.name
+        else:
+            stats = player.stats
+            scoreboard = self.circuit.get_scoreboard(gender)
+            scope = 'the circuit'
+
+        rank = scoreboard.rank_of(stats)
+        if rank is None:
+            print('%s is not ranked in %s' % (player.name, scope))
+            return
+
+        dense_rank = scoreboard.rank_of(stats, True)
+        points = scoreboard.key_of(stats)
+        tied = scoreboard.count_between(points, points) - 1
+
+        print('%s is ranked #%d of %d in %s at %.2f points (dense rank #%d, tied with %d others)' % (
+            player.name, rank + 1, len(scoreboard), scope, stats.points, dense_rank + 1, tied))
+
+    def stats_top(self, args):
+        """Displays the players with the most wins, most losses or best win
+        rate in the circuit, or in a given season.
+
+        :param args: The user arguments.
+        """
+        if len(args) == 0 or args[0] not in ('wins', 'losses', 'rate'):
+            print('Expected "wins", "losses" or "rate"')
+            return
+
+        board = args[0]
+        args = args[1:]
+        count = SCOREBOARD_PAGE_SIZE
+
+        if len(args) > 0 and args[0].isdigit():
+            count = max(1, int(args[0]))
+            args = args[1:]
+
+        if len(args) > 0:
+            owner = self.find_season(args[0])
+            if owner is None:
+                return
+            scope = 'season %s' % owner.name
+        else:
+            owner = self.circuit
+            scope = 'the circuit'
+
+        for gender in ('men', 'women'):
+            print('Top %s players by %s in %s:' % (gender, 'win rate' if board == 'rate' else board, scope))
+            rank = 1
+
+            for key, stats in owner.get_leaderboard(gender).top(board, count):
+                if board == 'rate':
+                    print('#%d. %s at %d percent success (%d wins, %d losses)' %
+                          (rank, stats.player.name, int(100 * key), stats.wins, stats.losses))
+                else:
+                    print('#%d. %s with %d %s' % (rank, stats.player.name, key, board))
+                rank += 1
+
     def print_circuit_stats(self, gender: str):
         """Prints all the statistics for a given track.
 
@@ -217,9 +351,9 @@ class CommandExecutor:
             print('No season is currently running')
             return
 
-        player_stats = season.get_stats(gender)
-        win_count, winners = self.get_most_wins(player_stats)
-        loss_count, losers = self.get_most_losses(player_stats)
+        leaderboard = season.get_leaderboard(gender)
+        win_count, winners = leaderboard.most_wins()
+        loss_count, losers = leaderboard.most_losses()
 
         print('%s players with the most wins (%d wins) are as follows:' % (gender.title(), win_count))
 
@@ -231,6 +365,30 @@ class CommandExecutor:
         for player_stats in losers:
             print('- %s' % player_stats.player.name)
 
+    def find_season(self, name):
+        """Finds a season by name, loading it if it is not in memory. A season
+        which fails to load is reported and left unloaded, so the session may
+        carry on.
+
+        :param name: The name of the season.
+        :return: The loaded season, or None if there is no season by that name
+                 or it could not be loaded.
+        """
+        season: Season = self.circuit.seasons.find(name)
+
+        if season is None:
+            print('No season by the name %s was found' % name)
+            return None
+
+        if not season.loaded:
+            try:
+                season.load()
+            except (OSError, ValueError) as error:
+                print('Season %s could not be loaded: %s' % (name, error))
+                return None
+
+        return season
+
     def get_player(self, args):
         """Fetches a player from command arguments.
 
@@ -258,10 +416,11 @@ class CommandExecutor:
         :return: The statistics found for the given player.
         """
         if len(args) >= 1:
-            season: Season = self.circuit.seasons.find(args[0])
+            # Player season statistics are only held while the season is loaded.
+            season: Season = self.find_season(args[0])
             if season is None:
-                print('No season by the name %s found' % args[0])
                 return None
+
             stats: SeasonStats = stats.season_stats.find(season.name)
 
             if len(args) >= 2:
@@ -271,55 +430,3 @@ class CommandExecutor:
                     return None
                 stats: TournamentStats = stats.tournament_stats.find(tournament.type.name)
         return stats
-
-    @staticmethod
-    def get_most_wins(player_stats):
-        """Sorts all player statistics by most wins and returns all the players
-        that achieved the most number of wins, as well as the number of wins
-        they achieved.
-
-        :param player_stats: The player statistics mappings to sort and parse.
-        :return: The amount of wins, and all the top-winning players.
-        """
-        sorter = Sorter(lambda a, b: b.wins - a.wins)
-
-        for name, stats in player_stats:
-            sorter.consume(stats)
-
-        sorted_by_wins = sorter.sort()
-        win_count = sorted_by_wins[0].wins
-        target = List()
-
-        for stats in sorted_by_wins:
-            stats: CircuitStats = stats
-            if stats.wins != win_count:
-                break
-            target.append(stats)
-
-        return win_count, target
-
-    @staticmethod
-    def get_most_losses(player_stats):
-        """Sorts all the player statistics by most losses and returns all the
-        players that achieved the most number of losses, as well as the number
-        of losses in total they achieved.
-
-        :param player_stats: The player statistics mappings to sort and parse.
-        :return: The amount of losses, and all the top-loosing players.
-        """
-        sorter = Sorter(lambda a, b: b.losses - a.losses)
-
-        for name, stats in player_stats:
-            sorter.consume(stats)
-
-        sorted_by_losses = sorter.sort()
-        loss_count = sorted_by_losses[0].losses
-        target = List()
-
-        for stats in sorted_by_losses:
-            stats: CircuitStats = stats
-            if stats.losses != loss_count:
-                break
-            target.append(stats)
-
-        return loss_count, target
@@ -0,0 +1,968 @@
+#!/usr/bin/env python
+
+"""
+
+A compact red-black order statistic tree that supports multiple values per key,
+storing all of its nodes in parallel arrays instead of separate objects.
+
+"""
+
+from array import array
+
+from hash_table import HashTable
+from linked_list import List
+from ranked_tree import BLACK, RED
+
+# The slot and cell used to represent missing nodes and values.
+NIL = 0
+
+
+class CompactTree:
+    """A red-black order statistic tree with the same interface as
+    ranked_tree.Tree, for memory-constrained deployments.
+
+    Each node is an integer slot indexing into parallel arrays, and each value
+    is an integer cell chained into a doubly linked list per node. Slot and
+    cell 0 are sentinels, which are always black and empty. Slots and cells
+    freed by deletions are reused by later insertions.
+
+    Attributes:
+        _root: The slot of the root node of this tree.
+        _size: The number of values currently stored in the tree.
+        _keys: The key of each slot.
+        _colors: The color of each slot. Can be either RED or BLACK.
+        _parents: The parent slot of each slot.
+        _lefts: The left child slot of each slot.
+        _rights: The right child slot of each slot, which also chains together
+                 all free slots.
+        _sizes: The number of values held by each slot and its descendants.
+        _counts: The number of slots in the subtree of each slot.
+        _lengths: The number of values held by each slot.
+        _heads: The first value cell of each slot.
+        _tails: The last value cell of each slot.
+        _items: The value of each cell.
+        _nexts: The next cell of each cell, which also chains together all
+                free cells.
+        _prevs: The previous cell of each cell.
+        _owners: The slot holding each cell.
+        _free_slot: The first free slot, or NIL if there are none.
+        _free_cell: The first free cell, or NIL if there are none.
+        _handles: Maps the identity of each stored value to its cell, so values
+                  may be deleted from crowded slots without scanning.
+    """
+
+    __slots__ = ('_compare', '_root', '_size', '_keys', '_colors', '_parents', '_lefts', '_rights', '_sizes', '_counts',
+                 '_lengths', '_heads', '_tails', '_items', '_nexts', '_prevs', '_owners', '_free_slot', '_free_cell',
+                 '_handles')
+
+    def __init__(self, comparator=lambda a, b: a - b):
+        self._compare = comparator
+        self._root = NIL
+        self._size = 0
+        self._keys = [None]
+        self._colors = array('b', [BLACK])
+        self._parents = array('i', [NIL])
+        self._lefts = array('i', [NIL])
+        self._rights = array('i', [NIL])
+        self._sizes = array('l', [0])
+        self._counts = array('l', [0])
+        self._lengths = array('l', [0])
+        self._heads = array('i', [NIL])
+        self._tails = array('i', [NIL])
+        self._items = [None]
+        self._nexts = array('i', [NIL])
+        self._prevs = array('i', [NIL])
+        self._owners = array('i', [NIL])
+        self._free_slot = NIL
+        self._free_cell = NIL
+        self._handles = HashTable()
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, key):
+        return self.find(key)
+
+    def __delitem__(self, key, value):
+        return self.delete(key, value)
+
+    def __setitem__(self, key, value):
+        return self.insert(key, value)
+
+    def __iter__(self):
+        if self._root == NIL:
+            return
+
+        slot = self.__minimum(self._root)
+
+        while slot != NIL:
+            cell = self._heads[slot]
+            while cell != NIL:
+                yield (self._keys[slot], self._items[cell])
+                cell = self._nexts[cell]
+
+            slot = self.__successor(slot)
+
+    def __str__(self):
+        if self._size == 0:
+            return '[]'
+        target = '['
+        for pair in self:
+            target += str(pair) + ', '
+        target = target[:-2] + ']'
+        return target
+
+    @classmethod
+    def from_sorted(cls, pairs, comparator=lambda a, b: a - b):
+        """Builds a new tree from key and value pairs that are already sorted.
+
+        Slots are allocated in sorted order, then linked bottom-up into a
+        perfectly balanced tree in O(n) time. See ranked_tree.Tree.from_sorted.
+
+        :param pairs: The (key, value) pairs, sorted in comparator order.
+        :param comparator: How two keys should be compared.
+        :return: The newly built tree.
+        """
+        tree = cls(comparator)
+        slot = NIL
+
+        for key, value in pairs:
+            if key is None or value is None:
+                raise ValueError('Keys and values are not allowed to be of type None')
+
+            comparison = 1 if slot == NIL else comparator(key, tree._keys[slot])
+
+            if comparison < 0:
+                raise ValueError('Pairs must be sorted to build a tree from them')
+
+            # Start a new slot for every distinct key.
+            if comparison > 0:
+                slot = tree.__new_slot(key)
+
+            tree.__append_value(slot, value)
+            tree._size += 1
+
+        # Only the deepest level of a balanced tree may be incomplete.
+        slot_count = len(tree._keys) - 1
+        red_depth = slot_count.bit_length() - 1
+        tree._root = tree.__build_balanced(1, slot_count + 1, 0, red_depth)
+        tree._colors[tree._root] = BLACK
+        return tree
+
+    @classmethod
+    def bulk_load(cls, pairs, comparator=lambda a, b: a - b, key=None):
+        """Builds a new tree from unsorted key and value pairs, by sorting them
+        once using pipe sort then building the tree bottom-up.
+
+        :param pairs: The (key, value) pairs, in any order.
+        :param comparator: How two keys should be compared.
+        :param key: Gets a sort key of each tree key, in the same order as the
+                    comparator, so that many pairs may be sorted in parallel.
+        :return: The newly built tree.
+        """
+        from pipe_sort import Sorter, parallel_sort
+
+        if key is not None:
+            return cls.from_sorted(parallel_sort(list(pairs), lambda pair: key(pair[0])), comparator)
+
+        sorter = Sorter(lambda a, b: comparator(a[0], b[0]))
+
+        for pair in pairs:
+            sorter.consume(pair)
+
+        return cls.from_sorted(sorter.sort(), comparator)
+
+    def __build_balanced(self, start, end, depth, red_depth):
+        """Links a range of sorted slots into a balanced subtree.
+
+        :param start: The first slot of the range, inclusive.
+        :param end: The last slot of the range, exclusive.
+        :param depth: The depth of the subtree root within the tree.
+        :param red_depth: The depth at which all slots should be red.
+        :return: The root slot of the subtree, or NIL if the range is empty.
+        """
+        if start >= end:
+            return NIL
+
+        middle = (start + end) // 2
+        left = self.__build_balanced(start, middle, depth + 1, red_depth)
+        right = self.__build_balanced(middle + 1, end, depth + 1, red_depth)
+        self._lefts[middle] = left
+        self._rights[middle] = right
+        self._parents[left] = middle
+        self._parents[right] = middle
+        self._colors[middle] = RED if depth == red_depth else BLACK
+        self.__update(middle)
+        return middle
+
+    def insert(self, key, value):
+        """Inserts a new value into the tree, creating a new node for its key
+        if required. Does not support NoneType keys or values.
+
+        :param key: The key to insert.
+        :param value: The value mapping for this key.
+        :return: True if a new node was created, otherwise False.
+        """
+        if key is None or value is None:
+            raise ValueError('Keys and values are not allowed to be of type None')
+
+        # Locate either the node holding this key or where it should be placed.
+        parent = NIL
+        slot = self._root
+        comparison = 0
+
+        while slot != NIL:
+            comparison = self._compare(key, self._keys[slot])
+            if comparison == 0:
+                break
+            parent = slot
+            slot = self._lefts[slot] if comparison < 0 else self._rights[slot]
+
+        self._size += 1
+
+        # Update node then return if same key already exists.
+        if slot != NIL:
+            self.__append_value(slot, value)
+            while slot != NIL:
+                self._sizes[slot] += 1
+                slot = self._parents[slot]
+            return False
+
+        slot = self.__new_slot(key)
+        self._parents[slot] = parent
+
+        if parent == NIL:
+            self._root = slot
+        elif comparison < 0:
+            self._lefts[parent] = slot
+        else:
+            self._rights[parent] = slot
+
+        self.__append_value(slot, value)
+        self._sizes[slot] = 1
+
+        while parent != NIL:
+            self._sizes[parent] += 1
+            self._counts[parent] += 1
+            parent = self._parents[parent]
+
+        self.__insert_repair(slot)
+        return True
+
+    def __insert_repair(self, slot):
+        """Performs red-black tree insertion repairs.
+
+        :param slot: The newly inserted slot.
+        :return: None
+        """
+        colors = self._colors
+        parents = self._parents
+
+        while colors[parents[slot]] == RED:
+            parent = parents[slot]
+            grandparent = parents[parent]
+
+            if parent == self._lefts[grandparent]:
+                uncle = self._rights[grandparent]
+
+                if colors[uncle] == RED:
+                    colors[parent] = BLACK
+                    colors[uncle] = BLACK
+                    colors[grandparent] = RED
+                    slot = grandparent
+                    continue
+
+                if slot == self._rights[parent]:
+                    slot = parent
+                    self.__rotate_left(slot)
+
+                colors[parents[slot]] = BLACK
+                colors[parents[parents[slot]]] = RED
+                self.__rotate_right(parents[parents[slot]])
+            else:
+                uncle = self._lefts[grandparent]
+
+                if colors[uncle] == RED:
+                    colors[parent] = BLACK
+                    colors[uncle] = BLACK
+                    colors[grandparent] = RED
+                    slot = grandparent
+                    continue
+
+                if slot == self._lefts[parent]:
+                    slot = parent
+                    self.__rotate_right(slot)
+
+                colors[parents[slot]] = BLACK
+                colors[parents[parents[slot]]] = RED
+                self.__rotate_left(parents[parents[slot]])
+
+        colors[self._root] = BLACK
+
+    def find(self, key):
+        """Finds the values for a key stored in the tree.
+
+        :param key: The key to search for.
+        :return: A list of the found node's values if found, otherwise None.
+        """
+        slot = self.__find_slot(key)
+
+        if slot == NIL:
+            return None
+
+        values = List()
+        cell = self._heads[slot]
+        while cell != NIL:
+            values.append(self._items[cell])
+            cell = self._nexts[cell]
+        return values
+
+    def __find_slot(self, key):
+        """Finds the slot mapped by this key in the tree.
+
+        :param key: The key of the slot to find.
+        :return: The mapped slot if found, otherwise NIL.
+        """
+        if key is None:
+            raise ValueError('Keys are not allowed to be of type None')
+
+        slot = self._root
+        while slot != NIL:
+            comparison = self._compare(key, self._keys[slot])
+            if comparison < 0:
+                slot = self._lefts[slot]
+            elif comparison > 0:
+                slot = self._rights[slot]
+            else:
+                return slot
+        return NIL
+
+    def select(self, index):
+        """Finds the value at the specified index, counting every value of
+        every node in order.
+
+        :param index: The position in this tree.
+        :return: The value at the index.
+        """
+        if index < 0 or index >= self._size:
+            raise ValueError('Index out of bounds')
+
+        slot, offset = self.__select_slot(index)
+        cell = self._heads[slot]
+        while offset > 0:
+            cell = self._nexts[cell]
+            offset -= 1
+        return self._items[cell]
+
+    def rank(self, key, dense=False):
+        """Finds the index of the node mapped by the provided key, giving
+        either the competition or dense ranking. See ranked_tree.Tree.rank.
+
+        :param key: The key of the node to fetch the index of.
+        :param dense: Whether to give the dense ranking.
+        :return: The index if this tree contains the key, otherwise None.
+        """
+        slot = self.__find_slot(key)
+
+        if slot == NIL:
+            return None
+
+        return self.__rank_slot(slot, dense)
+
+    def rank_of(self, value, dense=False):
+        """Finds the index of a value stored in this tree, using the value's
+        handle to find its node in O(1) time and its index in O(log n) time.
+
+        :param value: The stored value to fetch the index of.
+        :param dense: Whether to give the dense ranking, see rank.
+        :return: The index if this tree contains the value, otherwise None.
+        """
+        cell = self._handles.find(id(value))
+
+        if cell is None:
+            return None
+
+        return self.__rank_slot(self._owners[cell], dense)
+
+    def key_of(self, value):
+        """Finds the key a value is stored under in O(1) time.
+
+        :param value: The stored value.
+        :return: The key if this tree contains the value, otherwise None.
+        """
+        cell = self._handles.find(id(value))
+        return self._keys[self._owners[cell]] if cell is not None else None
+
+    def __rank_slot(self, slot, dense):
+        """Finds the index of a slot in this tree.
+
+        :param slot: The slot to fetch the index of.
+        :param dense: Whether to count slots instead of values.
+        :return: The index of the slot.
+        """
+        totals = self._counts if dense else self._sizes
+        index = totals[self._lefts[slot]]
+
+        while self._parents[slot] != NIL:
+            parent = self._parents[slot]
+            if self._lefts[parent] != slot:
+                index += totals[self._lefts[parent]]
+                index += 1 if dense else self._lengths[parent]
+            slot = parent
+
+        return index
+
+    def iter_from_rank(self, start):
+        """Lazily iterates over the key and value pairs of this tree, starting
+        from the value at the provided index.
+
+        :param start: The index of the first value to produce.
+        :return: A generator of (key, value) pairs in order.
+        """
+        if start < 0:
+            raise ValueError('Index out of bounds')
+
+        if start >= self._size:
+            return
+
+        slot, offset = self.__select_slot(start)
+        cell = self._heads[slot]
+
+        while offset > 0:
+            cell = self._nexts[cell]
+            offset -= 1
+
+        while slot != NIL:
+            while cell != NIL:
+                yield (self._keys[slot], self._items[cell])
+                cell = self._nexts[cell]
+
+            slot = self.__successor(slot)
+            cell = self._heads[slot]
+
+    def top(self, k):
+        """Lazily iterates over the first k key and value pairs of this tree.
+
+        :param k: The maximum number of pairs to produce.
+        :return: A generator of at most k (key, value) pairs in order.
+        """
+        if k <= 0:
+            return
+
+        for pair in self.iter_from_rank(0):
+            yield pair
+            k -= 1
+            if k == 0:
+                return
+
+    def range(self, min_key, max_key):
+        """Lazily iterates over all key and value pairs with keys from min_key
+        to max_key inclusive, where both bounds follow the comparator order.
+
+        :param min_key: The first key to include.
+        :param max_key: The last key to include.
+        :return: A generator of (key, value) pairs in order.
+        """
+        slot = self.__lower_bound(min_key)
+
+        while slot != NIL and self._compare(self._keys[slot], max_key) <= 0:
+            cell = self._heads[slot]
+            while cell != NIL:
+                yield (self._keys[slot], self._items[cell])
+                cell = self._nexts[cell]
+
+            slot = self.__successor(slot)
+
+    def count_between(self, min_key, max_key):
+        """Counts all values with keys from min_key to max_key inclusive, where
+        both bounds follow the comparator order. Runs in O(log n) time.
+
+        :param min_key: The first key to include.
+        :param max_key: The last key to include.
+        :return: The number of values within the range.
+        """
+        if self._compare(min_key, max_key) > 0:
+            return 0
+
+        return self.__count_before(max_key, True) - self.__count_before(min_key, False)
+
+    def __select_slot(self, index):
+        """Finds the slot holding the value at the specified index.
+
+        :param index: The position in this tree.
+        :return: The slot, and the position of the value within the slot.
+        """
+        slot = self._root
+
+        while slot != NIL:
+            size = self._sizes[self._lefts[slot]]
+
+            if index < size:
+                slot = self._lefts[slot]
+            elif index < size + self._lengths[slot]:
+                return slot, index - size
+            else:
+                index -= size + self._lengths[slot]
+                slot = self._rights[slot]
+
+        return NIL, 0
+
+    def __lower_bound(self, key):
+        """Finds the first slot with a key no smaller than the provided key.
+
+        :param key: The key to search for.
+        :return: The first matching slot if found, otherwise NIL.
+        """
+        if key is None:
+            raise ValueError('Keys are not allowed to be of type None')
+
+        slot = self._root
+        target = NIL
+
+        while slot != NIL:
+            if self._compare(self._keys[slot], key) >= 0:
+                target = slot
+                slot = self._lefts[slot]
+            else:
+                slot = self._rights[slot]
+
+        return target
+
+    def __count_before(self, key, inclusive):
+        """Counts all values with keys before the provided key.
+
+        :param key: The key to count up to.
+        :param inclusive: Whether values under the key itself are counted.
+        :return: The number of values before the key.
+        """
+        if key is None:
+            raise ValueError('Keys are not allowed to be of type None')
+
+        slot = self._root
+        count = 0
+
+        while slot != NIL:
+            comparison = self._compare(key, self._keys[slot])
+
+            if comparison > 0 or (inclusive and comparison == 0):
+                count += self._lengths[slot] + self._sizes[self._lefts[slot]]
+                slot = self._rights[slot]
+            else:
+                slot = self._lefts[slot]
+
+        return count
+
+    def delete(self, key, value):
+        """Deletes a value stored under the provided key, removing the key's
+        node once it holds no values. Automatically fixes any red-black tree
+        violations. NoneType keys are not supported.
+
+        :param key: The key of the node to delete from this tree.
+        :param value: The value of the node to delete from this tree.
+        :return: True if the value previously existed, otherwise False.
+        """
+        if self._root == NIL:
+            return False
+
+        slot = self.__find_slot(key)
+
+        if slot == NIL:
+            return False
+
+        return self.__delete_value(slot, value)
+
+    def __delete_value(self, slot, value):
+        """Deletes a value from a slot, removing the slot from the tree once
+        it no longer holds any values.
+
+        :param slot: The slot holding the value.
+        :param value: The value to delete.
+        :return: True if the slot held the value, otherwise False.
+        """
+        cell = self._handles.find(id(value))
+
+        # Search the slot when the value's handle is not part of it.
+        if cell is None or self._owners[cell] != slot:
+            cell = self._heads[slot]
+            while cell != NIL and self._items[cell] != value:
+                cell = self._nexts[cell]
+
+            if cell == NIL:
+                return False
+
+        self.__remove_cell(slot, cell)
+        self._size -= 1
+
+        if self._lengths[slot] > 0:
+            while slot != NIL:
+                self._sizes[slot] -= 1
+                slot = self._parents[slot]
+            return True
+
+        self.__delete_slot(slot)
+        return True
+
+    def __delete_slot(self, slot):
+        """Unlinks an empty slot from the tree and frees it.
+
+        :param slot: The slot to delete.
+        :return: None
+        """
+        parents = self._parents
+        removed_color = self._colors[slot]
+
+        if self._lefts[slot] == NIL:
+            replacement = self._rights[slot]
+            self.__transplant(slot, replacement)
+        elif self._rights[slot] == NIL:
+            replacement = self._lefts[slot]
+            self.__transplant(slot, replacement)
+        else:
+            # Move the successor into the deleted slot's position.
+            successor = self.__minimum(self._rights[slot])
+            removed_color = self._colors[successor]
+            replacement = self._rights[successor]
+
+            if parents[successor] == slot:
+                parents[replacement] = successor
+            else:
+                self.__transplant(successor, replacement)
+                self._rights[successor] = self._rights[slot]
+                parents[self._rights[successor]] = successor
+
+            self.__transplant(slot, successor)
+            self._lefts[successor] = self._lefts[slot]
+            parents[self._lefts[successor]] = successor
+            self._colors[successor] = self._colors[slot]
+
+        # Recount every slot whose subtree changed.
+        ancestor = parents[replacement]
+        while ancestor != NIL:
+            self.__update(ancestor)
+            ancestor = parents[ancestor]
+
+        if removed_color == BLACK:
+            self.__delete_repair(replacement)
+
+        # Reset the sentinel and release the slot.
+        parents[NIL] = NIL
+        self._keys[slot] = None
+        self._rights[slot] = self._free_slot
+        self._free_slot = slot
+
+    def __delete_repair(self, slot):
+        """Performs red-black tree deletion repairs.
+
+        :param slot: The slot which replaced the deleted slot, may be NIL.
+        :return: None
+        """
+        colors = self._colors
+        parents = self._parents
+
+        while slot != self._root and colors[slot] == BLACK:
+            parent = parents[slot]
+
+            if slot == self._lefts[parent]:
+                sibling = self._rights[parent]
+
+                if colors[sibling] == RED:
+                    colors[sibling] = BLACK
+                    colors[parent] = RED
+                    self.__rotate_left(parent)
+                    sibling = self._rights[parents[slot]]
+
+                if colors[self._lefts[sibling]] == BLACK and colors[self._rights[sibling]] == BLACK:
+                    colors[sibling] = RED
+                    slot = parents[slot]
+                    continue
+
+                if colors[self._rights[sibling]] == BLACK:
+                    colors[self._lefts[sibling]] = BLACK
+                    colors[sibling] = RED
+                    self.__rotate_right(sibling)
+                    sibling = self._rights[parents[slot]]
+
+                colors[sibling] = colors[parents[slot]]
+                colors[parents[slot]] = BLACK
+                colors[self._rights[sibling]] = BLACK
+                self.__rotate_left(parents[slot])
+            else:
+                sibling = self._lefts[parent]
+
+                if colors[sibling] == RED:
+                    colors[sibling] = BLACK
+                    colors[parent] = RED
+                    self.__rotate_right(parent)
+                    sibling = self._lefts[parents[slot]]
+
+                if colors[self._lefts[sibling]] == BLACK and colors[self._rights[sibling]] == BLACK:
+                    colors[sibling] = RED
+                    slot = parents[slot]
+                    continue
+
+                if colors[self._lefts[sibling]] == BLACK:
+                    colors[self._rights[sibling]] = BLACK
+                    colors[sibling] = RED
+                    self.__rotate_left(sibling)
+                    sibling = self._lefts[parents[slot]]
+
+                colors[sibling] = colors[parents[slot]]
+                colors[parents[slot]] = BLACK
+                colors[self._lefts[sibling]] = BLACK
+                self.__rotate_right(parents[slot])
+
+            slot = self._root
+
+        colors[slot] = BLACK
+
+    def update_key(self, old_key, new_key, value):
+        """Moves a value from one key to another, re-keying its node in place
+        when the tree order allows it. See ranked_tree.Tree.update_key.
+
+        :param old_key: The key the value is currently stored under.
+        :param new_key: The key to move the value to.
+        :param value: The value to move.
+        :return: True if the value was found and moved, otherwise False.
+        """
+        if new_key is None:
+            raise ValueError('Keys are not allowed to be of type None')
+
+        slot = self.__find_slot(old_key)
+
+        if slot == NIL:
+            return False
+
+        if self._compare(new_key, self._keys[slot]) == 0:
+            cell = self._heads[slot]
+            while cell != NIL and self._items[cell] != value:
+                cell = self._nexts[cell]
+            return cell != NIL
+
+        if self._lengths[slot] == 1 and self._items[self._heads[slot]] == value:
+            predecessor = self.__predecessor(slot)
+            successor = self.__successor(slot)
+
+            if (predecessor == NIL or self._compare(new_key, self._keys[predecessor]) > 0) and \
+                    (successor == NIL or self._compare(new_key, self._keys[successor]) < 0):
+                self._keys[slot] = new_key
+                return True
+
+        if not self.__delete_value(slot, value):
+            return False
+
+        self.insert(new_key, value)
+        return True
+
+    def __new_slot(self, key):
+        """Allocates a new red slot for a key, reusing a free slot if any.
+
+        :param key: The key of the new slot.
+        :return: The new slot.
+        """
+        slot = self._free_slot
+
+        if slot != NIL:
+            self._free_slot = self._rights[slot]
+            self._keys[slot] = key
+            self._colors[slot] = RED
+            self._parents[slot] = NIL
+            self._lefts[slot] = NIL
+            self._rights[slot] = NIL
+            self._sizes[slot] = 0
+            self._counts[slot] = 1
+            self._lengths[slot] = 0
+            self._heads[slot] = NIL
+            self._tails[slot] = NIL
+            return slot
+
+        self._keys.append(key)
+        self._colors.append(RED)
+        self._parents.append(NIL)
+        self._lefts.append(NIL)
+        self._rights.append(NIL)
+        self._sizes.append(0)
+        self._counts.append(1)
+        self._lengths.append(0)
+        self._heads.append(NIL)
+        self._tails.append(NIL)
+        return len(self._keys) - 1
+
+    def __append_value(self, slot, value):
+        """Appends a value to the end of a slot's values. Does not update the
+        subtree sizes.
+
+        :param slot: The slot to append to.
+        :param value: The value to append.
+        :return: None
+        """
+        cell = self._free_cell
+
+        if cell != NIL:
+            self._free_cell = self._nexts[cell]
+            self._items[cell] = value
+            self._nexts[cell] = NIL
+            self._prevs[cell] = self._tails[slot]
+            self._owners[cell] = slot
+        else:
+            cell = len(self._items)
+            self._items.append(value)
+            self._nexts.append(NIL)
+            self._prevs.append(self._tails[slot])
+            self._owners.append(slot)
+
+        if self._tails[slot] != NIL:
+            self._nexts[self._tails[slot]] = cell
+        else:
+            self._heads[slot] = cell
+
+        self._tails[slot] = cell
+        self._lengths[slot] += 1
+
+        if self._handles.find(id(value)) is None:
+            self._handles.insert(id(value), cell)
+
+    def __remove_cell(self, slot, cell):
+        """Unlinks a cell from a slot's values and frees it. Does not update
+        the subtree sizes.
+
+        :param slot: The slot holding the cell.
+        :param cell: The cell to remove.
+        :return: None
+        """
+        previous = self._prevs[cell]
+        following = self._nexts[cell]
+
+        if previous != NIL:
+            self._nexts[previous] = following
+        else:
+            self._heads[slot] = following
+
+        if following != NIL:
+            self._prevs[following] = previous
+        else:
+            self._tails[slot] = previous
+
+        self._lengths[slot] -= 1
+
+        if self._handles.find(id(self._items[cell])) == cell:
+            self._handles.delete(id(self._items[cell]))
+
+        self._items[cell] = None
+        self._nexts[cell] = self._free_cell
+        self._free_cell = cell
+
+    def __update(self, slot):
+        """Recalculates the size and count of a slot from its children.
+
+        :param slot: The slot to update.
+        :return: None
+        """
+        left = self._lefts[slot]
+        right = self._rights[slot]
+        self._sizes[slot] = self._lengths[slot] + self._sizes[left] + self._sizes[right]
+        self._counts[slot] = 1 + self._counts[left] + self._counts[right]
+
+    def __transplant(self, slot, replacement):
+        """Replaces the subtree rooted at a slot with another subtree.
+
+        :param slot: The slot to replace.
+        :param replacement: The replacement slot, may be NIL.
+        :return: None
+        """
+        parent = self._parents[slot]
+
+        if parent == NIL:
+            self._root = replacement
+        elif slot == self._lefts[parent]:
+            self._lefts[parent] = replacement
+        else:
+            self._rights[parent] = replacement
+
+        self._parents[replacement] = parent
+
+    def __rotate_left(self, root):
+        """Performs a left rotation, making the root's right child (pivot) the
+        new root of the subtree.
+
+        :param root: The root slot to rotate left.
+        :return: None
+        """
+        pivot = self._rights[root]
+        self._rights[root] = self._lefts[pivot]
+
+        if self._lefts[pivot] != NIL:
+            self._parents[self._lefts[pivot]] = root
+
+        self.__transplant(root, pivot)
+        self._lefts[pivot] = root
+        self._parents[root] = pivot
+        self._sizes[pivot] = self._sizes[root]
+        self._counts[pivot] = self._counts[root]
+        self.__update(root)
+
+    def __rotate_right(self, root):
+        """Performs a right rotation, making the root's left child (pivot) the
+        new root of the subtree.
+
+        :param root: The root slot to rotate right.
+        :return: None
+        """
+        pivot = self._lefts[root]
+        self._lefts[root] = self._rights[pivot]
+
+        if self._rights[pivot] != NIL:
+            self._parents[self._rights[pivot]] = root
+
+        self.__transplant(root, pivot)
+        self._rights[pivot] = root
+        self._parents[root] = pivot
+        self._sizes[pivot] = self._sizes[root]
+        self._counts[pivot] = self._counts[root]
+        self.__update(root)
+
+    def __minimum(self, slot):
+        """Finds the first slot in order within a subtree.
+
+        :param slot: The root slot of the subtree.
+        :return: The first slot.
+        """
+        while self._lefts[slot] != NIL:
+            slot = self._lefts[slot]
+        return slot
+
+    def __successor(self, slot):
+        """Finds the next slot in order after the provided slot.
+
+        :param slot: The slot to start from.
+        :return: The in-order successor if found, otherwise NIL.
+        """
+        if self._rights[slot] != NIL:
+            return self.__minimum(self._rights[slot])
+
+        parent = self._parents[slot]
+
+        while parent != NIL and slot == self._rights[parent]:
+            slot = parent
+            parent = self._parents[parent]
+
+        return parent
+
+    def __predecessor(self, slot):
+        """Finds the previous slot in order before the provided slot.
+
+        :param slot: The slot to start from.
+        :return: The in-order predecessor if found, otherwise NIL.
+        """
+        if self._lefts[slot] != NIL:
+            slot = self._lefts[slot]
+            while self._rights[slot] != NIL:
+                slot = self._rights[slot]
+            return slot
+
+        parent = self._parents[slot]
+
+        while parent != NIL and slot == self._lefts[parent]:
+            slot = parent
+            parent = self._parents[parent]
+
+        return parent
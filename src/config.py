@@ -12,6 +12,42 @@ WOMEN_FORFEIT_SCORE = 1
 
 TOURNAMENT_COUNT = 4
 
+SCOREBOARD_PAGE_SIZE = 20
+
+# Use 'compact' to store scoreboards in array-backed trees, which use far less memory.
+SCOREBOARD_TREE = 'ranked'
+
+# Use 'character' to parse every CSV line loaded one character at a time, as the loader originally did, rather than by
+# splitting it with built-in string methods.
+CSV_PARSER = 'split'
+
+# Keep player statistics in memory-mapped columns under STATS_STORE_DIRECTORY, paged in as they are used.
+STATS_STORE = False
+
+# The most seasons kept in memory, with older seasons loaded when used and evicted when least recently used.
+SEASON_CACHE_SIZE = 4
+
+# The number of worker processes parsing season files in parallel when loading several seasons at once.
+LOADER_WORKERS = 1
+
+# How batch mode handles a round with invalid data: 'fail' stops the batch, 'skip' leaves the track at that round,
+# and 'forfeit' withdraws a player from any match with invalid scores and gives the place of a player who can not play
+# to the player left without a match, skipping the round on any other error.
+BATCH_ERROR_POLICY = 'fail'
+
+# Fold the journal into the output files once it grows beyond this many bytes.
+JOURNAL_COMPACT_SIZE = 1 << 20
+
+# The most elements an external sort holds in memory, with each full run spilled to a temporary file.
+SORT_MEMORY_BUDGET = 1 << 20
+
+# The number of worker processes sorting large rankings, such as scoreboards built in bulk, in parallel.
+SORT_WORKERS = 1
+
+# The fewest items sorted by worker processes when SORT_WORKERS is above 1, as starting the workers costs far more
+# than sorting fewer items here.
+PARALLEL_SORT_THRESHOLD = 1 << 18
+
 HELP_MESSAGE = """
 === TENNIS HELP ===
 
@@ -24,8 +60,15 @@ Quits the program.
 > start <tournament>
 Starts the next tournament.
 
-> scoreboard <season> [tournament]
-Shows the scoreboard for the given season or tournament.
+> rescore
+Recomputes every player's points after ranking_points.csv or tournaments.csv change.
+
+> scoreboard [season] [tournament] [page]
+Shows the scoreboard for the circuit, or the given season or tournament.
+Shows only the given page of the scoreboard when a page number is given.
+
+> scoreboard --combined [season] [page]
+Shows every season's scoreboard as one ranking, or every tournament of the given season ranked by round reached.
 
 > stats
 Shows the player with most wins and player with most losses.
@@ -39,6 +82,12 @@ Gets total number of times a player won in a tournament, season, or overall.
 > stats losses <player> [season] [tournament]
 Gets total number of times a player lost in a tournament, season, or overall.
 
+> stats rank <player> [season]
+Gets the rank of a player in a season, or overall.
+
+> stats top <wins|losses|rate> [count] [season]
+Shows the players with the most wins, most losses or best win rate in a season, or overall.
+
 ===================
 """
 
@@ -48,6 +97,9 @@ TOURNAMENTS_FILE = '%s/tournaments.csv' % RESOURCES
 MEN_FILE = '%s/stats.csv' % RESOURCES
 WOMEN_FILE = '%s/women.csv' % RESOURCES
 RANKING_POINTS_FILE = '%s/ranking_points.csv' % RESOURCES
+SNAPSHOT_FILE = '%s/circuit.snapshot' % OUTPUT
+STATS_STORE_DIRECTORY = '%s/stats' % OUTPUT
+JOURNAL_FILE = '%s/circuit.journal' % OUTPUT
 
 if MAX_ROUNDS % 1 != 0:
     raise ValueError('Maximum players must be a power of two')
@@ -99,3 +151,31 @@ def get_multiplier(gender, loser_score):
     elif loser_score == 0:
         return 2.5
     return 1.0
+
+
+def get_scoreboard_tree():
+    """Gets the tree implementation used for player scoreboards.
+
+    :return: The CompactTree class if compact scoreboards are configured, otherwise the Tree class.
+    """
+    if SCOREBOARD_TREE == 'compact':
+        from compact_tree import CompactTree
+        return CompactTree
+
+    from ranked_tree import Tree
+    return Tree
+
+
+def get_csv_parser():
+    """Gets the parser used for every CSV line loaded. Looked up each time a
+    file is read, so a changed setting applies to the next file read, in this
+    process or in any worker process started after it.
+
+    :return: The parse_csv_line_by_character function if character parsing is configured, otherwise parse_csv_line.
+    """
+    if CSV_PARSER == 'character':
+        from loader import parse_csv_line_by_character
+        return parse_csv_line_by_character
+
+    from loader import parse_csv_line
+    return parse_csv_line
@@ -1,13 +1,26 @@
 import cProfile
 import io
 import pstats
+import os
 import random
+import shutil
 import sys
+import tempfile
+import time
+import tracemalloc
 
+from functools import cmp_to_key
+
+from compact_tree import CompactTree
+from config import MAX_ROUNDS
 from hash_table import HashTable
 from linked_list import List
-from pipe_sort import Sorter
+from loader import parse_csv_line, parse_csv_line_by_character
+from player import CircuitStats
+from pipe_sort import ExternalSorter, MIN_RUN, Sorter, numeric_keys, parallel_sort, shared_argsort
+from points import array_points, player_points
 from ranked_tree import Tree
+from stats_store import StatsColumns
 
 
 def profile(func):
@@ -181,11 +194,535 @@ def list_vs_tree_vs_hash():
     prompt_next()
 
 
+@profile
+def tree_scoreboard(pairs):
+    return scoreboard_workload(Tree, pairs)
+
+
+@profile
+def compact_scoreboard(pairs):
+    return scoreboard_workload(CompactTree, pairs)
+
+
+def scoreboard_workload(tree_type, pairs):
+    scoreboard = tree_type.bulk_load(pairs, lambda a, b: b - a)
+    for i in range(0, len(pairs), 3):
+        points, value = pairs[i]
+        scoreboard.update_key(points, points + 25, value)
+    for i in range(0, len(scoreboard), 50):
+        scoreboard.select(i)
+    for pair in scoreboard:
+        pass
+    return scoreboard
+
+
+def scoreboard_memory(tree_type, pairs):
+    tracemalloc.start()
+    scoreboard = tree_type.bulk_load(pairs, lambda a, b: b - a)
+    used, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return scoreboard, used
+
+
+def tree_vs_compact():
+    print('-' * 120)
+    print('Pitting object trees against array-backed compact trees for building and updating scoreboards.')
+    print('Compact trees are expected to use far less memory, at a similar speed.')
+    print('Set SCOREBOARD_TREE in the config to choose which tree scoreboards use.')
+    print('Trees = One node object, value list and list node per player')
+    print('Compact Trees = One slot in each of a few flat arrays per player')
+    print('-' * 120)
+    pairs = []
+    for i in range(0, 50000):
+        pairs.append((random.randint(0, 5000), object()))
+    tree_scoreboard(pairs)
+    compact_scoreboard(pairs)
+    for tree_type in (Tree, CompactTree):
+        scoreboard, used = scoreboard_memory(tree_type, pairs)
+        print('%s memory for %d players: %.2f MiB' % (tree_type.__name__, len(scoreboard), used / 1024 / 1024))
+    prompt_next()
+
+
+def time_parser(parser, lines):
+    start = time.perf_counter()
+    for line in lines:
+        parser(line)
+    return time.perf_counter() - start
+
+
+def character_vs_split_parsing():
+    print('-' * 120)
+    print('Pitting character by character CSV parsing against split based parsing on a round file.')
+    print('Split based parsing is expected to be around 10 times faster on this round file format, though on some')
+    print('machines it falls just short, at about 9.8 times.')
+    print('All files are loaded using split based parsing for this reason, unless CSV_PARSER is set to \'character\'.')
+    print('Character = One Python loop iteration and string concatenation per character')
+    print('Split = One built-in split per line, falling back to splitting on quotes when quoted')
+    print('-' * 120)
+    lines = []
+    for i in range(0, 1000000):
+        lines.append('MP%02d,%d,MP%02d,%d,,,MP%02d\r\n' % (random.randint(1, 32), random.randint(0, 3),
+                                                         random.randint(1, 32), random.randint(0, 3),
+                                                         random.randint(1, 32)))
+    character_time = time_parser(parse_csv_line_by_character, lines)
+    split_time = time_parser(parse_csv_line, lines)
+    print('Character parsing: %.2f seconds for %d lines' % (character_time, len(lines)))
+    print('Split parsing: %.2f seconds for %d lines' % (split_time, len(lines)))
+    print('Split parsing is %.1f times faster' % (character_time / split_time))
+    prompt_next()
+
+
+def parse_stats(lines):
+    start = time.perf_counter()
+    points = 0.0
+    for line in lines:
+        csv = parse_csv_line(line)
+        points += float(csv[1]) + int(csv[2]) + int(csv[3])
+    return time.perf_counter() - start
+
+
+def map_stats(filename, rows, samples):
+    start = time.perf_counter()
+    columns = StatsColumns(filename, rows)
+    points = 0.0
+    for row in samples:
+        points += columns.points[row] + columns.wins[row] + columns.losses[row]
+    columns.close()
+    return time.perf_counter() - start
+
+
+def csv_vs_mapped_stats():
+    print('-' * 120)
+    print('Pitting parsing season statistics from CSV against opening them from memory-mapped columns.')
+    print('Mapped columns are expected to open in constant time, reading only the rows that are used.')
+    print('CSV = Every line parsed and converted before any statistic may be read')
+    print('Mapped = Columns mapped from file, with 1000 random rows read')
+    print('-' * 120)
+    rows = 1000000
+    lines = []
+    for i in range(0, rows):
+        lines.append('MP%07d,%d.00,%d,%d,""\n' % (i, random.randint(0, 5000), random.randint(0, 50),
+                                                  random.randint(0, 50)))
+    directory = tempfile.mkdtemp()
+    filename = os.path.join(directory, 'men.columns')
+    columns = StatsColumns(filename, rows)
+    columns.save()
+    columns.close()
+    samples = [random.randrange(0, rows) for i in range(0, 1000)]
+    csv_time = parse_stats(lines)
+    mapped_time = map_stats(filename, rows, samples)
+    shutil.rmtree(directory)
+    print('CSV: %.4f seconds for %d players' % (csv_time, rows))
+    print('Mapped: %.4f seconds for %d players' % (mapped_time, rows))
+    print('Mapped columns are %.1f times faster' % (csv_time / mapped_time))
+    prompt_next()
+
+
+def score_players(rounds, opponent_scores, ranking_points, difficulties):
+    start = time.perf_counter()
+    for track_round, scores, difficulty in zip(rounds, opponent_scores, difficulties):
+        player_points('men', track_round, scores, ranking_points, difficulty)
+    return time.perf_counter() - start
+
+
+def score_arrays(rounds, opponent_scores, ranking_points, difficulties):
+    start = time.perf_counter()
+    array_points('men', rounds, opponent_scores, ranking_points, difficulties)
+    return time.perf_counter() - start
+
+
+def player_vs_array_points():
+    print('-' * 120)
+    print('Pitting scoring one player at a time against scoring every player at once with NumPy arrays.')
+    print('Arrays are expected to be at least twice as fast, and are used to score each round when NumPy is installed.')
+    print('Player = One Python loop iteration and multiplier lookup per round won, per player')
+    print('Arrays = One row per player and one column per round, scored with whole array operations')
+    print('-' * 120)
+    try:
+        import numpy
+    except ImportError:
+        print('NumPy is not installed, skipping this evaluation.')
+        prompt_next()
+        return
+    rounds = []
+    opponent_scores = []
+    difficulties = []
+    for i in range(0, 1000000):
+        track_round = random.randint(1, MAX_ROUNDS + 1)
+        rounds.append(track_round)
+        opponent_scores.append([random.randint(0, 2) for j in range(0, track_round - 1)])
+        difficulties.append(random.choice((None, 2.7)))
+    ranking_points = [100, 50, 30, 10, 5]
+    player_time = score_players(rounds, opponent_scores, ranking_points, difficulties)
+    array_time = score_arrays(rounds, opponent_scores, ranking_points, difficulties)
+    print('Player: %.2f seconds for %d players' % (player_time, len(rounds)))
+    print('Arrays: %.2f seconds for %d players' % (array_time, len(rounds)))
+    print('Arrays are %.1f times faster' % (player_time / array_time))
+    prompt_next()
+
+
+def time_sorter(sorter, profiles):
+    start = time.perf_counter()
+    for stats in profiles:
+        sorter.consume(stats)
+    sorter.sort()
+    return time.perf_counter() - start
+
+
+def comparator_vs_key_sort():
+    print('-' * 120)
+    print('Pitting a comparator against a key function for pipe sorting player statistics.')
+    print('The key function is expected to be faster.')
+    print('Sorts of player statistics use key functions for this reason.')
+    print('Comparator = One Python call and two attribute lookups per comparison')
+    print('Key = One Python call per element, then built-in comparisons of the keys')
+    print('-' * 120)
+    profiles = []
+    for i in range(0, 200000):
+        profiles.append(CircuitStats(None, wins=random.randint(0, 100)))
+    comparator_time = time_sorter(Sorter(lambda a, b: b.wins - a.wins), profiles)
+    key_time = time_sorter(Sorter(key=lambda stats: -stats.wins), profiles)
+    print('Comparator: %.2f seconds for %d players' % (comparator_time, len(profiles)))
+    print('Key: %.2f seconds for %d players' % (key_time, len(profiles)))
+    print('Key functions are %.1f times faster' % (comparator_time / key_time))
+    prompt_next()
+
+
+class RunTreeSorter:
+    """The previous pipe sort, with runs kept in a tree by their size and
+    merged one element at a time, for comparison with the current sort.
+
+    Elements are ordered either by a comparator, called on every comparison,
+    or by a key function, called once for each element as it is consumed. The
+    keys are then compared directly, which is far cheaper than calling a
+    comparator at large sizes. Keys may be tuples to sort by several fields,
+    such as (-stats.wins, stats.player.name) for most wins first then by name.
+    Either way the sort is not stable, so elements of equal key may come out
+    in any order.
+
+    Attributes:
+        _key: Gets the key of an element, which orders elements by the
+              comparator if no key function was given.
+        _runs: The tree of runs, sorted by their size.
+        _run: The current run to append to, of (key, element) pairs.
+        _previous: The key of the previous element consumed by the pipe line.
+        consume: The function pointer to however the next element should be
+                 consumed.
+    """
+
+    def __init__(self, comparator=lambda a, b: a - b, key=None):
+        """Creates a sorter, ordering elements by key if a key function is
+        given, otherwise by the comparator.
+
+        :param comparator: Compares two elements, giving a negative number,
+                           zero or a positive number when the first is less
+                           than, equal to or greater than the second.
+        :param key: Gets the key of an element, with elements sorted by
+                    ascending key.
+        """
+        self._key = cmp_to_key(comparator) if key is None else key
+        self._runs = Tree()
+        self._run = List()
+        self._previous = None
+        self.consume = self.__run_init
+
+    def __run_init(self, x):
+        """Initializes the first run.
+
+        :param x: The element to append to the run.
+        :return: None
+        """
+        key = self._key(x)
+        self._run.append((key, x))
+        self._previous = key
+        self.consume = self.__run_single
+
+    def __run_single(self, x):
+        """There should be a single element in the current run when called.
+        This is where the sort decides whether to start appending elements to
+        the front or the back of the current run.
+
+        :param x: The element to append to the run.
+        :return: None
+        """
+        key = self._key(x)
+
+        if key < self._previous:
+            self._run.append_front((key, x))
+            self._previous = key
+            self.consume = self.__run_back
+        else:
+            self._run.append((key, x))
+            self._previous = key
+            self.consume = self.__run_front
+
+    def __run_front(self, x):
+        """Continues appending to the run if still running upwards in value.
+        Otherwise changes state to start creating reverse runs.
+
+        :param x: The element to append to the run.
+        :return: None
+        """
+        key = self._key(x)
+
+        if key < self._previous:
+            self._runs.insert(len(self._run), self._run)
+            self._run = List()
+            self._run.append((key, x))
+            self._previous = key
+            self.consume = self.__run_single
+        else:
+            self._run.append((key, x))
+            self._previous = key
+
+    def __run_back(self, x):
+        """Continues appending to the front of the run if still running in
+        reverse. Otherwise changes state to start creating forwards runs.
+
+        :param x: The element to append to the run.
+        :return: None
+        """
+        key = self._key(x)
+
+        if key > self._previous:
+            self._runs.insert(len(self._run), self._run)
+            self._run = List()
+            self._run.append((key, x))
+            self._previous = key
+            self.consume = self.__run_single
+        else:
+            self._run.append_front((key, x))
+            self._previous = key
+
+    def sort(self):
+        """Collects all runs and iteratively merges each, smallest first.
+
+        :return: The sorted array.
+        """
+        # Collect the final run.
+        self._runs.insert(len(self._run), self._run)
+        self._run = List()
+        self.consume = self.__run_init
+
+        # Iteratively merge each of the runs, smallest first.
+        while len(self._runs) > 1:
+            new_runs = Tree()
+            iterator = iter(self._runs)
+
+            run_a = next_tree_run(iterator)
+            run_b = next_tree_run(iterator)
+
+            while run_a is not None and run_b is not None:
+                merged = self._merge(run_a, run_b)
+                new_runs.insert(len(merged), merged)
+                run_a = next_tree_run(iterator)
+                run_b = next_tree_run(iterator)
+
+            if run_a is not None:
+                new_runs.insert(len(run_a), run_a)
+
+            self._runs = new_runs
+
+        sorted_run = next_tree_run(iter(self._runs))
+
+        # Return the elements of the final sorted run, without their keys.
+        return [x for key, x in sorted_run]
+
+    def _merge(self, run_a, run_b):
+        """Merges two runs of (key, element) pairs.
+
+        :param run_a: The first run.
+        :param run_b: The second run.
+        :return: Both runs, A and B, merged.
+        """
+        # merged = np.empty(len(run_a) + len(run_b), dtype=object)
+        merged = [None] * (len(run_a) + len(run_b))
+        iterator_a = iter(run_a)
+        iterator_b = iter(run_b)
+        element_a = next(iterator_a, None)
+        element_b = next(iterator_b, None)
+        index = 0
+
+        while element_a is not None and element_b is not None:
+            if element_a[0] > element_b[0]:
+                merged[index] = element_b
+                element_b = next(iterator_b, None)
+            else:
+                merged[index] = element_a
+                element_a = next(iterator_a, None)
+
+            index += 1
+
+        while element_a is not None:
+            merged[index] = element_a
+            element_a = next(iterator_a, None)
+            index += 1
+
+        while element_b is not None:
+            merged[index] = element_b
+            element_b = next(iterator_b, None)
+            index += 1
+
+        return merged
+
+
+def next_tree_run(iterator):
+    """Finds the next run in the tree iterator.
+
+    :param iterator: The 'runs' tree iterator.
+    :return: The next element in the tree iterator, otherwise None.
+    """
+    run_tuple = next(iterator, None)
+    return run_tuple[1] if run_tuple else None
+
+
+def time_built_in_sort(profiles):
+    start = time.perf_counter()
+    sorted(profiles, key=lambda stats: -stats.wins)
+    return time.perf_counter() - start
+
+
+def run_tree_vs_stack_sort():
+    print('-' * 120)
+    print('Pitting the tree of runs against the stack of runs, and the built-in sort, for sorting scoreboards.')
+    print('The stack of runs is expected to be faster than the tree of runs, though slower than the built-in sort.')
+    print('Pipe sort uses the stack of runs for this reason, and stays for its streaming consume.')
+    print('Tree of runs = Runs of any length kept in a tree by size, merged one element at a time')
+    print('Stack of runs = Runs extended to %d by binary insertion, neighbours merged with galloping' % MIN_RUN)
+    print('Built-in = Tim sort written in C')
+    print('-' * 120)
+    wins = [random.randint(0, 100) for i in range(0, 200000)]
+    nearly_sorted = sorted(wins, reverse=True)
+    for i in range(0, len(nearly_sorted) // 100):
+        a = random.randrange(len(nearly_sorted))
+        b = random.randrange(len(nearly_sorted))
+        nearly_sorted[a], nearly_sorted[b] = nearly_sorted[b], nearly_sorted[a]
+    for name, order in (('Random', wins), ('Nearly sorted', nearly_sorted), ('Reversed', sorted(wins))):
+        profiles = [CircuitStats(None, wins=value) for value in order]
+        tree_time = time_sorter(RunTreeSorter(key=lambda stats: -stats.wins), profiles)
+        stack_time = time_sorter(Sorter(key=lambda stats: -stats.wins), profiles)
+        built_in_time = time_built_in_sort(profiles)
+        print('%s: tree of runs %.3f seconds, stack of runs %.3f seconds, built-in %.3f seconds for %d players' %
+              (name, tree_time, stack_time, built_in_time, len(profiles)))
+        print('%s: the stack of runs is %.1f times faster than the tree of runs' % (name, tree_time / stack_time))
+    prompt_next()
+
+
+def tournament_records(count):
+    for i in range(0, count):
+        yield ('MP%02d' % random.randint(1, 32), random.randint(1, MAX_ROUNDS + 1), 1.0, random.random() * 1000,
+               random.randint(0, MAX_ROUNDS), random.randint(0, 1))
+
+
+def sort_memory(sorter, count):
+    tracemalloc.start()
+    start = time.perf_counter()
+    for record in tournament_records(count):
+        sorter.consume(record)
+    for record in sorter.sort():
+        pass
+    elapsed = time.perf_counter() - start
+    used, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def memory_vs_external_sort():
+    print('-' * 120)
+    print('Pitting an in-memory pipe sort against an external pipe sort for sorting tournament statistics records.')
+    print('The external sort is expected to use far less memory, at the cost of some speed.')
+    print('Set SORT_MEMORY_BUDGET in the config to choose how many records external sorts hold in memory.')
+    print('In-memory = Every record held until sorted')
+    print('External = Sorted runs of at most the budget spilled to temporary files, then merged from disk')
+    print('-' * 120)
+    count = 200000
+    budget = 20000
+    memory_time, memory_peak = sort_memory(Sorter(key=lambda record: -record[3]), count)
+    external_time, external_peak = sort_memory(ExternalSorter(key=lambda record: -record[3], budget=budget), count)
+    print('In-memory: %.2f seconds, %.2f MiB peak for %d records' % (memory_time, memory_peak / 1024 / 1024, count))
+    print('External: %.2f seconds, %.2f MiB peak for %d records with a budget of %d' %
+          (external_time, external_peak / 1024 / 1024, count, budget))
+    prompt_next()
+
+
+def time_pipe_sort(pairs):
+    start = time.perf_counter()
+    sorter = Sorter(key=lambda pair: -pair[0])
+    for pair in pairs:
+        sorter.consume(pair)
+    sorter.sort()
+    return time.perf_counter() - start
+
+
+def time_parallel_sort(pairs, workers):
+    start = time.perf_counter()
+    parallel_sort(pairs, lambda pair: -pair[0], workers, 0)
+    return time.perf_counter() - start
+
+
+def time_argsort(keys, workers):
+    start = time.perf_counter()
+    if workers <= 1:
+        keys.argsort(kind='stable')
+    else:
+        shared_argsort(keys, workers)
+    return time.perf_counter() - start
+
+
+def pipe_vs_parallel_sort():
+    print('-' * 120)
+    print('Pitting pipe sort, a single process NumPy sort and parallel sort for sorting a large scoreboard.')
+    print('Parallel sort is expected to sort the keys close to as many times faster than NumPy sort as it has workers,')
+    print('given a core for each worker. Taking the keys and gathering the players in order stays in one process.')
+    print('Set SORT_WORKERS above 1 to sort scoreboards of at least PARALLEL_SORT_THRESHOLD players this way.')
+    print('Pipe Sort = Every comparison made here in Python')
+    print('NumPy Sort = Keys sorted here by a stable NumPy sort, which parallel sort does with one worker')
+    print('Parallel Sort = Keys split into ranges by sampled splitters, each range sorted by its own worker process')
+    print('-' * 120)
+    pairs = []
+    for i in range(0, 1000000):
+        pairs.append((random.random() * 1000, object()))
+    cores = os.cpu_count() or 1
+    print('Running with %d cores' % cores)
+    pipe_time = time_pipe_sort(pairs)
+    print('Pipe sort: %.2f seconds for %d players' % (pipe_time, len(pairs)))
+    if numeric_keys([0.0]) is None:
+        print('NumPy is not installed, so each worker sorts its range of keys by pipe sort')
+        for workers in sorted({2, max(2, cores)}):
+            parallel_time = time_parallel_sort(pairs, workers)
+            print('Parallel sort: %.2f seconds for %d players with %d workers, %.1f times faster than pipe sort' %
+                  (parallel_time, len(pairs), workers, pipe_time / parallel_time))
+        prompt_next()
+        return
+    numpy_time = time_parallel_sort(pairs, 1)
+    keys = numeric_keys([-pair[0] for pair in pairs] * 8)
+    numpy_keys_time = time_argsort(keys, 1)
+    print('NumPy sort: %.2f seconds for %d players, %.1f times faster than pipe sort' %
+          (numpy_time, len(pairs), pipe_time / numpy_time))
+    print('NumPy sort of the keys alone: %.2f seconds for %d keys' % (numpy_keys_time, len(keys)))
+    for workers in sorted({2, max(2, cores)}):
+        parallel_time = time_parallel_sort(pairs, workers)
+        parallel_keys_time = time_argsort(keys, workers)
+        print('Parallel sort with %d workers: %.2f seconds for %d players, %.1f times faster than NumPy sort' %
+              (workers, parallel_time, len(pairs), numpy_time / parallel_time))
+        print('Parallel sort of the keys alone with %d workers: %.2f seconds for %d keys, %.1f times faster' %
+              (workers, parallel_keys_time, len(keys), numpy_keys_time / parallel_keys_time))
+    prompt_next()
+
+
 def main():
     bubble_vs_pipe()
     pipe_vs_tree()
     tree_vs_list()
     list_vs_tree_vs_hash()
+    tree_vs_compact()
+    character_vs_split_parsing()
+    csv_vs_mapped_stats()
+    player_vs_array_points()
+    comparator_vs_key_sort()
+    run_tree_vs_stack_sort()
+    memory_vs_external_sort()
+    pipe_vs_parallel_sort()
     print('All evaluations are complete.')
 
 
@@ -2,57 +2,78 @@
 
 """
 
-A hash table with linked list buckets.
+A hash table using open addressing with linear probing.
 
 """
 
-# import numpy as np
+# The hash marking a slot whose entry has been deleted.
+DELETED = object()
 
-from linked_list import List
+# The minimum number of slots in a table, always a power of two.
+MIN_CAPACITY = 8
 
+# The golden ratio multiplier, used to spread hashes over the table.
+SPREAD = 0x9E3779B97F4A7C15
 
-class Node:
-    """A node or entry in the hash table.
-
-    Attributes:
-        key: The key to be used as an index in the table.
-        value: The value, an extra object to store anything relating to the key
-               that will not be used for indexing.
-    """
-
-    def __init__(self, key, value):
-        self.key = key
-        self.value = value
-
-    def __eq__(self, other):
-        if other is None:
-            return False
-        elif isinstance(other, Node):
-            return self.key == other.key
-        else:
-            return self.key == other
-
-    def __hash__(self):
-        return hash(self.key)
+# The number of bits a spread hash is reduced from.
+SPREAD_BITS = 64
 
 
 class HashTable:
-    """A hash table with linked list buckets.
+    """A hash table using open addressing with linear probing.
+
+    Keys, values and their cached hashes are kept in flat arrays. Deleted
+    entries leave a tombstone behind, so probe sequences through them remain
+    unbroken, and are only cleared when the table is rehashed. The table is
+    kept at most two thirds full, and its capacity is always a power of two.
 
     Attributes:
-        _table: The table, an array of linked lists.
+        _keys: The key of each slot.
+        _values: The value of each slot.
+        _hashes: The cached hash of each slot's key, None for empty slots or
+                 DELETED for tombstones.
         _size: The number of elements stored in this hash table.
+        _used: The number of slots that are either full or tombstones.
+        _shift: How far spread hashes are shifted to find their home slot.
     """
 
-    def __init__(self, initial_capacity=10):
-        # self._table = np.empty(initial_capacity, dtype=object)
-        self._table = [None] * initial_capacity
+    __slots__ = ('_keys', '_values', '_hashes', '_size', '_used', '_shift')
 
-        for i in range(0, initial_capacity):
-            self._table[i] = List()
+    def __init__(self, initial_capacity=10):
+        capacity = MIN_CAPACITY
+        while capacity * 2 < initial_capacity * 3:
+            capacity *= 2
 
+        self.__allocate(capacity)
         self._size = 0
 
+    @classmethod
+    def with_capacity(cls, capacity):
+        """Creates an empty hash table able to hold a number of entries without
+        growing.
+
+        :param capacity: The number of entries to make room for.
+        :return: The newly created hash table.
+        """
+        return cls(capacity)
+
+    @classmethod
+    def from_pairs(cls, pairs):
+        """Creates a hash table from key and value pairs, sizing it once up
+        front rather than growing it while inserting. Later pairs replace
+        earlier pairs with the same key.
+
+        :param pairs: The (key, value) pairs to insert.
+        :return: The newly created hash table.
+        """
+        if not hasattr(pairs, '__len__'):
+            pairs = list(pairs)
+
+        target = cls(len(pairs))
+        for key, value in pairs:
+            target.__put(key, value, hash(key))
+        return target
+
     def __len__(self):
         return self._size
 
@@ -66,10 +87,13 @@ class HashTable:
         return self.insert(key, value)
 
     def __iter__(self):
-        for i in range(0, len(self._table)):
-            # noinspection PyTypeChecker
-            for node in self._table[i]:
-                yield (node.key, node.value)
+        keys = self._keys
+        values = self._values
+        hashes = self._hashes
+
+        for i in range(0, len(hashes)):
+            if hashes[i] is not None and hashes[i] is not DELETED:
+                yield (keys[i], values[i])
 
     def __str__(self):
         if self._size == 0:
@@ -90,13 +114,12 @@ class HashTable:
         if self._size == 0:
             return default
 
-        code = hash(key) % len(self._table)
-        node = self._table[code].find(key)
+        index = self.__find_index(key, hash(key))
 
-        if node is None:
+        if index < 0:
             return default
 
-        return node.value
+        return self._values[index]
 
     def insert(self, key, value):
         """Inserts a new key and value into the hash table.
@@ -106,18 +129,10 @@ class HashTable:
         :return: The old value associated with this key if previously existed,
                  otherwise None.
         """
-        self.__ensure_capacity(self._size + 1)
-
-        node = Node(key, value)
-        code = hash(key) % len(self._table)
-        old_node = self._table[code].replace(node)
+        if (self._used + 1) * 3 > len(self._hashes) * 2:
+            self.__rehash(self._size + 1)
 
-        if old_node is not None:
-            return old_node.value
-
-        self._table[code].append(node)
-        self._size += 1
-        return None
+        return self.__put(key, value, hash(key))
 
     def delete(self, key):
         """Deletes the entry associated with the provided key.
@@ -128,49 +143,151 @@ class HashTable:
         if self._size == 0:
             return False
 
-        code = hash(key) % len(self._table)
-        old_node = self._table[code].delete(key)
+        index = self.__find_index(key, hash(key))
 
-        if old_node is None:
+        if index < 0:
             return None
-        else:
-            self._size -= 1
-            return old_node.value
+
+        old_value = self._values[index]
+        self._keys[index] = None
+        self._values[index] = None
+        self._hashes[index] = DELETED
+        self._size -= 1
+        return old_value
 
     def clone(self):
         """Shallow-clones the hash table.
 
         :return: The newly cloned hash table.
         """
-        target = HashTable(self._size)
-        for key, value in self:
-            target.insert(key, value)
+        target = HashTable(0)
+        target._keys = self._keys[:]
+        target._values = self._values[:]
+        target._hashes = self._hashes[:]
+        target._size = self._size
+        target._used = self._used
+        target._shift = self._shift
         return target
 
-    def __ensure_capacity(self, min_capacity):
-        """Ensures the number of possible positions in the hash table is at
-        least as much as the number of nodes in the table.
+    def __put(self, key, value, code):
+        """Stores a key and value in the table, which must have room for one
+        more entry.
 
-        :param min_capacity: The minimum capacity required of the table.
-        :return: None
+        :param key: The key to index with.
+        :param value: The value to store under the provided key.
+        :param code: The hash of the key.
+        :return: The old value associated with this key if previously existed,
+                 otherwise None.
+        """
+        keys = self._keys
+        hashes = self._hashes
+        mask = len(hashes) - 1
+        index = ((code * SPREAD) & 0xFFFFFFFFFFFFFFFF) >> self._shift
+        tombstone = -1
+
+        # Probe until the key or an empty slot is found.
+        while True:
+            stored = hashes[index]
+
+            if stored is None:
+                break
+            elif stored is DELETED:
+                if tombstone < 0:
+                    tombstone = index
+            elif stored == code and (keys[index] is key or keys[index] == key):
+                old_value = self._values[index]
+                self._values[index] = value
+                return old_value
+
+            index = (index + 1) & mask
+
+        # Reuse the first tombstone passed, otherwise claim the empty slot.
+        if tombstone >= 0:
+            index = tombstone
+        else:
+            self._used += 1
+
+        keys[index] = key
+        self._values[index] = value
+        hashes[index] = code
+        self._size += 1
+        return None
+
+    def __find_index(self, key, code):
+        """Finds the slot holding the provided key.
+
+        :param key: The key to search for.
+        :param code: The hash of the key.
+        :return: The index of the slot if found, otherwise -1.
         """
-        if len(self._table) >= min_capacity:
-            return
+        keys = self._keys
+        hashes = self._hashes
+        mask = len(hashes) - 1
+        index = ((code * SPREAD) & 0xFFFFFFFFFFFFFFFF) >> self._shift
 
-        old_table = self._table
-        new_capacity = int((len(self._table) * 3) / 2) + 1
+        while True:
+            stored = hashes[index]
 
-        if new_capacity < min_capacity:
-            new_capacity = min_capacity
+            if stored is None:
+                return -1
+            elif stored == code and (keys[index] is key or keys[index] == key):
+                return index
 
-        # self._table = np.empty(new_capacity, dtype=object)
-        self._table = [None] * new_capacity
+            index = (index + 1) & mask
 
-        for i in range(0, new_capacity):
-            self._table[i] = List()
+    def __find_empty(self, code):
+        """Finds the first empty slot along the probe sequence of a hash.
 
-        self._size = 0
+        :param code: The hash to probe with.
+        :return: The index of the empty slot.
+        """
+        hashes = self._hashes
+        mask = len(hashes) - 1
+        index = ((code * SPREAD) & 0xFFFFFFFFFFFFFFFF) >> self._shift
+
+        while hashes[index] is not None:
+            index = (index + 1) & mask
 
-        for bucket in old_table:
-            for node in bucket:
-                self.insert(node.key, node.value)
+        return index
+
+    def __allocate(self, capacity):
+        """Replaces the slots of this table with empty ones.
+
+        :param capacity: The number of slots, must be a power of two.
+        :return: None
+        """
+        self._keys = [None] * capacity
+        self._values = [None] * capacity
+        self._hashes = [None] * capacity
+        self._used = 0
+        self._shift = SPREAD_BITS - (capacity.bit_length() - 1)
+
+    def __rehash(self, min_size):
+        """Moves every entry into a new set of slots with room for at least
+        min_size entries, dropping all tombstones. Entries are placed using
+        their cached hashes, so no keys are hashed or compared again.
+
+        :param min_size: The minimum number of entries the table must hold.
+        :return: None
+        """
+        old_keys = self._keys
+        old_values = self._values
+        old_hashes = self._hashes
+
+        # Keep the table at most half full once rehashed, unless clearing
+        # tombstones alone makes enough room.
+        capacity = len(old_hashes)
+        while capacity < min_size * 2:
+            capacity *= 2
+
+        self.__allocate(capacity)
+
+        for i in range(0, len(old_hashes)):
+            code = old_hashes[i]
+            if code is not None and code is not DELETED:
+                index = self.__find_empty(code)
+                self._keys[index] = old_keys[i]
+                self._values[index] = old_values[i]
+                self._hashes[index] = code
+
+        self._used = self._size
@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+
+"""
+
+An append-only journal of every change made to a circuit since it was last
+saved, so that a session which ends without saving may be recovered by
+replaying the journal on top of the saved circuit.
+
+"""
+
+import os
+
+from config import get_csv_parser
+from hash_table import HashTable
+
+
+class Journal:
+    """An append-only journal, holding one CSV record per line.
+
+    Match records are only written to the file buffer, and are committed by
+    the round record written once every match of the round is applied. Each
+    commit is flushed and synced to disk, so a single sync covers a whole
+    round. Records after the last commit are discarded when the journal is
+    opened, as their round was never completed.
+
+    Attributes:
+        filename: The file the journal is kept in.
+        size: The size of the journal in bytes, as of the last commit.
+    """
+
+    def __init__(self, filename):
+        """Opens a journal for appending, creating it if required.
+
+        :param filename: The file to keep the journal in.
+        """
+        directory = os.path.dirname(filename)
+
+        if directory != '' and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.filename = filename
+        self.size = committed_size(filename)
+        self._file = open(filename, 'a+')
+        self._file.truncate(self.size)
+
+    def write(self, record):
+        """Writes a record to the journal, to be committed by the next commit.
+
+        :param record: The values of the record.
+        """
+        self._file.write(','.join(str(value) for value in record) + '\n')
+
+    def commit(self, record):
+        """Writes a record to the journal, then flushes and syncs every record
+        written since the last commit to disk.
+
+        :param record: The values of the record.
+        """
+        self.write(record)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.size = self._file.tell()
+
+    def truncate(self):
+        """Empties the journal, once every change it records has been saved."""
+        self._file.seek(0)
+        self._file.truncate()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.size = 0
+
+    def close(self):
+        """Closes the journal, discarding any uncommitted records."""
+        self._file.close()
+
+
+def committed_size(filename):
+    """Finds the size of the committed part of a journal, which ends at the
+    last record other than a match.
+
+    :param filename: The journal file.
+    :return: The size in bytes of the committed records.
+    """
+    if not os.path.isfile(filename):
+        return 0
+
+    size = 0
+    offset = 0
+
+    with open(filename, 'rb') as the_file:
+        for line in the_file:
+            offset += len(line)
+
+            # A torn final line is never committed.
+            if not line.endswith(b'\n'):
+                break
+
+            if not line.startswith(b'match,'):
+                size = offset
+
+    return size
+
+
+def read_journal(filename):
+    """Reads every committed record of a journal.
+
+    :param filename: The journal file.
+    :return: A generator of the values of each record.
+    """
+    parser = get_csv_parser()
+    size = committed_size(filename)
+
+    if size == 0:
+        return
+
+    with open(filename, 'rb') as the_file:
+        for line in the_file.read(size).decode().splitlines(True):
+            yield parser(line)
+
+
+def find_season(circuit, name):
+    """Finds a season of a circuit by its exact name.
+
+    :param circuit: The circuit holding the season.
+    :param name: The name of the season.
+    :return: The season, or None if there is no season by that name.
+    """
+    for season in circuit.ordered_seasons:
+        if season.name == name:
+            return season
+
+    return None
+
+
+def replay_journal(circuit, filename):
+    """Replays every committed record of a journal on top of a circuit.
+    Records already reflected in the circuit, such as those saved by a save
+    which was interrupted before the journal could be emptied, are skipped.
+
+    :param circuit: The circuit to replay onto, which must not be journalled.
+    :param filename: The journal file.
+    :return: The number of matches replayed.
+    """
+    matches = HashTable()  # <(season, tournament, track), matches of the round being replayed>
+    replayed = 0
+
+    for record in read_journal(filename):
+        kind = record[0]
+
+        if kind == 'season':
+            if find_season(circuit, record[1]) is None:
+                circuit.create_season(record[1])
+
+        elif kind == 'tournament':
+            season = find_season(circuit, record[1])
+
+            if season.tournaments.find(record[2]) is None:
+                season.create_tournament(record[2])
+
+        elif kind == 'complete':
+            season = find_season(circuit, record[1])
+
+            if not season.complete:
+                season.complete_season()
+
+        elif kind == 'match':
+            key = (record[1], record[2], record[3])
+            round_matches = matches.find(key)
+
+            if round_matches is None:
+                round_matches = []
+                matches.insert(key, round_matches)
+
+            round_matches.append(record[5:])
+
+        elif kind == 'round':
+            key = (record[1], record[2], record[3])
+            round_matches = matches.delete(key) or []
+            tournament = find_season(circuit, record[1]).tournaments.find(record[2])
+            track = tournament.get_track(record[3])
+
+            # Rounds already played were saved before the journal was emptied.
+            if track.round != int(record[4]):
+                continue
+
+            winners = HashTable()
+            winner = None
+
+            for winner_name, winner_score, loser_name, loser_score in round_matches:
+                winner = track.remaining.delete(winner_name)
+                loser = track.remaining.delete(loser_name)
+                winners.insert(winner_name, winner)
+                tournament.apply_match(track, winner, int(winner_score), loser, int(loser_score))
+
+            tournament.complete_round(track, winners, winner)
+            replayed += len(round_matches)
+
+    return replayed
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+
+"""
+
+Ranks the players of a season or circuit by wins, losses and win rate, kept
+up to date as each match is played so the top players are found without
+sorting.
+
+"""
+
+from config import get_scoreboard_tree
+
+
+def win_rate(stats):
+    """Gets the share of matches a player has won.
+
+    :param stats: The player statistics.
+    :return: The win rate, from 0 to 1, or 0 if the player has not played.
+    """
+    played = stats.wins + stats.losses
+    return 0.0 if played == 0 else stats.wins / played
+
+
+class Leaderboard:
+    """Order statistic trees of player statistics by wins, losses and win
+    rate, each with the highest first. Every player statistics profile ranked
+    refers back to the leaderboard, which it updates on each win or loss.
+
+    Attributes:
+        wins: The statistics ordered by wins.
+        losses: The statistics ordered by losses.
+        rates: The statistics ordered by win rate.
+    """
+
+    def __init__(self, player_stats):
+        """Builds the leaderboard in bulk from player statistics.
+
+        :param player_stats: The player statistics mappings to rank.
+        """
+        profiles = [stats for name, stats in player_stats]
+        tree = get_scoreboard_tree()
+        self.wins = tree.bulk_load(((stats.wins, stats) for stats in profiles), lambda a, b: b - a,
+                                   lambda wins: -wins)
+        self.losses = tree.bulk_load(((stats.losses, stats) for stats in profiles), lambda a, b: b - a,
+                                     lambda losses: -losses)
+        self.rates = tree.bulk_load(((win_rate(stats), stats) for stats in profiles), lambda a, b: b - a,
+                                    lambda rate: -rate)
+
+        for stats in profiles:
+            stats.leaderboard = self
+
+    def record_win(self, stats, old_rate):
+        """Moves a player who has just won a match.
+
+        :param stats: The player statistics, with the win counted.
+        :param old_rate: The win rate of the player before the match.
+        """
+        self.wins.update_key(stats.wins - 1, stats.wins, stats)
+        self.rates.update_key(old_rate, win_rate(stats), stats)
+
+    def record_loss(self, stats, old_rate):
+        """Moves a player who has just lost a match.
+
+        :param stats: The player statistics, with the loss counted.
+        :param old_rate: The win rate of the player before the match.
+        """
+        self.losses.update_key(stats.losses - 1, stats.losses, stats)
+        self.rates.update_key(old_rate, win_rate(stats), stats)
+
+    @staticmethod
+    def most(tree):
+        """Finds every player tied for first place in a tree.
+
+        :param tree: The tree to search.
+        :return: The key of first place, and the players holding it.
+        """
+        if len(tree) == 0:
+            return 0, []
+
+        key = next(iter(tree.top(1)))[0]
+        return key, [stats for key, stats in tree.top(tree.count_between(key, key))]
+
+    def most_wins(self):
+        """Finds the players with the most wins, in O(log n + k) time for k
+        tied players.
+
+        :return: The number of wins, and the players with that many wins.
+        """
+        return self.most(self.wins)
+
+    def most_losses(self):
+        """Finds the players with the most losses, in O(log n + k) time for k
+        tied players.
+
+        :return: The number of losses, and the players with that many losses.
+        """
+        return self.most(self.losses)
+
+    def top(self, board, k):
+        """Lists the first k players of one of the leaderboards.
+
+        :param board: The name of the leaderboard, being wins, losses or rate.
+        :param k: The number of players to list.
+        :return: The (key, player statistics) pairs of the first k players.
+        """
+        tree = self.wins if board == 'wins' else self.losses if board == 'losses' else self.rates
+        return list(tree.top(k))
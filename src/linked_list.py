@@ -84,7 +84,7 @@ class List:
                 index -= 1
         else:
             node = self._last
-            while index < self._size:
+            while index < self._size - 1:
                 node = node.left
                 index += 1
         return node
@@ -122,6 +122,15 @@ class List:
         node = self.__find_node(item)
         return node.item if node is not None else None
 
+    def find_node(self, item):
+        """Finds the node holding the first item that equals to the item
+        provided.
+
+        :param item: The item to search for.
+        :return: The node holding the item if found, otherwise None.
+        """
+        return self.__find_node(item)
+
     def delete(self, item):
         """Deletes the first item that equals to the item provided.
 
@@ -133,6 +142,15 @@ class List:
         if node is None:
             return None
 
+        return self.delete_node(node)
+
+    def delete_node(self, node):
+        """Unlinks a node from this list in O(1) time. The node must belong to
+        this list.
+
+        :param node: The node to delete, as returned by append or find_node.
+        :return: The item the deleted node held.
+        """
         self._size -= 1
 
         if self._first == node:
@@ -147,6 +165,8 @@ class List:
         if node.right is not None:
             node.right.left = node.left
 
+        node.left = None
+        node.right = None
         return node.item
 
     def contains(self, item):
@@ -161,7 +181,7 @@ class List:
         """Appends a new item to the end of the list.
 
         :param item: The item to append.
-        :return: None
+        :return: The newly created node, usable with delete_node.
         """
         self._size += 1
         node = Node(item)
@@ -171,12 +191,13 @@ class List:
         else:
             self._first = node
         self._last = node
+        return node
 
     def append_front(self, item):
         """Appends a new item to the front of the list.
 
         :param item: The item to append.
-        :return: None
+        :return: The newly created node, usable with delete_node.
         """
         self._size += 1
         node = Node(item)
@@ -186,6 +207,7 @@ class List:
         else:
             self._last = node
         self._first = node
+        return node
 
     def replace(self, item):
         """Replaces the first item in the list that equals to the item
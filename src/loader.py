@@ -1,36 +1,55 @@
+import hashlib
 import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 
 import math
 
 from circuit import Circuit
-from config import TOURNAMENTS_FILE, RANKING_POINTS_FILE, OUTPUT, RESOURCES, get_winning_score, get_forfeit_score
+from config import TOURNAMENTS_FILE, RANKING_POINTS_FILE, OUTPUT, RESOURCES, SNAPSHOT_FILE, JOURNAL_FILE, \
+    LOADER_WORKERS, STATS_STORE, STATS_STORE_DIRECTORY, get_csv_parser, get_winning_score, get_forfeit_score, \
+    get_scoreboard_tree
 from hash_table import HashTable
+from journal import Journal, replay_journal
 from linked_list import List
 from match import Match, Track
-from pipe_sort import Sorter
-from player import SeasonStats, TournamentStats, Player, CircuitStats
-from ranked_tree import Tree
+from pipe_sort import parallel_sort
+from player import SeasonStats, TournamentStats, Player, CircuitStats, CircuitStatsView, SeasonStatsView, \
+    TournamentStatsView
 from season import Season
+from snapshot import load_snapshot, save_snapshot
+from stats_store import StatsStore
 from tournament import TournamentType, Tournament
 
+# The number of bytes kept from the digest of each line checked for duplicates.
+LINE_DIGEST_SIZE = 16
 
-def prepare_persist(filename):
-    """Prepares a file for persistence, by deleting it and ensuring the
-    directory and parent directories exist.
 
-    :param filename: The file name to prepare for persistence.
-    :return: The prepared filename.
-    """
-    # Delete file if already exists.
-    if os.path.isfile(filename):
-        os.remove(filename)
+@contextmanager
+def persist(filename):
+    """Opens a file for persistence, ensuring the directory and parent
+    directories exist. The file is written under a temporary name, then moved
+    over any previous file once complete, so an interrupted save never leaves
+    a partial file behind.
 
+    :param filename: The file name to persist to.
+    :return: The temporary file to write to.
+    """
     # Ensure directory exists.
     directory_name = os.path.dirname(os.path.realpath(filename))
     if not os.path.isdir(directory_name):
         os.makedirs(directory_name)
 
-    return filename
+    temporary_filename = filename + '.tmp'
+
+    try:
+        with open(temporary_filename, 'w') as the_file:
+            yield the_file
+    except BaseException:
+        os.remove(temporary_filename)
+        raise
+
+    os.replace(temporary_filename, filename)
 
 
 def load_scores(text):
@@ -39,14 +58,38 @@ def load_scores(text):
     :param text: The text to parse.
     :return: The parsed scores.
     """
-    scores = HashTable()
+    return link_scores(parse_scores(text))
+
+
+def parse_scores(text):
+    """Parses all scores from formatted text "score1:score2:count" into plain
+    records.
 
+    :param text: The text to parse.
+    :return: The tuple of (our score, opponent score, count) records.
+    """
     if len(text) == 0:
-        return scores
+        return ()
+
+    records = []
 
     for score in text.split(','):
         data = score.split(':')
-        scores.insert((int(data[0]), int(data[1])), int(data[2]))
+        records.append((int(data[0]), int(data[1]), int(data[2])))
+
+    return tuple(records)
+
+
+def link_scores(records):
+    """Creates score mappings from plain records.
+
+    :param records: The tuple of (our score, opponent score, count) records.
+    :return: The score counts, mapped by (our score, opponent score).
+    """
+    scores = HashTable()
+
+    for our_score, opponent_score, count in records:
+        scores.insert((our_score, opponent_score), count)
 
     return scores
 
@@ -61,14 +104,84 @@ def parse_bool(v):
 
 
 def parse_csv_line(line):
-    """Parses a CSV (comma separated values) line.
+    """Parses a CSV (comma separated values) line. Parsing stops at the first
+    new line, quotes are removed and may wrap commas, and every value except
+    the last has surrounding whitespace stripped.
+
+    :param line: The line to parse.
+    :return: The array of values in this line.
+    """
+    if line[-1:] == '\n':
+        line = line[:-1]
+    elif line == '':
+        return []
+
+    # Lines without quotes, new lines or whitespace only need splitting.
+    if ' ' in line or '"' in line or '\n' in line or not line[:-1].isprintable():
+        return split_csv_line(line)
+
+    return line.split(',')
+
+
+def split_csv_line(line):
+    """Parses a CSV line which may contain quotes, new lines or whitespace to
+    be stripped.
 
     :param line: The line to parse.
     :return: The array of values in this line.
     """
+    end = line.find('\n')
 
+    if end >= 0:
+        line = line[:end]
+
+    if '"' in line:
+        return parse_quoted_csv_line(line)
+
+    values = line.split(',')
+    last = values.pop()
+    values = list(map(str.strip, values))
+    values.append(last)
+    return values
+
+
+def parse_quoted_csv_line(line):
+    """Parses a single CSV line containing quotes. Splitting the line on quotes
+    gives segments alternating between outside and inside of quotes, where
+    only commas outside of quotes separate values.
+
+    :param line: The line to parse, without a new line.
+    :return: The array of values in this line.
+    """
+    segments = line.split('"')
+    values = []
+    value = ''
+
+    for i in range(0, len(segments)):
+        if i % 2 == 1:
+            value += segments[i]
+            continue
+
+        parts = segments[i].split(',')
+        value += parts[0]
+
+        for j in range(1, len(parts)):
+            values.append(value.strip())
+            value = parts[j]
+
+    values.append(value)
+    return values
+
+
+def parse_csv_line_by_character(line):
+    """Parses a CSV line one character at a time, as the loader originally did.
+    Used when CSV_PARSER is 'character', and kept as the reference the split
+    parser is measured against.
+
+    :param line: The line to parse.
+    :return: The array of values in this line.
+    """
     if line == '':
-        # return np.empty(0)
         return []
 
     values = List()
@@ -91,36 +204,46 @@ def parse_csv_line(line):
 
 
 def handle_duplicates(file_name, previous_lines, line):
-    """Handles duplicate entries found in files.
+    """Handles duplicate entries found in files. Lines are remembered by a
+    fixed-size digest rather than their full text, so memory used per line
+    does not grow with the line length.
 
     :param file_name: The file name.
-    :param previous_lines: The hash table of all previous found lines.
+    :param previous_lines: The hash table of digests of all previous found
+                           lines.
     :param line: The current line read in.
     :return: True if a duplicate was found otherwise false.
     """
+    digest = hashlib.blake2b(line.encode(), digest_size=LINE_DIGEST_SIZE).digest()
 
-    if previous_lines[line]:
+    if previous_lines[digest]:
         print('Skipping duplicate line found in ' + file_name)
         print(line)
         return True
 
-    previous_lines[line] = True
+    previous_lines[digest] = True
     return False
 
 
-def load_round(file_name, track):
-    """Loads a round from resources.
+def iter_round(file_name, track):
+    """Lazily loads a round from resources, reading one line at a time so that
+    only the current match is held in memory. Each line is checked as it is
+    read, so a round should be read in full before any of its matches are
+    applied, leaving the track untouched by an invalid file.
 
     :param file_name: The filename to load.
     :param track: The track of the round to load.
-    :return: All matches loaded from file.
+    :return: A generator of the matches loaded from file.
+    :raises ValueError: If a line is not a match of two players and their
+                        scores.
     """
-    matches = List()
+    parser = get_csv_parser()
+
     with open(file_name, 'r') as the_file:
         header = True
         previous_lines = HashTable()
 
-        for line in the_file:
+        for number, line in enumerate(the_file, 1):
             if handle_duplicates(file_name, previous_lines, line):
                 continue
 
@@ -128,60 +251,132 @@ def load_round(file_name, track):
                 header = False
                 continue
 
-            csv = parse_csv_line(line)
-            player_a = csv[0]
-            score_a = int(csv[1])
-            player_b = csv[2]
-            score_b = int(csv[3])
-            match = Match(track, player_a, score_a, player_b, score_b)
-            matches.append(match)
+            csv = parser(line)
+
+            if len(csv) < 4:
+                raise ValueError('Line %d of %s has %d values, but a match needs 4' % (number, file_name, len(csv)))
+
+            try:
+                score_a = int(csv[1])
+                score_b = int(csv[3])
+            except ValueError:
+                raise ValueError('Line %d of %s has scores "%s" and "%s", but scores must be whole numbers' %
+                                 (number, file_name, csv[1], csv[3])) from None
+
+            yield Match(track, csv[0], score_a, csv[2], score_b)
+
+
+def load_round(file_name, track):
+    """Loads a round from resources, checking every line before any match is
+    played.
+
+    :param file_name: The filename to load.
+    :param track: The track of the round to load.
+    :return: All matches loaded from file.
+    """
+    matches = List()
+    for match in iter_round(file_name, track):
+        matches.append(match)
     return matches
 
 
-def load_track(tournament, gender, track_round):
-    """Loads a track from file.
+def round_file(season_name, tournament_name, gender, track_round):
+    """Gets the resource file holding the matches of a round.
+
+    :param season_name: The name of the season of the round.
+    :param tournament_name: The name of the tournament of the round.
+    :param gender: The gender of players on the track.
+    :param track_round: The round of the track.
+    :return: The file name.
+    """
+    return '%s/%s/%s/%s/round_%d.csv' % (RESOURCES, season_name, tournament_name.lower(), gender, track_round)
+
+
+def track_file(season_name, tournament_name, gender):
+    """Gets the output file of a track.
+
+    :param season_name: The name of the season of the track.
+    :param tournament_name: The name of the tournament of the track.
+    :param gender: The gender of players on the track.
+    :return: The file name.
+    """
+    return '%s/%s/%s/%s.csv' % (OUTPUT, season_name, tournament_name, gender)
+
+
+def read_track(filename):
+    """Parses the player statistics of a track from file into plain records,
+    so that it may run in a worker process.
+
+    :param filename: The file to parse.
+    :return: The list of (name, round achieved, multiplier, points, wins,
+             losses, scores, opponent scores) records.
+    """
+    parser = get_csv_parser()
+    records = []
+
+    with open(filename) as the_file:
+        for line in the_file:
+            csv = parser(line)
+            opponent_scores = tuple(int(score) for score in csv[7:])
+            records.append((csv[0], int(csv[1]), float(csv[2]), float(csv[3]), int(csv[4]), int(csv[5]),
+                            parse_scores(csv[6]), opponent_scores))
+
+    return records
+
+
+def link_track(tournament, gender, track_round, records):
+    """Creates a track from the plain records of its player statistics.
 
     :param tournament: The tournament this track is part of.
     :param gender: The gender of players on this track.
     :param track_round: The round the track is starting from.
-    :return: The track loaded from file.
+    :param records: The player statistics records, as read by read_track.
+    :return: The track.
     """
     stats = HashTable()
     remaining = HashTable()
-    sorter = Sorter(lambda a, b: b.round_achieved - a.round_achieved)
+    scored = []
+    columns = tournament.season.circuit.open_columns((tournament.season.name, tournament.type.name), gender)
+    season_player_stats = tournament.season.get_stats(gender)
 
-    with open('%s/%s/%s/%s.csv' % (OUTPUT, tournament.season.name, tournament.type.name, gender)) as the_file:
-        for line in the_file:
-            # Parse player stats.
-            csv = parse_csv_line(line)
-            player_name = csv[0]
-            round_achieved = int(csv[1])
-            multiplier = float(csv[2])
-            points = float(csv[3])
-            wins = int(csv[4])
-            losses = int(csv[5])
-            scores = load_scores(csv[6])
-            opponent_scores = List()
-
-            for score in csv[7:]:
-                opponent_scores.append(int(score))
-
-            # Create the players' tournament stats profile.
-            season_stats: SeasonStats = tournament.season.get_stats(gender).find(player_name)
+    for player_name, round_achieved, multiplier, points, wins, losses, scores, opponent_score_records in records:
+        scores = link_scores(scores)
+        opponent_scores = List()
+
+        for score in opponent_score_records:
+            opponent_scores.append(score)
+
+        # Create the players' tournament stats profile, with the numeric
+        # statistics taken from file unless already kept in the stats store.
+        season_stats: SeasonStats = season_player_stats.find(player_name)
+
+        if columns is None:
             tournament_stats = TournamentStats(season_stats.player, season_stats, round_achieved, multiplier, points,
                                                wins, losses, scores, opponent_scores)
-            tournament_stats.season.tournament_stats.insert(tournament.type.name, tournament_stats)
+        else:
+            tournament_stats = TournamentStatsView(season_stats.player, season_stats, columns,
+                                                   season_stats.player.player_id, scores, opponent_scores)
+
+            if columns.created:
+                tournament_stats.round_achieved = round_achieved
+                tournament_stats.multiplier = multiplier
+                tournament_stats.points = points
+                tournament_stats.wins = wins
+                tournament_stats.losses = losses
+
+        round_achieved = tournament_stats.round_achieved
+        tournament_stats.season.tournament_stats.insert(tournament.type.name, tournament_stats)
 
-            # Add this profile to the tournament players.
-            stats.insert(player_name, tournament_stats)
+        # Add this profile to the tournament players.
+        stats.insert(player_name, tournament_stats)
 
-            if not tournament.complete and track_round <= round_achieved:
-                remaining.insert(player_name, tournament_stats)
+        if not tournament.complete and track_round <= round_achieved:
+            remaining.insert(player_name, tournament_stats)
 
-            if tournament.complete or track_round > round_achieved:
-                sorter.consume(tournament_stats)
+        if tournament.complete or track_round > round_achieved:
+            scored.append(tournament_stats)
 
-    scoreboard = sorter.sort()
+    scoreboard = parallel_sort(scored, lambda player_stats: -player_stats.round_achieved)
 
     if not tournament.complete:
         linked_scoreboard = List()
@@ -191,16 +386,7 @@ def load_track(tournament, gender, track_round):
 
     winning_score = get_winning_score(gender)
     forfeit_score = get_forfeit_score(gender)
-
-    previous_stats = None
-    previous_season_scoreboard = None
-
-    if tournament.previous is not None:
-        previous_stats = tournament.previous.get_track(gender).stats
-        previous_season_scoreboard = tournament.previous.season.get_scoreboard(gender)
-
-    return Track(gender, track_round, stats, remaining, winning_score, forfeit_score, scoreboard, previous_stats,
-                 previous_season_scoreboard)
+    return Track(gender, track_round, stats, remaining, winning_score, forfeit_score, scoreboard, tournament)
 
 
 def load_season_player_scoreboard(season_stats):
@@ -209,86 +395,163 @@ def load_season_player_scoreboard(season_stats):
     :param season_stats: The seasons player statistics.
     :return: The sorted player statistics for the given season.
     """
-    scoreboard = Tree(lambda a, b: b - a)
-    for name, player_stats in season_stats:
-        scoreboard.insert(player_stats.points, player_stats)
-    return scoreboard
+    pairs = ((player_stats.points, player_stats) for name, player_stats in season_stats)
+    return get_scoreboard_tree().bulk_load(pairs, lambda a, b: b - a, lambda points: -points)
 
 
-def load_season_player_stats(season_name, gender, circuit_players):
+def season_player_stats_file(season_name, gender):
+    """Gets the output file of the player statistics for a season.
+
+    :param season_name: The name of the season.
+    :param gender: The gender of the players.
+    :return: The file name.
+    """
+    return '%s/%s/%s.csv' % (OUTPUT, season_name, gender)
+
+
+def read_season_player_stats(filename):
+    """Parses all player statistics for a season from file into plain records,
+    so that it may run in a worker process.
+
+    :param filename: The file to parse.
+    :return: The list of (name, points, wins, losses, scores) records.
+    """
+    parser = get_csv_parser()
+    records = []
+
+    with open(filename) as the_file:
+        for line in the_file:
+            csv = parser(line)
+            records.append((csv[0], float(csv[1]), int(csv[2]), int(csv[3]), parse_scores(csv[4])))
+
+    return records
+
+
+def load_season_player_stats(season_name, gender, circuit_players, columns=None):
     """Loads all player statistics for a season from file.
 
     :param season_name: The name of the season to load.
     :param gender: The gender of the players to load.
     :param circuit_players: All players of this gender participating in the
                             circuit.
+    :param columns: The stats store columns keeping the statistics, or None to
+                    keep them only in memory.
     :return: All the mapped player statistics for the season.
     """
-    stats = HashTable()
-    with open('%s/%s/%s.csv' % (OUTPUT, season_name, gender)) as the_file:
-        for line in the_file:
-            # Parse player stats.
-            csv = parse_csv_line(line)
-            player_name = csv[0]
-            points = float(csv[1])
-            wins = int(csv[2])
-            losses = int(csv[3])
-            scores = load_scores(csv[4])
-
-            # Create the players' season stats profile.
-            player: Player = circuit_players.find(player_name)
-            season_stats = SeasonStats(player, player.stats, points, wins, losses, scores)
-            player.stats.season_stats.insert(season_name, season_stats)
-
-            # Add this profile to the season players.
-            stats.insert(player_name, season_stats)
+    records = read_season_player_stats(season_player_stats_file(season_name, gender))
+    return link_season_player_stats(season_name, records, circuit_players, columns)
+
+
+def link_season_player_stats(season_name, records, circuit_players, columns=None):
+    """Creates all player statistics for a season from plain records.
+
+    :param season_name: The name of the season.
+    :param records: The player statistics records, as read by
+                    read_season_player_stats.
+    :param circuit_players: All players of this gender participating in the
+                            circuit.
+    :param columns: The stats store columns keeping the statistics, or None to
+                    keep them only in memory.
+    :return: All the mapped player statistics for the season.
+    """
+    stats = HashTable.with_capacity(len(circuit_players))
+
+    for player_name, points, wins, losses, scores in records:
+        # Create the players' season stats profile, with the numeric
+        # statistics taken from file unless already kept in the stats store.
+        player: Player = circuit_players.find(player_name)
+
+        if columns is None:
+            season_stats = SeasonStats(player, player.stats, points, wins, losses, link_scores(scores))
+        else:
+            season_stats = SeasonStatsView(player, player.stats, columns, player.player_id, link_scores(scores))
+
+            if columns.created:
+                season_stats.points = points
+                season_stats.wins = wins
+                season_stats.losses = losses
+
+        player.stats.season_stats.insert(season_name, season_stats)
+
+        # Add this profile to the season players.
+        stats.insert(player_name, season_stats)
+
     return stats
 
 
+def read_season_progress(season_name):
+    """Parses the progress of every tournament in a season from file.
+
+    :param season_name: The name of the season.
+    :return: The list of (name, complete, men's round, women's round) records.
+    """
+    parser = get_csv_parser()
+    records = []
+
+    with open('%s/%s/progress.csv' % (OUTPUT, season_name)) as the_file:
+        for line in the_file:
+            # Parse the tournaments name, whether it's complete and the round
+            # of each track.
+            csv = parser(line)
+            records.append((csv[0], parse_bool(csv[1]), int(csv[2]), int(csv[3])))
+
+    return records
+
+
 def load_tournaments(season: Season):
     """Loads all tournaments progress for a season from file.
 
     :param season: The season to load the tournaments progress for.
     :return: The newly loaded tournaments.
     """
-    tournaments = HashTable()
+    records = List()
 
-    with open('%s/%s/progress.csv' % (OUTPUT, season.name)) as the_file:
-        for line in the_file:
-            # Parse the seasons name and whether it's complete.
-            csv = parse_csv_line(line)
-            name = csv[0]
-            complete = parse_bool(csv[1])
-            men_round = int(csv[2])
-            women_round = int(csv[3])
-            tournament_type = season.circuit.tournament_types.find(name)
+    for name, complete, men_round, women_round in read_season_progress(season.name):
+        men_records = read_track(track_file(season.name, name, 'men'))
+        women_records = read_track(track_file(season.name, name, 'women'))
+        records.append((name, complete, men_round, women_round, men_records, women_records))
+
+    return link_tournaments(season, records)
+
+
+def link_tournaments(season: Season, records):
+    """Creates all tournaments for a season from plain records.
 
-            # Find the previous seasons tournament, if there is any.
-            previous = None
+    :param season: The season the tournaments are part of.
+    :param records: The (name, complete, men's round, women's round, men's
+                    track records, women's track records) records of each
+                    tournament.
+    :return: The newly created tournaments.
+    """
+    tournaments = HashTable()
 
-            if season.previous is not None:
-                previous = season.previous.tournaments.find(name)
+    for name, complete, men_round, women_round, men_records, women_records in records:
+        tournament_type = season.circuit.tournament_types.find(name)
 
-            # Create and load the tournament.
-            tournament = Tournament(season, tournament_type, previous, complete)
-            tournament.men_track = load_track(tournament, 'men', men_round)
-            tournament.women_track = load_track(tournament, 'women', women_round)
+        # Create and link the tournament.
+        tournament = Tournament(season, tournament_type, complete)
+        tournament.men_track = link_track(tournament, 'men', men_round, men_records)
+        tournament.women_track = link_track(tournament, 'women', women_round, women_records)
 
-            # Add newly created tournament to this season.
-            tournaments.insert(tournament.type.name, tournament)
+        # Add newly created tournament to this season.
+        tournaments.insert(tournament.type.name, tournament)
 
     return tournaments
 
 
-def load_circuit_players(gender, players):
+def load_circuit_players(gender, players, stats_store=None):
     """Loads all the players for a circuit from file.
 
     :param gender: The gender of the players to load.
     :param players: The players mapping collection to load into.
+    :param stats_store: The store keeping the numeric player statistics, or
+                        None to keep them only in memory.
     """
     player_data_file = '%s/%s.csv' % (RESOURCES, gender)
     player_stats_file = '%s/%s.csv' % (OUTPUT, gender)
 
+    parser = get_csv_parser()
+
     with open(player_data_file, 'r') as the_file:
         previous_lines = HashTable()
 
@@ -296,32 +559,46 @@ def load_circuit_players(gender, players):
             if handle_duplicates(player_data_file, previous_lines, line):
                 continue
 
-            values = parse_csv_line(line)
+            values = parser(line)
             name = values[0]
-            player = Player(name)
+
+            # A repeated name would otherwise replace the earlier player, and
+            # the next player would be given the same id.
+            if players.find(name) is not None:
+                print('Skipping repeated player %s found in %s' % (name, player_data_file))
+                continue
+
+            player = Player(name, player_id=len(players))
             stats = CircuitStats(player)
             player.stats = stats
             players.insert(name, player)
 
+    columns = None
+
+    if stats_store is not None:
+        columns = stats_store.columns((), gender, len(players))
+
+        for name, player in players:
+            player.stats = CircuitStatsView(player, columns, player.player_id)
+
     if not os.path.isfile(player_stats_file):
         return
 
     with open(player_stats_file, 'r') as the_file:
         for line in the_file:
             # Parse the players' circuit stats.
-            csv = parse_csv_line(line)
+            csv = parser(line)
             name = csv[0]
-            wins = int(csv[1])
-            losses = int(csv[2])
-            scores = load_scores(csv[3])
-            points = int(csv[4])
 
-            # Create the players circuit stats profile.
+            # Create the players circuit stats profile, with the numeric
+            # statistics parsed unless already kept in the stats store.
             player = players.find(name)
-            player.stats.wins = wins
-            player.stats.losses = losses
-            player.stats.scores = scores
-            player.stats.points = points
+            player.stats.scores = load_scores(csv[3])
+
+            if columns is None or columns.created:
+                player.stats.wins = int(csv[1])
+                player.stats.losses = int(csv[2])
+                player.stats.points = float(csv[4])
 
 
 def load_ranking_points(ranking_points):
@@ -329,6 +606,8 @@ def load_ranking_points(ranking_points):
 
     :param ranking_points: The ranking points collection to load into.
     """
+    parser = get_csv_parser()
+
     with open(RANKING_POINTS_FILE, 'r') as the_file:
         header = True
         previous_lines = HashTable()
@@ -342,7 +621,7 @@ def load_ranking_points(ranking_points):
                 header = False
                 continue
 
-            values = parse_csv_line(line)
+            values = parser(line)
             points = int(values[0])
             rank = math.ceil(math.log(int(values[1]), 2)) + 1
             # rank = int(values[1])
@@ -357,6 +636,8 @@ def load_tournament_types(tournaments):
 
     :param tournaments: The tournament types collection to load into.
     """
+    parser = get_csv_parser()
+
     with open(TOURNAMENTS_FILE, 'r') as the_file:
         header = True
         first_entry = True
@@ -373,7 +654,7 @@ def load_tournament_types(tournaments):
                 header = False
                 continue
 
-            values = parse_csv_line(line)
+            values = parser(line)
             name = values[0]
             place = int(values[1])
             prize = values[2]
@@ -398,49 +679,97 @@ def load_tournament_types(tournaments):
 
 
 def load_circuit_player_scoreboard(players):
-    scoreboard = Tree(lambda a, b: b - a)
-    for name, player in players:
-        scoreboard.insert(player.stats.points, player.stats)
-    return scoreboard
+    pairs = ((player.stats.points, player.stats) for name, player in players)
+    return get_scoreboard_tree().bulk_load(pairs, lambda a, b: b - a, lambda points: -points)
 
 
 def load_circuit():
+    """Loads a circuit as last saved, then replays every change recorded in
+    the journal since, such as by a session that ended without saving. The
+    circuit then records its changes to the journal.
+
+    :return: the newly loaded circuit.
+    """
+    circuit = load_saved_circuit()
+
+    # Every session uses the current and previous seasons, so load them up
+    # front while the worker processes may parse them in parallel.
+    current = circuit.current_season
+
+    if LOADER_WORKERS > 1 and current is not None:
+        load_seasons([season for season in (current.previous, current) if season is not None])
+
+    replayed = replay_journal(circuit, JOURNAL_FILE)
+
+    if replayed > 0:
+        print('Recovered %d matches played since the circuit was last saved' % replayed)
+
+    circuit.journal = Journal(JOURNAL_FILE)
+    return circuit
+
+
+def snapshot_is_current(circuit_progress_file):
+    """Checks whether the snapshot is at least as recent as the circuit
+    progress and every resource file it was restored from, so that players,
+    tournament types or ranking points changed in resources since are not
+    ignored.
+
+    :param circuit_progress_file: The circuit progress file of the outputs.
+    :return: True if the snapshot exists and is current, otherwise False.
+    """
+    if not os.path.isfile(SNAPSHOT_FILE):
+        return False
+
+    saved = os.path.getmtime(SNAPSHOT_FILE)
+    sources = (circuit_progress_file, '%s/men.csv' % RESOURCES, '%s/women.csv' % RESOURCES, TOURNAMENTS_FILE,
+               RANKING_POINTS_FILE)
+    return all(not os.path.isfile(source) or os.path.getmtime(source) <= saved for source in sources)
+
+
+def load_saved_circuit():
     """Loads a circuit from resources file, then loads all its progress via
-    the previous sessions outputs.
+    the previous sessions outputs. Restores the circuit from the previous
+    sessions snapshot instead when it is at least as recent as the outputs and
+    the resource files.
 
     :return: the newly loaded circuit.
     """
+    circuit_progress_file = '%s/progress.csv' % OUTPUT
+
+    if not STATS_STORE and snapshot_is_current(circuit_progress_file):
+        try:
+            return load_snapshot(SNAPSHOT_FILE)
+        except ValueError as error:
+            print('Ignoring snapshot: %s' % error)
+
     circuit = Circuit()
 
+    if STATS_STORE:
+        circuit.stats_store = StatsStore(STATS_STORE_DIRECTORY)
+
     load_tournament_types(circuit.tournament_types)
     load_ranking_points(circuit.ranking_points)
-    load_circuit_players('men', circuit.men)
-    load_circuit_players('women', circuit.women)
+    load_circuit_players('men', circuit.men, circuit.stats_store)
+    load_circuit_players('women', circuit.women, circuit.stats_store)
     circuit.men_scoreboard = load_circuit_player_scoreboard(circuit.men)
     circuit.women_scoreboard = load_circuit_player_scoreboard(circuit.women)
 
-    circuit_progress_file = '%s/progress.csv' % OUTPUT
-
     if not os.path.isfile(circuit_progress_file):
         return circuit
 
     season = None
 
+    parser = get_csv_parser()
+
+    # Seasons are only loaded once used.
     with open(circuit_progress_file, 'r') as the_file:
         for line in the_file:
-            csv = parse_csv_line(line)
+            csv = parser(line)
             name = csv[0]
             complete = parse_bool(csv[1])
 
             previous = season
-
-            men_stats = load_season_player_stats(name, 'men', circuit.men)
-            women_stats = load_season_player_stats(name, 'women', circuit.women)
-            men_scoreboard = load_season_player_scoreboard(men_stats)
-            women_scoreboard = load_season_player_scoreboard(women_stats)
-
-            season = Season(circuit, previous, name, complete, men_stats, women_stats, men_scoreboard, women_scoreboard)
-            season.tournaments = load_tournaments(season)
+            season = Season(circuit, previous, name, complete, loader=load_season)
             circuit.seasons.insert(name, season)
             circuit.ordered_seasons.append(season)
             circuit.current_season = season
@@ -448,6 +777,99 @@ def load_circuit():
     return circuit
 
 
+def load_season(season: Season):
+    """Loads the player statistics, scoreboards and tournaments of a season via
+    the previous sessions outputs.
+
+    :param season: The season to load.
+    """
+    circuit = season.circuit
+    name = season.name
+    men_stats = load_season_player_stats(name, 'men', circuit.men, circuit.open_columns((name,), 'men'))
+    women_stats = load_season_player_stats(name, 'women', circuit.women, circuit.open_columns((name,), 'women'))
+    link_season(season, men_stats, women_stats, load_tournaments)
+
+
+def link_season(season: Season, men_stats, women_stats, tournaments):
+    """Links the player statistics of a season into its scoreboards, then its
+    tournaments.
+
+    :param season: The season to link.
+    :param men_stats: The male player season statistics, mapped by name.
+    :param women_stats: The female player season statistics, mapped by name.
+    :param tournaments: Creates the tournaments of the season, given the
+                        season with its statistics in place.
+    """
+    season.men_stats = men_stats
+    season.women_stats = women_stats
+    season.men_scoreboard = load_season_player_scoreboard(men_stats)
+    season.women_scoreboard = load_season_player_scoreboard(women_stats)
+    season.tournaments = tournaments(season)
+
+
+def load_seasons(seasons, workers=LOADER_WORKERS):
+    """Loads several seasons at once via the previous sessions outputs. When
+    given more than one worker, every file is parsed into plain records by a
+    pool of worker processes, then linked into the seasons here in order, so
+    the seasons are identical to those loaded one by one.
+
+    No more than SEASON_CACHE_SIZE seasons should be loaded at once, as
+    loading each season evicts the least recently used beyond that.
+
+    :param seasons: The seasons to load. Seasons already loaded, or not loaded
+                    via the outputs, are skipped.
+    :param workers: The number of worker processes.
+    """
+    seasons = [season for season in seasons if not season.loaded and season.loader is load_season]
+
+    if workers <= 1 or len(seasons) == 0:
+        for season in seasons:
+            season.load()
+        return
+
+    with ProcessPoolExecutor(workers) as executor:
+        # Submit every file of every season before waiting on any.
+        pending = List()
+
+        for season in seasons:
+            men_stats = executor.submit(read_season_player_stats, season_player_stats_file(season.name, 'men'))
+            women_stats = executor.submit(read_season_player_stats, season_player_stats_file(season.name, 'women'))
+            tournaments = List()
+
+            for name, complete, men_round, women_round in read_season_progress(season.name):
+                men_track = executor.submit(read_track, track_file(season.name, name, 'men'))
+                women_track = executor.submit(read_track, track_file(season.name, name, 'women'))
+                tournaments.append((name, complete, men_round, women_round, men_track, women_track))
+
+            pending.append((season, men_stats, women_stats, tournaments))
+
+        for season, men_stats, women_stats, tournaments in pending:
+            season.load(lambda target: link_parsed_season(target, men_stats.result(), women_stats.result(),
+                                                          tournaments))
+
+
+def link_parsed_season(season: Season, men_records, women_records, tournaments):
+    """Links a season from records parsed by worker processes.
+
+    :param season: The season to link.
+    :param men_records: The male player season statistics records.
+    :param women_records: The female player season statistics records.
+    :param tournaments: The (name, complete, men's round, women's round, men's
+                        track, women's track) records of each tournament, with
+                        each track being a future of its records.
+    """
+    circuit = season.circuit
+    name = season.name
+    men_stats = link_season_player_stats(name, men_records, circuit.men, circuit.open_columns((name,), 'men'))
+    women_stats = link_season_player_stats(name, women_records, circuit.women, circuit.open_columns((name,), 'women'))
+    records = List()
+
+    for tournament_name, complete, men_round, women_round, men_track, women_track in tournaments:
+        records.append((tournament_name, complete, men_round, women_round, men_track.result(), women_track.result()))
+
+    link_season(season, men_stats, women_stats, lambda target: link_tournaments(target, records))
+
+
 def save_scores(scores):
     """Puts all scores into a formatted output.
 
@@ -461,32 +883,40 @@ def save_scores(scores):
 
 
 def save_track(tournament: Tournament, track: Track):
-    """Saves all the track information for this session.
+    """Saves all the track information for this session, if the track has
+    changed since it was last saved.
 
     :param tournament: The tournament the saved track belongs to.
     :param track: The track to save.
     """
+    if not track.dirty:
+        return
+
     filename = '%s/%s/%s/%s.csv' % (OUTPUT, tournament.season.name, tournament.type.name, track.name)
-    prepare_persist(filename)
-    with open(filename, 'a') as the_file:
+    with persist(filename) as the_file:
         for name, stats in track.stats:
             stats: TournamentStats = stats
             scores = save_scores(stats.scores)
-            the_file.write('%s,%d,%.2f,%d,%d,%d,"%s"' % (name, stats.round_achieved, stats.multiplier, stats.points,
+            the_file.write('%s,%d,%.2f,%s,%d,%d,"%s"' % (name, stats.round_achieved, stats.multiplier, stats.points,
                                                          stats.wins, stats.losses, scores))
             for score in stats.opponent_scores:
                 the_file.write(',%d' % score)
 
             the_file.write('\n')
 
+    track.dirty = False
+
 
 def save_tournament(tournament: Tournament):
     """Saves progress for a tournament to the output files.
 
     :param tournament: The tournament to save.
+    :return: True if any track was saved, otherwise False.
     """
+    saved = tournament.men_track.dirty or tournament.women_track.dirty
     save_track(tournament, tournament.men_track)
     save_track(tournament, tournament.women_track)
+    return saved
 
 
 def save_season_player_stats(season: Season, gender, player_stats):
@@ -497,32 +927,43 @@ def save_season_player_stats(season: Season, gender, player_stats):
     :param player_stats: All the player statistics to save.
     """
     filename = '%s/%s/%s.csv' % (OUTPUT, season.name, gender)
-    prepare_persist(filename)
-    with open(filename, 'a') as the_file:
+    with persist(filename) as the_file:
         for name, stats in player_stats:
             stats: SeasonStats = stats
             scores = save_scores(stats.scores)
-            the_file.write('%s,%d,%d,%d,"%s"\n' % (name, stats.points, stats.wins, stats.losses, scores))
+            the_file.write('%s,%s,%d,%d,"%s"\n' % (name, stats.points, stats.wins, stats.losses, scores))
 
 
 def save_season(season: Season):
-    """Saves all season progress to output files.
+    """Saves all season progress to output files. Only the files of a season,
+    or of its tracks, that have changed since they were last saved are
+    rewritten.
 
     :param season: The season to save the progress of.
+    :return: True if anything was saved, otherwise False.
     """
-    filename = '%s/%s/progress.csv' % (OUTPUT, season.name)
-    prepare_persist(filename)
-    with open(filename, 'a') as the_file:
-        for name, tournament in season.tournaments:
-            men_round = tournament.men_track.round
-            women_round = tournament.women_track.round
-            the_file.write('%s,%s,%d,%d\n' % (name, tournament.complete, men_round, women_round))
+    # Seasons not in memory have nothing to save.
+    if not season.loaded:
+        return False
+
+    saved = season.dirty
+
+    if season.dirty:
+        filename = '%s/%s/progress.csv' % (OUTPUT, season.name)
+        with persist(filename) as the_file:
+            for name, tournament in season.tournaments:
+                men_round = tournament.men_track.round
+                women_round = tournament.women_track.round
+                the_file.write('%s,%s,%d,%d\n' % (name, tournament.complete, men_round, women_round))
 
-    save_season_player_stats(season, 'men', season.men_stats)
-    save_season_player_stats(season, 'women', season.women_stats)
+        save_season_player_stats(season, 'men', season.men_stats)
+        save_season_player_stats(season, 'women', season.women_stats)
+        season.dirty = False
 
     for name, tournament in season.tournaments:
-        save_tournament(tournament)
+        saved = save_tournament(tournament) or saved
+
+    return saved
 
 
 def save_circuit_player_stats(gender, players):
@@ -532,27 +973,49 @@ def save_circuit_player_stats(gender, players):
     :param players: The players to save.
     """
     filename = '%s/%s.csv' % (OUTPUT, gender)
-    prepare_persist(filename)
-    with open(filename, 'a') as the_file:
+    with persist(filename) as the_file:
         for name, player in players:
             stats: CircuitStats = player.stats
             scores = save_scores(stats.scores)
-            the_file.write('%s,%d,%d,"%s",%d\n' % (name, stats.wins, stats.losses, scores, stats.points))
+            the_file.write('%s,%d,%d,"%s",%s\n' % (name, stats.wins, stats.losses, scores, stats.points))
 
 
 def save_circuit(circuit: Circuit):
-    """Saves all circuit progress to the output files.
+    """Saves all circuit progress to the output files. Only the files that
+    have changed since the circuit was loaded or last saved are rewritten.
 
     :param circuit: The circuit to save.
+    :return: True if anything was saved, otherwise False.
     """
-    filename = '%s/progress.csv' % OUTPUT
-    prepare_persist(filename)
-    with open(filename, 'a') as the_file:
-        for season in circuit.ordered_seasons:
-            the_file.write('%s,%s\n' % (season.name, season.complete))
+    saved = circuit.dirty
+
+    if circuit.dirty:
+        filename = '%s/progress.csv' % OUTPUT
+        with persist(filename) as the_file:
+            for season in circuit.ordered_seasons:
+                the_file.write('%s,%s\n' % (season.name, season.complete))
 
-    save_circuit_player_stats('men', circuit.men)
-    save_circuit_player_stats('women', circuit.women)
+        save_circuit_player_stats('men', circuit.men)
+        save_circuit_player_stats('women', circuit.women)
+        circuit.dirty = False
 
     for name, season in circuit.seasons:
-        save_season(season)
+        saved = save_season(season) or saved
+
+    if circuit.stats_store is not None:
+        circuit.stats_store.save(saved)
+
+    return saved
+
+
+def compact_circuit(circuit: Circuit):
+    """Folds the journal into the output files, by saving every change to the
+    CSV files and snapshot, then emptying the journal.
+
+    :param circuit: The circuit to compact.
+    """
+    if save_circuit(circuit):
+        save_snapshot(circuit, SNAPSHOT_FILE)
+
+    if circuit.journal is not None:
+        circuit.journal.truncate()
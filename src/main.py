@@ -1,8 +1,15 @@
+import sys
+
 from command_executor import CommandExecutor
 from loader import load_circuit
 
 
 def main():
+    # Play rounds from their files without prompting when run as a batch.
+    if len(sys.argv) > 1 and sys.argv[1] == 'batch':
+        from batch import run_batch
+        sys.exit(run_batch(sys.argv[2:]))
+
     # Load the circuit from database.
     circuit = load_circuit()
 
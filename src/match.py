@@ -16,14 +16,13 @@ class Track:
         winning_score: The score required to win a match.
         forfeit_score: The score given to a player withdrawn from a match.
         scoreboard: The tournament scoreboard for this track.
-        previous_stats: The player statistics of this track for the previous
-                        season.
-        previous_season_scoreboard: The scoreboard of the previous season for
-                                    this track.
+        tournament: The tournament this track is part of.
+        losers: The players who lost in the current round, to be scored once
+                the round is complete.
+        dirty: True when the track has changed since it was last saved.
     """
 
-    def __init__(self, name, track_round, stats, remaining, winning_score, forfeit_score, scoreboard, previous_stats,
-                 previous_season_scoreboard):
+    def __init__(self, name, track_round, stats, remaining, winning_score, forfeit_score, scoreboard, tournament):
         self.name = name
         self.round = track_round
         self.stats = stats
@@ -31,36 +30,52 @@ class Track:
         self.winning_score = winning_score
         self.forfeit_score = forfeit_score
         self.scoreboard: List = scoreboard
-        self.previous_stats = previous_stats
-        self.previous_season_scoreboard = previous_season_scoreboard
+        self.tournament = tournament
         self.player_count = MAX_PLAYERS
-
-        # Find and cache all the players considered highly ranked from the
-        # previous season scoreboard.
+        self.losers = List()
+        self.dirty = False
         self.high_ranked = HashTable()
-
-        if self.previous_season_scoreboard is not None:
-            rank = 0
-            for points, stats in self.previous_season_scoreboard:
-                rank += 1
-                if rank > (MAX_PLAYERS / 2):
-                    break
-                self.high_ranked.insert(stats.player.name, True)
-
         self.previous_winners = HashTable()
         self.previous_losers = HashTable()
 
+    @property
+    def previous_stats(self):
+        """The player statistics of this track for the previous season, or
+        None if the tournament was not held in the previous season. Found
+        when used, so the previous season is only loaded when required.
+        """
+        previous = self.tournament.previous
+        return None if previous is None else previous.get_track(self.name).stats
+
+    @property
+    def previous_season_scoreboard(self):
+        """The scoreboard of the previous season for this track, or None if
+        the tournament was not held in the previous season.
+        """
+        previous = self.tournament.previous
+        return None if previous is None else previous.season.get_scoreboard(self.name)
+
     def update_previous_winners(self):
         """Updates the track with the previous winners and losers for the
         current round.
         """
-        if self.previous_stats is None:
+        previous_stats = self.previous_stats
+
+        if previous_stats is None:
             return
 
+        # Find and cache all the players considered highly ranked from the
+        # previous season scoreboard, for seeding the first round.
+        if self.round == 1:
+            self.high_ranked = HashTable()
+
+            for points, stats in self.previous_season_scoreboard.top(int(MAX_PLAYERS / 2)):
+                self.high_ranked.insert(stats.player.name, True)
+
         self.previous_losers = HashTable()
         self.previous_winners = HashTable()
 
-        for name, stats in self.previous_stats:
+        for name, stats in previous_stats:
             if self.remaining.find(name) is None:
                 continue
 
@@ -3,178 +3,670 @@
 """
 
 PipeSort. An optimal sorting algorithm for binding to data streams. Makes use
-of a combination of natural 'runs' in data and merges each run to the next
-closest in size.
+of a combination of natural 'runs' in data, extends short runs by binary
+insertion, and merges neighbouring runs of similar size, galloping through
+runs that are far apart in value. Already sorted streams, such as many
+scoreboards, are merged lazily without sorting them again, data too large
+for memory is sorted in runs spilled to disk, and large rankings are sorted in
+ranges by worker processes.
 
 """
 
-# import numpy as np
+import heapq
+import pickle
+import struct
+import tempfile
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from functools import cmp_to_key
+from itertools import islice
+from multiprocessing import shared_memory
 
-from linked_list import List
-from ranked_tree import Tree
+from config import PARALLEL_SORT_THRESHOLD, SORT_MEMORY_BUDGET, SORT_WORKERS
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# The length short runs are extended to by binary insertion before a new run may start.
+MIN_RUN = 32
+
+# The number of elements taken in a row from one run before merging switches to galloping.
+MIN_GALLOP = 7
+
+# The number of keys sampled for each worker process when picking the ranges a parallel sort splits its keys into.
+SORT_SAMPLE_SIZE = 64
+
+# The width in bytes of each index in the order written by parallel sort workers.
+ORDER_WIDTH = 8
+
+# The number of elements pickled together in each record of a spilled run.
+SPILL_BLOCK_SIZE = 1024
+
+# The header of each record of a spilled run, holding the length of the pickled block.
+SPILL_HEADER = struct.Struct('>I')
 
 
 class Sorter:
     """An optimal pipe-line sorting implementation.
 
+    Elements are ordered either by a comparator, called on every comparison,
+    or by a key function, called once for each element as it is consumed. The
+    keys are then compared directly, which is far cheaper than calling a
+    comparator at large sizes. Keys may be tuples to sort by several fields,
+    such as (-stats.wins, stats.player.name) for most wins first then by name.
+    The sort is stable, so elements of equal key keep the order they were
+    consumed in, and sorting by one field then another only needs the second.
+
+    Each run is a pair of arrays, the keys and their elements, so binary
+    searches while inserting and galloping compare the keys alone.
+
     Attributes:
-        _compare: How two elements should be compared.
-        _runs: The tree of runs, sorted by their size.
-        _run: The current run to append to.
-        _previous: The previous element consumed by the pipe line.
+        _key: Gets the key of an element, which orders elements by the
+              comparator if no key function was given.
+        _runs: The stack of runs, in the order they were consumed.
+        _keys: The keys of the current run.
+        _elements: The elements of the current run.
         consume: The function pointer to however the next element should be
                  consumed.
     """
 
-    def __init__(self, comparator=lambda a, b: a - b):
-        self._compare = comparator
-        self._runs = Tree()
-        self._run = List()
-        self._previous = None
+    def __init__(self, comparator=lambda a, b: a - b, key=None):
+        """Creates a sorter, ordering elements by key if a key function is
+        given, otherwise by the comparator.
+
+        :param comparator: Compares two elements, giving a negative number,
+                           zero or a positive number when the first is less
+                           than, equal to or greater than the second.
+        :param key: Gets the key of an element, with elements sorted by
+                    ascending key.
+        """
+        self._key = cmp_to_key(comparator) if key is None else key
+        self._runs = []  # <(keys, elements)>
+        self._keys = []
+        self._elements = []
         self.consume = self.__run_init
 
     def __run_init(self, x):
-        """Initializes the first run.
+        """Initializes a run.
 
         :param x: The element to append to the run.
         :return: None
         """
-        self._run.append(x)
-        self._previous = x
+        self._keys.append(self._key(x))
+        self._elements.append(x)
         self.consume = self.__run_single
 
     def __run_single(self, x):
         """There should be a single element in the current run when called.
-        This is where the sort decides whether to start appending elements to
-        the front or the back of the current run.
+        This is where the sort decides whether the current run is ascending or
+        strictly descending.
 
         :param x: The element to append to the run.
         :return: None
         """
-        if self._compare(x, self._previous) < 0:
-            self._run.append_front(x)
-            self._previous = x
+        key = self._key(x)
+
+        if key < self._keys[-1]:
             self.consume = self.__run_back
         else:
-            self._run.append(x)
-            self._previous = x
             self.consume = self.__run_front
 
+        self._keys.append(key)
+        self._elements.append(x)
+
     def __run_front(self, x):
-        """Continues appending to the run if still running upwards in value.
-        Otherwise changes state to start creating reverse runs.
+        """Continues the run if still running upwards in value.
 
         :param x: The element to append to the run.
         :return: None
         """
-        if self._compare(x, self._previous) < 0:
-            self._runs.insert(len(self._run), self._run)
-            self._run = List()
-            self._run.append(x)
-            self._previous = x
-            self.consume = self.__run_single
-        else:
-            self._run.append(x)
-            self._previous = x
+        self.__ascend(self._key(x), x)
 
     def __run_back(self, x):
-        """Continues appending to the front of the run if still running in
-        reverse. Otherwise changes state to start creating forwards runs.
+        """Continues the run if still running strictly downwards in value.
+        Otherwise reverses the run, which keeps equal keys in order as none
+        are equal, and continues it upwards.
 
         :param x: The element to append to the run.
         :return: None
         """
-        if self._compare(x, self._previous) > 0:
-            self._runs.insert(len(self._run), self._run)
-            self._run = List()
-            self._run.append(x)
-            self._previous = x
-            self.consume = self.__run_single
+        key = self._key(x)
+
+        if key < self._keys[-1]:
+            self._keys.append(key)
+            self._elements.append(x)
         else:
-            self._run.append_front(x)
-            self._previous = x
+            self._keys.reverse()
+            self._elements.reverse()
+            self.consume = self.__run_front
+            self.__ascend(key, x)
 
-    def sort(self):
-        """Collects all runs and iteratively merges each, smallest first.
+    def __ascend(self, key, x):
+        """Appends to an ascending run, inserting out of order elements into
+        the run until it reaches the minimum run length. Otherwise pushes the
+        run and starts the next run.
 
-        :return: The sorted array.
+        :param key: The key of the element.
+        :param x: The element to append to the run.
+        :return: None
         """
-        # Collect the final run.
-        self._runs.insert(len(self._run), self._run)
-        self._run = List()
+        keys = self._keys
+
+        if not key < keys[-1]:
+            keys.append(key)
+            self._elements.append(x)
+        elif len(keys) < MIN_RUN:
+            # Insert after any equal keys to keep the sort stable.
+            index = bisect_right(keys, key)
+            keys.insert(index, key)
+            self._elements.insert(index, x)
+        else:
+            self._push_run()
+            self._keys.append(key)
+            self._elements.append(x)
+            self.consume = self.__run_single
+
+    def _push_run(self):
+        """Pushes the current run onto the stack, merging runs until every
+        run is longer than the two above it combined. This keeps the stack
+        O(log n) deep and merges runs of similar size.
+
+        :return: None
+        """
+        if self.consume == self.__run_back:
+            self._keys.reverse()
+            self._elements.reverse()
+
+        self._runs.append((self._keys, self._elements))
+        self._keys = []
+        self._elements = []
         self.consume = self.__run_init
+        runs = self._runs
 
-        # Iteratively merge each of the runs, smallest first.
-        while len(self._runs) > 1:
-            new_runs = Tree()
-            iterator = iter(self._runs)
+        while len(runs) > 1:
+            n = len(runs) - 2
 
-            run_a = next_run(iterator)
-            run_b = next_run(iterator)
+            if (n > 0 and len(runs[n - 1][0]) <= len(runs[n][0]) + len(runs[n + 1][0])) or \
+                    (n > 1 and len(runs[n - 2][0]) <= len(runs[n - 1][0]) + len(runs[n][0])):
+                if len(runs[n - 1][0]) < len(runs[n + 1][0]):
+                    n -= 1
+            elif len(runs[n][0]) > len(runs[n + 1][0]):
+                break
 
-            while run_a is not None and run_b is not None:
-                merged = self._merge(run_a, run_b)
-                new_runs.insert(len(merged), merged)
-                run_a = next_run(iterator)
-                run_b = next_run(iterator)
+            self._merge_at(n)
 
-            if run_a is not None:
-                new_runs.insert(len(run_a), run_a)
+    def _merge_at(self, n):
+        """Merges a run of the stack with the run above it.
 
-            self._runs = new_runs
+        :param n: The index of the lower run.
+        :return: None
+        """
+        self._runs[n] = self._merge(self._runs[n], self._runs[n + 1])
+        del self._runs[n + 1]
 
-        sorted_run = next_run(iter(self._runs))
+    def sort(self):
+        """Pushes the final run, then merges all runs from the top of the
+        stack down.
 
-        # Convert the run to an array if currently a linked list.
-        if isinstance(sorted_run, List):
-            sorted_run = sorted_run.to_array()
+        :return: The sorted array.
+        """
+        if len(self._keys) > 0:
+            self._push_run()
 
-        # Return the final sorted run.
-        return sorted_run
+        runs = self._runs
+
+        while len(runs) > 1:
+            n = len(runs) - 2
+
+            if n > 0 and len(runs[n - 1][0]) < len(runs[n + 1][0]):
+                n -= 1
+
+            self._merge_at(n)
+
+        sorted_run = runs.pop() if len(runs) > 0 else ([], [])
+        return sorted_run[1]
 
     def _merge(self, run_a, run_b):
-        """Merges two runs.
+        """Merges two neighbouring runs, with the first taken first on equal
+        keys. Once one run gives MIN_GALLOP elements in a row, the rest of its
+        elements that come first are found by galloping and copied at once.
 
         :param run_a: The first run.
         :param run_b: The second run.
         :return: Both runs, A and B, merged.
         """
-        # merged = np.empty(len(run_a) + len(run_b), dtype=object)
-        merged = [None] * (len(run_a) + len(run_b))
-        iterator_a = iter(run_a)
-        iterator_b = iter(run_b)
-        element_a = next(iterator_a, None)
-        element_b = next(iterator_b, None)
-        index = 0
-
-        while element_a is not None and element_b is not None:
-            if self._compare(element_a, element_b) > 0:
-                merged[index] = element_b
-                element_b = next(iterator_b, None)
+        keys_a, elements_a = run_a
+        keys_b, elements_b = run_b
+
+        # Elements of A up to the first of B, and of B from the last of A,
+        # are already in place.
+        i = bisect_right(keys_a, keys_b[0])
+        end = bisect_left(keys_b, keys_a[-1])
+
+        if i == len(keys_a):
+            return keys_a + keys_b, elements_a + elements_b
+
+        keys = keys_a[:i]
+        elements = elements_a[:i]
+        length_a = len(keys_a)
+        j = 0
+        count_a = 0
+        count_b = 0
+
+        while i < length_a and j < end:
+            if keys_b[j] < keys_a[i]:
+                keys.append(keys_b[j])
+                elements.append(elements_b[j])
+                j += 1
+                count_b += 1
+                count_a = 0
+
+                if count_b >= MIN_GALLOP:
+                    stop = gallop_left(keys_b, keys_a[i], j, end)
+                    keys.extend(keys_b[j:stop])
+                    elements.extend(elements_b[j:stop])
+                    j = stop
+                    count_b = 0
             else:
-                merged[index] = element_a
-                element_a = next(iterator_a, None)
+                keys.append(keys_a[i])
+                elements.append(elements_a[i])
+                i += 1
+                count_a += 1
+                count_b = 0
+
+                if count_a >= MIN_GALLOP:
+                    stop = gallop_right(keys_a, keys_b[j], i, length_a)
+                    keys.extend(keys_a[i:stop])
+                    elements.extend(elements_a[i:stop])
+                    i = stop
+                    count_a = 0
+
+        keys.extend(keys_a[i:])
+        elements.extend(elements_a[i:])
+        keys.extend(keys_b[j:])
+        elements.extend(elements_b[j:])
+        return keys, elements
+
+
+class ExternalSorter:
+    """A pipe-line sort for more elements than fit in memory. Elements are
+    sorted by a Sorter until the memory budget is reached, then the sorted
+    run is spilled to a temporary file and the next run begins. Once every
+    element is consumed, the runs are merged from disk a block at a time.
+
+    Each spilled run holds records of SPILL_BLOCK_SIZE elements, pickled
+    together and prefixed by their length, so reading a run never holds more
+    than one block of it. Only the elements are spilled, and their keys are
+    taken again as they are merged, so elements must be picklable. Plain
+    records, such as the rows read from the output files, suit best.
+
+    Attributes:
+        _comparator: Compares two elements, if no key function was given.
+        _key: Gets the key of an element, or None to use the comparator.
+        _budget: The most elements held in memory before spilling.
+        _directory: The directory to spill runs to, or None for the default
+                    temporary directory.
+        _sorter: Sorts the elements of the current run.
+        _count: The number of elements in the current run.
+        _files: The temporary files of every spilled run, in order.
+    """
 
-            index += 1
+    def __init__(self, comparator=lambda a, b: a - b, key=None, budget=SORT_MEMORY_BUDGET, directory=None):
+        """Creates an external sorter, ordering elements as a Sorter would.
 
-        while element_a is not None:
-            merged[index] = element_a
-            element_a = next(iterator_a, None)
-            index += 1
+        :param comparator: Compares two elements, if no key function is given.
+        :param key: Gets the key of an element, with elements sorted by
+                    ascending key.
+        :param budget: The most elements held in memory before spilling.
+        :param directory: The directory to spill runs to, or None for the
+                          default temporary directory.
+        """
+        self._comparator = comparator
+        self._key = key
+        self._budget = max(1, budget)
+        self._directory = directory
+        self._sorter = Sorter(comparator, key)
+        self._count = 0
+        self._files = []
+
+    def consume(self, x):
+        """Consumes the next element, spilling the current run to disk once
+        it reaches the memory budget.
+
+        :param x: The element to consume.
+        :return: None
+        """
+        self._sorter.consume(x)
+        self._count += 1
 
-        while element_b is not None:
-            merged[index] = element_b
-            element_b = next(iterator_b, None)
-            index += 1
+        if self._count >= self._budget:
+            self._spill()
 
-        return merged
+    def _spill(self):
+        """Sorts the current run, writes it to a temporary file and starts the
+        next run.
+
+        :return: None
+        """
+        elements = self._sorter.sort()
+        the_file = tempfile.TemporaryFile(dir=self._directory)
 
+        for start in range(0, len(elements), SPILL_BLOCK_SIZE):
+            block = pickle.dumps(elements[start:start + SPILL_BLOCK_SIZE], pickle.HIGHEST_PROTOCOL)
+            the_file.write(SPILL_HEADER.pack(len(block)))
+            the_file.write(block)
 
-def next_run(iterator):
-    """Finds the next run in the tree iterator.
+        self._files.append(the_file)
+        self._sorter = Sorter(self._comparator, self._key)
+        self._count = 0
 
-    :param iterator: The 'runs' tree iterator.
-    :return: The next element in the tree iterator, otherwise None.
+    def sort(self):
+        """Sorts every element consumed. Elements of equal key keep the order
+        they were consumed in, as every run is stable and earlier runs are
+        merged first on equal keys.
+
+        :return: The iterator of sorted elements, which reads the spilled runs
+                 as it goes and closes them once exhausted.
+        """
+        if len(self._files) == 0:
+            return iter(self._sorter.sort())
+
+        if self._count > 0:
+            self._spill()
+
+        runs = [read_spilled_run(the_file) for the_file in self._files]
+        key = self._key if self._key is not None else cmp_to_key(self._comparator)
+        self._files = []
+        return merge_sorted(runs, key)
+
+
+def parallel_sort(items, key, workers=SORT_WORKERS, threshold=PARALLEL_SORT_THRESHOLD):
+    """Sorts items by key, with a pool of worker processes once there are at
+    least threshold items. The keys are split into ranges by splitters picked
+    from a sample of the keys, and each worker sorts the keys of one range.
+    The ranges are disjoint, so the sorted ranges are joined end to end with
+    no merging. Only the keys are sent to the workers, which give back the
+    order of the indices of their range, so the items themselves are never
+    pickled. The sort is stable.
+
+    When NumPy is installed and the keys are numbers of one type, the keys are
+    sorted by a stable NumPy sort, here when there is one worker or fewer than
+    threshold items. Otherwise the keys are laid out in shared memory, where
+    each worker picks out its own range, sorts it and writes its order at the
+    offset of the range. Keys of any other type are sorted here by pipe sort,
+    or split into ranges here, with each worker sent the keys of its range.
+
+    :param items: The items to sort.
+    :param key: Gets the key of an item, with items sorted by ascending key.
+    :param workers: The number of worker processes.
+    :param threshold: The fewest items sorted by the workers, with fewer
+                      sorted here.
+    :return: The sorted list of items.
     """
-    run_tuple = next(iterator, None)
-    return run_tuple[1] if run_tuple else None
+    keys = [key(item) for item in items]
+    array = numeric_keys(keys)
+
+    if workers <= 1 or len(keys) < max(threshold, 2):
+        if array is not None:
+            order = np.argsort(array, kind='stable').tolist()
+        else:
+            order = sort_key_chunk(keys, 0)
+
+        return [items[index] for index in order]
+
+    if array is not None:
+        order = shared_argsort(array, workers).tolist()
+    else:
+        order = partition_argsort(keys, workers)
+
+    return [items[index] for index in order]
+
+
+def numeric_keys(keys):
+    """Lays out keys in a NumPy array, when NumPy is installed and every key is
+    a number of the same type. Ints and floats mixed together would all become
+    floats, which do not keep the exact order of ints above 2 ** 53, and ints
+    too large for 64 bits do not fit at all, so neither is laid out.
+
+    :param keys: The keys.
+    :return: The NumPy array of keys, otherwise None.
+    """
+    if np is None or not keys:
+        return None
+
+    kind = type(keys[0])
+
+    if kind is not int and not issubclass(kind, (float, np.integer, np.floating)):
+        return None
+
+    if any(type(key) is not kind for key in keys):
+        return None
+
+    try:
+        return np.array(keys, np.int64 if kind is int else None)
+    except OverflowError:
+        return None
+
+
+def pick_splitters(sample, workers):
+    """Picks the keys splitting a sorted sample of keys into ranges of about
+    the same size, one for each worker. A key repeated across several ranges
+    is only picked once, so fewer ranges are left when keys repeat often, and
+    equal keys always fall in the same range.
+
+    :param sample: The sorted sample of keys.
+    :param workers: The number of worker processes.
+    :return: The splitters in ascending order, each the lowest key of the
+             range following it.
+    """
+    splitters = []
+
+    for i in range(1, workers):
+        splitter = sample[len(sample) * i // workers]
+
+        if len(splitters) == 0 or splitters[-1] < splitter:
+            splitters.append(splitter)
+
+    return splitters
+
+
+def shared_argsort(array, workers):
+    """Sorts the indices of a NumPy array of keys in worker processes, each
+    reading the keys from shared memory and sorting one range of them. Each
+    worker writes its order into shared memory at the offset of its range,
+    so the order is complete once every worker is done.
+
+    :param array: The keys.
+    :param workers: The number of worker processes.
+    :return: The NumPy array of the indices of the keys in order of key.
+    """
+    sample = np.sort(array[::max(1, len(array) // (workers * SORT_SAMPLE_SIZE))])
+
+    # Not a number is never below or above any splitter, so it can not split ranges.
+    if array.dtype.kind == 'f':
+        sample = sample[~np.isnan(sample)]
+
+    splitters = pick_splitters(sample, workers) if len(sample) > 0 else []
+    lows = [None] + splitters
+    highs = splitters + [None]
+    memory = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+    order_memory = shared_memory.SharedMemory(create=True, size=max(1, len(array) * ORDER_WIDTH))
+
+    try:
+        shared = np.ndarray(array.shape, array.dtype, memory.buf)
+        shared[:] = array
+        del shared
+
+        with ProcessPoolExecutor(workers) as executor:
+            list(executor.map(sort_shared_range, (memory.name for low in lows), (order_memory.name for low in lows),
+                              (array.dtype.str for low in lows), (len(array) for low in lows), lows, highs))
+
+        order = np.ndarray((len(array),), np.int64, order_memory.buf).copy()
+    finally:
+        memory.close()
+        memory.unlink()
+        order_memory.close()
+        order_memory.unlink()
+
+    return order
+
+
+def sort_shared_range(name, order_name, dtype, length, low, high):
+    """Sorts the indices of the keys in shared memory within a range, and
+    writes them into the shared order at the offset of the range, which is
+    the number of keys below it. Runs in a worker process.
+
+    :param name: The name of the shared memory holding the keys.
+    :param order_name: The name of the shared memory holding the order.
+    :param dtype: The NumPy type of the keys.
+    :param length: The number of keys in the shared memory.
+    :param low: The lowest key of the range, or None if it has no lower bound.
+    :param high: The key just above the range, or None if it has no upper
+                 bound.
+    :return: The number of keys in the range.
+    """
+    memory = shared_memory.SharedMemory(name=name)
+    order_memory = shared_memory.SharedMemory(name=order_name)
+
+    try:
+        keys = np.ndarray((length,), np.dtype(dtype), memory.buf)
+        order = np.ndarray((length,), np.int64, order_memory.buf)
+        below = np.zeros(length, bool) if low is None else keys < low
+        inside = ~below if high is None else ~below & (keys < high)
+        indices = np.flatnonzero(inside)
+        start = int(np.count_nonzero(below))
+        order[start:start + len(indices)] = indices[np.argsort(keys[indices], kind='stable')]
+        del keys, order
+    finally:
+        memory.close()
+        order_memory.close()
+
+    return len(indices)
+
+
+def partition_argsort(keys, workers):
+    """Sorts the indices of keys in worker processes, splitting the keys into
+    ranges here, and sending each worker the keys of one range to sort.
+
+    :param keys: The keys.
+    :param workers: The number of worker processes.
+    :return: The indices of the keys in order of key.
+    """
+    sample = keys[::max(1, len(keys) // (workers * SORT_SAMPLE_SIZE))]
+    sample = [sample[index] for index in sort_key_chunk(sample, 0)]
+    splitters = pick_splitters(sample, workers)
+    ranges = [[] for i in range(0, len(splitters) + 1)]  # <the indices of the keys in each range, in order of index>
+
+    for index in range(0, len(keys)):
+        ranges[bisect_right(splitters, keys[index])].append(index)
+
+    with ProcessPoolExecutor(workers) as executor:
+        chunks = list(executor.map(sort_key_chunk, ([keys[index] for index in indices] for indices in ranges),
+                                   (0 for indices in ranges)))
+
+    order = []
+
+    for indices, chunk in zip(ranges, chunks):
+        order.extend(indices[position] for position in chunk)
+
+    return order
+
+
+def sort_key_chunk(keys, start):
+    """Sorts the indices of a chunk of keys by pipe sort. Runs in a worker
+    process, or here when sorting without workers.
+
+    :param keys: The keys of the chunk.
+    :param start: The index of the first key of the chunk.
+    :return: The indices of the chunk in order of key.
+    """
+    sorter = Sorter(key=lambda index: keys[index - start])
+
+    for index in range(start, start + len(keys)):
+        sorter.consume(index)
+
+    return sorter.sort()
+
+
+def gallop_right(keys, key, lo, hi):
+    """Finds the first index of sorted keys with a key greater than the given
+    key, probing 1, 3, 7, 15 ... places along before a binary search, so
+    nearby indices are found in few comparisons.
+
+    :param keys: The sorted keys.
+    :param key: The key to search for.
+    :param lo: The index to search from.
+    :param hi: The index to search to, exclusive.
+    :return: The index.
+    """
+    last = lo
+    offset = 1
+
+    while lo + offset < hi and not key < keys[lo + offset]:
+        last = lo + offset
+        offset = offset * 2 + 1
+
+    return bisect_right(keys, key, last, min(lo + offset, hi))
+
+
+def gallop_left(keys, key, lo, hi):
+    """Finds the first index of sorted keys with a key at least the given key,
+    probing 1, 3, 7, 15 ... places along before a binary search.
+
+    :param keys: The sorted keys.
+    :param key: The key to search for.
+    :param lo: The index to search from.
+    :param hi: The index to search to, exclusive.
+    :return: The index.
+    """
+    last = lo
+    offset = 1
+
+    while lo + offset < hi and keys[lo + offset] < key:
+        last = lo + offset
+        offset = offset * 2 + 1
+
+    return bisect_left(keys, key, last, min(lo + offset, hi))
+
+
+def merge_sorted(iterables, key=None, limit=None, reverse=False):
+    """Lazily merges already sorted iterables into a single sorted stream,
+    keeping the next element of each in a heap, in O(n log k) time for k
+    iterables. Elements of equal key come from earlier iterables first. An
+    element is only drawn from an iterable once the element before it has
+    been merged, so the top of a combined ranking reads the top of each
+    iterable alone.
+
+    :param iterables: The sorted iterables.
+    :param key: Gets the key of an element, or None to compare elements.
+    :param limit: The number of elements to merge before stopping, or None to
+                  merge every element.
+    :param reverse: True if every iterable is sorted by descending key.
+    :return: The iterator of merged elements.
+    """
+    merged = heapq.merge(*iterables, key=key, reverse=reverse)
+    return merged if limit is None else islice(merged, limit)
+
+
+def read_spilled_run(the_file):
+    """Reads the elements of a spilled run a block at a time, then closes the
+    file, which deletes it.
+
+    :param the_file: The temporary file of the run.
+    :return: The generator of the elements of the run.
+    """
+    try:
+        the_file.seek(0)
+
+        while True:
+            header = the_file.read(SPILL_HEADER.size)
+
+            if len(header) < SPILL_HEADER.size:
+                return
+
+            length, = SPILL_HEADER.unpack(header)
+            yield from pickle.loads(the_file.read(length))
+    finally:
+        the_file.close()
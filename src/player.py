@@ -1,4 +1,5 @@
 from hash_table import HashTable
+from leaderboard import win_rate
 from linked_list import List
 
 
@@ -11,6 +12,8 @@ class CircuitStats:
         losses: The number of losses the player has overall in this circuit.
         scores: All the score mappings the player has achieved this circuit.
         season_stats: All statistics for each season the player has.
+        leaderboard: The circuit leaderboard ranking these statistics, or None
+                     if it has not been built.
     """
 
     def __init__(self, player, wins=0, losses=0, points=0, scores=HashTable(), season_stats=HashTable()):
@@ -20,6 +23,7 @@ class CircuitStats:
         self.points = points
         self.scores = scores.clone()  # <score, count>
         self.season_stats = season_stats.clone()  # <season name, season stats>
+        self.leaderboard = None
 
     def __repr__(self):
         return '%s: %s' % (self.__class__.__name__, self.player)
@@ -33,6 +37,22 @@ class CircuitStats:
         count = self.scores.find((our_score, opponent_score), 0) + 1
         self.scores.insert((our_score, opponent_score), count)
 
+    def win(self):
+        """Counts a win, moving the player up the leaderboard if built."""
+        old_rate = win_rate(self)
+        self.wins += 1
+
+        if self.leaderboard is not None:
+            self.leaderboard.record_win(self, old_rate)
+
+    def loss(self):
+        """Counts a loss, moving the player on the leaderboard if built."""
+        old_rate = win_rate(self)
+        self.losses += 1
+
+        if self.leaderboard is not None:
+            self.leaderboard.record_loss(self, old_rate)
+
 
 class SeasonStats:
     """Player's statistics for a season.
@@ -45,6 +65,8 @@ class SeasonStats:
         losses: The number of losses the player has overall in this season.
         scores: All the score mappings the player has achieved this season.
         tournament_stats: All statistics for each tournament in this season the player has.
+        leaderboard: The season leaderboard ranking these statistics, or None
+                     if it has not been built.
     """
 
     def __init__(self, player, circuit: CircuitStats, points=0.0, wins=0, losses=0, scores=HashTable(),
@@ -56,6 +78,7 @@ class SeasonStats:
         self.losses = losses
         self.scores = scores.clone()  # <score, count>
         self.tournament_stats = tournament_stats.clone()  # <tournament name, tournament stats>
+        self.leaderboard = None
 
     def __repr__(self):
         return '%s: %s' % (self.__class__.__name__, self.player)
@@ -70,6 +93,28 @@ class SeasonStats:
         self.scores.insert((our_score, opponent_score), count)
         self.circuit.add_score(our_score, opponent_score)
 
+    def win(self):
+        """Counts a win for the season and circuit, moving the player up the
+        leaderboards if built.
+        """
+        old_rate = win_rate(self)
+        self.wins += 1
+        self.circuit.win()
+
+        if self.leaderboard is not None:
+            self.leaderboard.record_win(self, old_rate)
+
+    def loss(self):
+        """Counts a loss for the season and circuit, moving the player on the
+        leaderboards if built.
+        """
+        old_rate = win_rate(self)
+        self.losses += 1
+        self.circuit.loss()
+
+        if self.leaderboard is not None:
+            self.leaderboard.record_loss(self, old_rate)
+
 
 class TournamentStats:
     """Player's statistics for a tournament.
@@ -127,8 +172,7 @@ class TournamentStats:
         round this player has achieved.
         """
         self.wins += 1
-        self.season.wins += 1
-        self.season.circuit.wins += 1
+        self.season.win()
         self.round_achieved += 1
 
     def loss(self):
@@ -136,8 +180,94 @@ class TournamentStats:
         decrementing the tournament, season and circuit losses.
         """
         self.losses += 1
-        self.season.losses += 1
-        self.season.circuit.losses += 1
+        self.season.loss()
+
+
+def stored_column(name):
+    """Creates a property which reads and writes a statistic in the column of
+    the same name, at the row of the statistics view.
+
+    :param name: The name of the column.
+    :return: The property.
+    """
+
+    def get(self):
+        return getattr(self.columns, name)[self.row]
+
+    def set(self, value):
+        getattr(self.columns, name)[self.row] = value
+
+    return property(get, set)
+
+
+class CircuitStatsView(CircuitStats):
+    """Player's statistics for the entire circuit, with the wins, losses and
+    points kept in a row of a stats_store.StatsColumns.
+
+    Attributes:
+        columns: The columns holding these statistics.
+        row: The row of these statistics, the player's id.
+    """
+
+    wins = stored_column('wins')
+    losses = stored_column('losses')
+    points = stored_column('points')
+
+    def __init__(self, player, columns, row, scores=HashTable(), season_stats=HashTable()):
+        self.player = player
+        self.columns = columns
+        self.row = row
+        self.scores = scores.clone()  # <score, count>
+        self.season_stats = season_stats.clone()  # <season name, season stats>
+        self.leaderboard = None
+
+
+class SeasonStatsView(SeasonStats):
+    """Player's statistics for a season, with the points, wins and losses kept
+    in a row of a stats_store.StatsColumns.
+
+    Attributes:
+        columns: The columns holding these statistics.
+        row: The row of these statistics, the player's id.
+    """
+
+    points = stored_column('points')
+    wins = stored_column('wins')
+    losses = stored_column('losses')
+
+    def __init__(self, player, circuit: CircuitStats, columns, row, scores=HashTable(), tournament_stats=HashTable()):
+        self.player = player
+        self.circuit = circuit
+        self.columns = columns
+        self.row = row
+        self.scores = scores.clone()  # <score, count>
+        self.tournament_stats = tournament_stats.clone()  # <tournament name, tournament stats>
+        self.leaderboard = None
+
+
+class TournamentStatsView(TournamentStats):
+    """Player's statistics for a tournament, with the round achieved,
+    multiplier, points, wins and losses kept in a row of a
+    stats_store.StatsColumns.
+
+    Attributes:
+        columns: The columns holding these statistics.
+        row: The row of these statistics, the player's id.
+    """
+
+    round_achieved = stored_column('round_achieved')
+    multiplier = stored_column('multiplier')
+    points = stored_column('points')
+    wins = stored_column('wins')
+    losses = stored_column('losses')
+
+    def __init__(self, player, season: SeasonStats, columns, row, scores=HashTable(), opponent_scores=List()):
+        self.player = player
+        self.season = season
+        self.columns = columns
+        self.row = row
+        self.scores = scores.clone()  # <score, count>
+        self.opponent_scores = opponent_scores.clone()
 
 
 class Player:
@@ -148,11 +278,14 @@ class Player:
         name: The name of the player.
         stats: The statistics the player has achieved throughout the circuit
                they are in.
+        player_id: The dense id of the player amongst players of the same
+                   gender, in the order they are listed in resources.
     """
 
-    def __init__(self, name, stats: CircuitStats = None):
+    def __init__(self, name, stats: CircuitStats = None, player_id=None):
         self.name = name
         self.stats = stats
+        self.player_id = player_id
 
     def __repr__(self):
         return '%s' % self.name
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+
+"""
+
+Computes the ranking points of many players of a track at once, such as every
+player eliminated in a round, or every player of a tournament when rescoring.
+Uses NumPy to score all players together when it is installed, falling back
+to scoring one player at a time in plain Python.
+
+"""
+
+from itertools import chain
+
+from config import MAX_ROUNDS, get_multiplier
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# The round scores are not added for the tournament winner, and not multiplied for the final loser.
+SEMI_FINAL = MAX_ROUNDS - 2
+
+
+def compute_points(gender, rounds, opponent_scores, ranking_points, difficulties):
+    """Computes the points of players of a track, from the ranking points of
+    each round they won, multiplied by how little their opponent scored.
+
+    :param gender: The gender of the track.
+    :param rounds: The round each player is scored at, which is the round
+                   they lost, or one beyond the final for the winner.
+    :param opponent_scores: The scores of the opponents each player beat, in
+                            order of round.
+    :param ranking_points: The points for winning each round, in order of
+                           round.
+    :param difficulties: The difficulty factor applied to the total of each
+                         player, or None to leave their total unchanged.
+    :return: The points of each player.
+    """
+    if np is None or len(rounds) == 0:
+        return [player_points(gender, track_round, scores, ranking_points, difficulty)
+                for track_round, scores, difficulty in zip(rounds, opponent_scores, difficulties)]
+
+    return array_points(gender, rounds, opponent_scores, ranking_points, difficulties)
+
+
+def player_points(gender, track_round, opponent_scores, ranking_points, difficulty):
+    """Computes the points of a single player.
+
+    :param gender: The gender of the track.
+    :param track_round: The round the player is scored at.
+    :param opponent_scores: The scores of the opponents the player beat.
+    :param ranking_points: The points for winning each round.
+    :param difficulty: The difficulty factor, or None for no factor.
+    :return: The points of the player.
+    """
+    total_points = 0
+    ranking_points_iterator = iter(ranking_points)
+    opponent_scores_iterator = iter(opponent_scores)
+
+    for i in range(0, max(0, track_round - 1)):
+        points = next(ranking_points_iterator)
+        loser_score = next(opponent_scores_iterator)
+
+        # Do not add semi-finals score to the winner.
+        if track_round > MAX_ROUNDS and i == SEMI_FINAL:
+            continue
+
+        # Do not apply multiplier for semi-finals scores.
+        if track_round == MAX_ROUNDS and i == SEMI_FINAL:
+            multiplier = 1.0
+        else:
+            multiplier = get_multiplier(gender, loser_score)
+
+        total_points += points * multiplier
+
+    if difficulty is not None:
+        total_points *= difficulty
+
+    return total_points
+
+
+def array_points(gender, rounds, opponent_scores, ranking_points, difficulties):
+    """Computes the points of every player at once with NumPy, with one row
+    per player and one column per round.
+
+    :param gender: The gender of the track.
+    :param rounds: The round each player is scored at.
+    :param opponent_scores: The scores of the opponents each player beat.
+    :param ranking_points: The points for winning each round.
+    :param difficulties: The difficulty factor of each player, or None.
+    :return: The points of each player.
+    """
+    count = len(rounds)
+    scores = np.zeros((count, MAX_ROUNDS), dtype=np.intp)
+
+    # Scatter every score into its row and column from one flat array.
+    lengths = np.fromiter((len(player_scores) for player_scores in opponent_scores), dtype=np.intp, count=count)
+    flat = np.fromiter(chain.from_iterable(opponent_scores), dtype=np.intp, count=int(lengths.sum()))
+    rows = np.repeat(np.arange(count), lengths)
+    columns = np.arange(len(flat)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    inside = columns < MAX_ROUNDS
+    scores[rows[inside], columns[inside]] = flat[inside]
+
+    # Look up the multiplier of every score at once.
+    table = np.array([get_multiplier(gender, score) for score in range(0, int(scores.max()) + 1)])
+    multipliers = table[scores]
+    track_rounds = np.array(rounds, dtype=np.intp)
+
+    # Only the rounds each player won count, without the semi-finals for the
+    # winner, or its multiplier for the final loser.
+    won = np.arange(MAX_ROUNDS) < (track_rounds - 1)[:, np.newaxis]
+
+    if SEMI_FINAL >= 0:
+        won[:, SEMI_FINAL] &= track_rounds <= MAX_ROUNDS
+        multipliers[track_rounds == MAX_ROUNDS, SEMI_FINAL] = 1.0
+
+    round_points = np.zeros(MAX_ROUNDS)
+    points = list(ranking_points)[:MAX_ROUNDS]
+    round_points[:len(points)] = points
+    totals = np.where(won, multipliers * round_points, 0.0).sum(axis=1)
+    factors = np.array([1.0 if difficulty is None else difficulty for difficulty in difficulties])
+    return (totals * factors).tolist()
@@ -6,6 +6,7 @@ A red-black order statistic tree that supports multiple values per key.
 
 """
 
+from hash_table import HashTable
 from linked_list import List
 
 # Defines the red and black values for the tree nodes.
@@ -24,7 +25,8 @@ class Node:
         parent: The parent of this node.
         left: The left child of this node.
         right: The right child of this node.
-        size: The number of descendants this node holds, including itself.
+        size: The number of values held by this node and its descendants.
+        count: The number of nodes in this subtree, including itself.
     """
 
     def __init__(self, key):
@@ -35,6 +37,7 @@ class Node:
         self.left = None
         self.right = None
         self.size = 1
+        self.count = 1
 
 
 class Tree:
@@ -42,13 +45,17 @@ class Tree:
 
     Attributes:
         _root: The root node of this tree.
-        _size: The number of nodes currently stored in the tree.
+        _size: The number of values currently stored in the tree.
+        _handles: Maps the identity of each stored value to its key and the
+                  list node holding it, so values may be deleted from crowded
+                  nodes without scanning.
     """
 
     def __init__(self, comparator=lambda a, b: a - b):
         self._compare = comparator
         self._root = None
         self._size = 0
+        self._handles = HashTable()
 
     def __len__(self):
         return self._size
@@ -75,20 +82,7 @@ class Tree:
             for element in node.values:
                 yield (node.key, element)
 
-            if node.right is not None:
-                node = node.right
-                while node.left is not None:
-                    node = node.left
-                continue
-
-            parent = parent_of(node)
-            child = node
-
-            while parent is not None and child == right_of(parent):
-                child = parent
-                parent = parent_of(parent)
-
-            node = parent
+            node = successor_of(node)
 
     def __str__(self):
         if self._size == 0:
@@ -99,6 +93,110 @@ class Tree:
         target = target[:-2] + ']'
         return target
 
+    @classmethod
+    def from_sorted(cls, pairs, comparator=lambda a, b: a - b):
+        """Builds a new tree from key and value pairs that are already sorted.
+
+        Groups all neighbouring pairs sharing a key into a single node, then
+        builds a perfectly balanced tree bottom-up from the grouped nodes. All
+        nodes on the deepest level are colored red and the rest black, which
+        always satisfies the red-black properties for a balanced tree. Runs in
+        O(n) time as no searching, rotations or repairs are required.
+
+        :param pairs: The (key, value) pairs, sorted in comparator order.
+        :param comparator: How two keys should be compared.
+        :return: The newly built tree.
+        """
+        tree = cls(comparator)
+        nodes = []
+        node = None
+
+        for key, value in pairs:
+            if key is None or value is None:
+                raise ValueError('Keys and values are not allowed to be of type None')
+
+            comparison = 1 if node is None else comparator(key, node.key)
+
+            if comparison < 0:
+                raise ValueError('Pairs must be sorted to build a tree from them')
+
+            # Start a new node for every distinct key.
+            if comparison > 0:
+                node = Node(key)
+                nodes.append(node)
+
+            tree.__add_handle(key, value, node.values.append(value))
+            tree._size += 1
+
+        # Only the deepest level of a balanced tree may be incomplete.
+        red_depth = len(nodes).bit_length() - 1
+        tree._root = cls.__build_balanced(nodes, 0, len(nodes), 0, red_depth)
+
+        if tree._root is not None:
+            tree._root.color = BLACK
+
+        return tree
+
+    @classmethod
+    def bulk_load(cls, pairs, comparator=lambda a, b: a - b, key=None):
+        """Builds a new tree from unsorted key and value pairs.
+
+        Sorts all pairs once using pipe sort, then builds the tree bottom-up.
+        Runs in O(n log n) time, or O(n) time when the pairs contain long
+        sorted runs.
+
+        :param pairs: The (key, value) pairs, in any order.
+        :param comparator: How two keys should be compared.
+        :param key: Gets a sort key of each tree key, in the same order as the
+                    comparator, so that many pairs may be sorted in parallel.
+        :return: The newly built tree.
+        """
+        from pipe_sort import Sorter, parallel_sort
+
+        if key is not None:
+            return cls.from_sorted(parallel_sort(list(pairs), lambda pair: key(pair[0])), comparator)
+
+        sorter = Sorter(lambda a, b: comparator(a[0], b[0]))
+
+        for pair in pairs:
+            sorter.consume(pair)
+
+        return cls.from_sorted(sorter.sort(), comparator)
+
+    @staticmethod
+    def __build_balanced(nodes, start, end, depth, red_depth):
+        """Links a range of sorted nodes into a balanced subtree.
+
+        :param nodes: All sorted nodes of the tree being built.
+        :param start: The first index of the range, inclusive.
+        :param end: The last index of the range, exclusive.
+        :param depth: The depth of the subtree root within the tree.
+        :param red_depth: The depth at which all nodes should be red.
+        :return: The root node of the subtree, or None if the range is empty.
+        """
+        if start >= end:
+            return None
+
+        middle = (start + end) // 2
+        node = nodes[middle]
+        node.left = Tree.__build_balanced(nodes, start, middle, depth + 1, red_depth)
+        node.right = Tree.__build_balanced(nodes, middle + 1, end, depth + 1, red_depth)
+        node.color = RED if depth == red_depth else BLACK
+        node.size = len(node.values)
+        node.count = 1
+
+        if node.left is not None:
+            node.left.parent = node
+            node.size += node.left.size
+            node.count += node.left.count
+
+        if node.right is not None:
+            node.right.parent = node
+            node.size += node.right.size
+            node.count += node.right.count
+
+        return node
+
     def insert(self, key, value):
         """Inserts a new node into the tree.
 
@@ -118,7 +216,7 @@ class Tree:
         # If tree does not already contain a root, simply add one in.
         if self._root is None:
             self._root = Node(key)
-            self._root.values.append(value)
+            self.__add_handle(key, value, self._root.values.append(value))
             self._size = 1
             return True
 
@@ -134,7 +232,7 @@ class Tree:
 
             # Update node then return if same key already exists.
             if comparison == 0:
-                parent.values.append(value)
+                self.__add_handle(key, value, parent.values.append(value))
                 return False
 
             # Otherwise keep searching for a free spot in the tree.
@@ -151,7 +249,12 @@ class Tree:
 
         # Update the node with its new parent and value.
         node.parent = parent
-        node.values.append(value)
+        self.__add_handle(key, value, node.values.append(value))
+
+        # Increment the node count of all ancestors.
+        while parent is not None:
+            parent.count += 1
+            parent = parent.parent
 
         # Fix the tree structure.
         self.__insert_repair(node)
@@ -261,52 +364,216 @@ class Tree:
         return None
 
     def select(self, index):
-        """Finds the values of the node at the specified index.
+        """Finds the value at the specified index, counting every value of
+        every node in order.
 
         :param index: The position in this tree.
-        :return: The node's values if found, otherwise None.
+        :return: The value at the index.
         """
 
         if index < 0 or index >= self._size:
             raise ValueError('Index out of bounds')
 
+        node, offset = self.__select_node(index)
+        return node.values.select(offset)
+
+    def rank(self, key, dense=False):
+        """Finds the index of the node mapped by the provided key.
+
+        Values sharing a key are tied. By default the competition ranking is
+        given, which is the number of values before the key, so ties share the
+        index of the first tied value and the following index is skipped for
+        each extra tie. A dense ranking instead counts the number of distinct
+        keys before the key, so no indices are skipped.
+
+        :param key: The key of the node to fetch the index of.
+        :param dense: Whether to give the dense ranking.
+        :return: The index if this tree contains the key, otherwise None.
+        """
+        node = self.__find_node(key)
+
+        if node is None:
+            return None
+
+        if dense:
+            index = node.left.count if node.left else 0
+        else:
+            index = node.left.size if node.left else 0
+
+        while node.parent is not None:
+            if node.parent.left is not node:
+                if dense:
+                    if node.parent.left is not None:
+                        index += node.parent.left.count
+                    index += 1
+                else:
+                    if node.parent.left is not None:
+                        index += node.parent.left.size
+                    index += len(node.parent.values)
+            node = node.parent
+
+        return index
+
+    def rank_of(self, value, dense=False):
+        """Finds the index of a value stored in this tree, using the value's
+        handle to find its key in O(1) time and its index in O(log n) time.
+
+        :param value: The stored value to fetch the index of.
+        :param dense: Whether to give the dense ranking, see rank.
+        :return: The index if this tree contains the value, otherwise None.
+        """
+        handle = self._handles.find(id(value))
+
+        if handle is None:
+            return None
+
+        return self.rank(handle[0], dense)
+
+    def key_of(self, value):
+        """Finds the key a value is stored under in O(1) time.
+
+        :param value: The stored value.
+        :return: The key if this tree contains the value, otherwise None.
+        """
+        handle = self._handles.find(id(value))
+        return handle[0] if handle is not None else None
+
+    def iter_from_rank(self, start):
+        """Lazily iterates over the key and value pairs of this tree, starting
+        from the value at the provided index. Finds the starting position in
+        O(log n) time using the node sizes.
+
+        :param start: The index of the first value to produce.
+        :return: A generator of (key, value) pairs in order.
+        """
+        if start < 0:
+            raise ValueError('Index out of bounds')
+
+        if start >= self._size:
+            return
+
+        node, offset = self.__select_node(start)
+
+        while node is not None:
+            for element in node.values:
+                if offset > 0:
+                    offset -= 1
+                    continue
+                yield (node.key, element)
+
+            node = successor_of(node)
+
+    def top(self, k):
+        """Lazily iterates over the first k key and value pairs of this tree.
+
+        :param k: The maximum number of pairs to produce.
+        :return: A generator of at most k (key, value) pairs in order.
+        """
+        if k <= 0:
+            return
+
+        for pair in self.iter_from_rank(0):
+            yield pair
+            k -= 1
+            if k == 0:
+                return
+
+    def range(self, min_key, max_key):
+        """Lazily iterates over all key and value pairs with keys from min_key
+        to max_key inclusive, where both bounds follow the comparator order.
+
+        :param min_key: The first key to include.
+        :param max_key: The last key to include.
+        :return: A generator of (key, value) pairs in order.
+        """
+        node = self.__lower_bound(min_key)
+
+        while node is not None and self._compare(node.key, max_key) <= 0:
+            for element in node.values:
+                yield (node.key, element)
+
+            node = successor_of(node)
+
+    def count_between(self, min_key, max_key):
+        """Counts all values with keys from min_key to max_key inclusive, where
+        both bounds follow the comparator order. Runs in O(log n) time.
+
+        :param min_key: The first key to include.
+        :param max_key: The last key to include.
+        :return: The number of values within the range.
+        """
+        if self._compare(min_key, max_key) > 0:
+            return 0
+
+        return self.__count_before(max_key, True) - self.__count_before(min_key, False)
+
+    def __select_node(self, index):
+        """Finds the node holding the value at the specified index.
+
+        :param index: The position in this tree.
+        :return: The node, and the position of the value within the node.
+        """
         node = self._root
 
         while node is not None:
             size = node.left.size if node.left else 0
 
-            if index == size:
-                return node.values
-
             if index < size:
                 node = node.left
+            elif index < size + len(node.values):
+                return node, index - size
             else:
                 index -= size + len(node.values)
                 node = node.right
 
-        return List()
+        return None, 0
 
-    def rank(self, key):
-        """Finds the index of the node mapped by the provided key.
+    def __lower_bound(self, key):
+        """Finds the first node with a key no smaller than the provided key.
 
-        :param key: The key of the node to fetch the index of.
-        :return: The index if this tree contains the key, otherwise None.
+        :param key: The key to search for.
+        :return: The first matching node if found, otherwise None.
         """
-        node = self.__find_node(key)
+        if key is None:
+            raise ValueError('Keys are not allowed to be of type None')
 
-        if node is None:
-            return None
+        node = self._root
+        target = None
 
-        index = node.left.size if node.left else 0
+        while node is not None:
+            if self._compare(node.key, key) >= 0:
+                target = node
+                node = node.left
+            else:
+                node = node.right
 
-        while node.parent is not None:
-            if node.parent.left is not node:
-                if node.parent.left is not None:
-                    index += node.parent.left.size
-                index += len(node.parent.values)
-            node = node.parent
+        return target
 
-        return index
+    def __count_before(self, key, inclusive):
+        """Counts all values with keys before the provided key.
+
+        :param key: The key to count up to.
+        :param inclusive: Whether values under the key itself are counted.
+        :return: The number of values before the key.
+        """
+        if key is None:
+            raise ValueError('Keys are not allowed to be of type None')
+
+        node = self._root
+        count = 0
+
+        while node is not None:
+            comparison = self._compare(key, node.key)
+
+            if comparison > 0 or (inclusive and comparison == 0):
+                count += len(node.values)
+                if node.left is not None:
+                    count += node.left.size
+                node = node.right
+            else:
+                node = node.left
+
+        return count
 
     def delete(self, key, value):
         """Deletes the node with the provided key.
@@ -328,6 +595,20 @@ class Tree:
         if node is None:
             return False
 
+        return self.__delete_value(node, value)
+
+    def __delete_value(self, node: Node, value):
+        """Deletes a value from a node, removing the node from the tree once
+        it no longer holds any values.
+
+        :param node: The node holding the value.
+        :param value: The value to delete.
+        :return: True if the node held the value, otherwise False.
+        """
+
+        if not self.__remove_value(node, value):
+            return False
+
         # Decrement the size globally and of all ancestors.
         self._size -= 1
         temp = node.parent
@@ -335,11 +616,9 @@ class Tree:
             temp.size -= 1
             temp = temp.parent
 
-        node.values.delete(value)
-
         if len(node.values) > 0:
             node.size -= 1
-            return
+            return True
 
         if node.left is not None and node.right is not None:
             # Find the successor to this node.
@@ -365,6 +644,12 @@ class Tree:
             node.values = successor.values
             node = successor
 
+        # Decrement the node count of all ancestors of the removed node.
+        temp = node.parent
+        while temp is not None:
+            temp.count -= 1
+            temp = temp.parent
+
         # Find the replacement.
         replacement = node.left if node.left is not None else node.right
 
@@ -383,12 +668,12 @@ class Tree:
                 # Perform deletion fixes.
                 self.__delete_repair(replacement)
 
-            return
+            return True
 
         # No replacement or parent found, this must be the new root node.
         if node.parent is None:
             self._root = None
-            return
+            return True
 
         if node.color == BLACK:
             # Perform deletion repairs.
@@ -401,6 +686,96 @@ class Tree:
             elif node is node.parent.right:
                 node.parent.right = None
 
+        return True
+
+    def __add_handle(self, key, value, list_node):
+        """Remembers where a value is stored, unless the same value is already
+        stored elsewhere in this tree.
+
+        :param key: The key the value is stored under.
+        :param value: The stored value.
+        :param list_node: The node of the values list holding the value.
+        :return: None
+        """
+        if self._handles.find(id(value)) is None:
+            self._handles.insert(id(value), (key, list_node))
+
+    def __remove_value(self, node: Node, value):
+        """Removes a value from the values list of a node. Uses the value's
+        handle when it is stored in this node, otherwise searches the list.
+
+        :param node: The node holding the value.
+        :param value: The value to remove.
+        :return: True if the value was removed, otherwise False.
+        """
+        handle = self._handles.find(id(value))
+
+        if handle is not None and self._compare(handle[0], node.key) == 0:
+            list_node = handle[1]
+        else:
+            list_node = node.values.find_node(value)
+
+            if list_node is None:
+                return False
+
+            # An equal value may have been found in place of the given one.
+            handle = self._handles.find(id(list_node.item))
+
+            if handle is None or handle[1] is not list_node:
+                node.values.delete_node(list_node)
+                return True
+
+        self._handles.delete(id(list_node.item))
+        node.values.delete_node(list_node)
+        return True
+
+    def update_key(self, old_key, new_key, value):
+        """Moves a value from one key to another.
+
+        When the value is the only one held by its node, and the new key still
+        falls strictly between the keys of the node's in-order neighbours, the
+        node is re-keyed in place. The tree order is unchanged, so no
+        rebalancing is required. Otherwise the value is deleted from its node
+        and inserted again under the new key.
+
+        :param old_key: The key the value is currently stored under.
+        :param new_key: The key to move the value to.
+        :param value: The value to move.
+        :return: True if the value was found and moved, otherwise False.
+        """
+
+        if new_key is None:
+            raise ValueError('Keys are not allowed to be of type None')
+
+        node = self.__find_node(old_key)
+
+        if node is None:
+            return False
+
+        if self._compare(new_key, node.key) == 0:
+            return node.values.contains(value)
+
+        if len(node.values) == 1 and node.values.first() == value:
+            predecessor = predecessor_of(node)
+            successor = successor_of(node)
+
+            if (predecessor is None or self._compare(new_key, predecessor.key) > 0) and \
+                    (successor is None or self._compare(new_key, successor.key) < 0):
+                handle = self._handles.find(id(value))
+
+                if handle is not None and self._compare(handle[0], node.key) == 0:
+                    self._handles.insert(id(value), (new_key, handle[1]))
+
+                node.key = new_key
+
+                return True
+
+        if not self.__delete_value(node, value):
+            return False
+
+        self.insert(new_key, value)
+        return True
+
     def __delete_repair(self, node: Node):
         """Performs red-black tree deletion repairs.
 
@@ -506,10 +881,12 @@ class Tree:
         pivot = root.right
         root.right = pivot.left
         pivot_left_size = 0
+        pivot_left_count = 0
 
         if pivot.left is not None:
             pivot.left.parent = root
             pivot_left_size = pivot.left.size
+            pivot_left_count = pivot.left.count
 
         pivot.parent = root.parent
 
@@ -523,8 +900,11 @@ class Tree:
         pivot.left = root
         root.size -= pivot.size
         pivot.size += root.size
+        root.count -= pivot.count
+        pivot.count += root.count
 
         root.size += pivot_left_size
+        root.count += pivot_left_count
         root.parent = pivot
 
     def __rotate_right(self, root: Node):
@@ -544,10 +924,12 @@ class Tree:
         pivot = root.left
         root.left = pivot.right
         pivot_right_size = 0
+        pivot_right_count = 0
 
         if pivot.right is not None:
             pivot.right.parent = root
             pivot_right_size = pivot.right.size
+            pivot_right_count = pivot.right.count
 
         pivot.parent = root.parent
 
@@ -561,8 +943,11 @@ class Tree:
         pivot.right = root
         root.size -= pivot.size
         pivot.size += root.size
+        root.count -= pivot.count
+        pivot.count += root.count
 
         root.size += pivot_right_size
+        root.count += pivot_right_count
         root.parent = pivot
 
 
@@ -589,3 +974,45 @@ def left_of(node: Node):
 
 def right_of(node: Node):
     return node.right if node is not None else None
+
+
+def successor_of(node: Node):
+    """Finds the next node in order after the provided node.
+
+    :param node: The node to start from.
+    :return: The in-order successor if found, otherwise None.
+    """
+    if node.right is not None:
+        node = node.right
+        while node.left is not None:
+            node = node.left
+        return node
+
+    parent = parent_of(node)
+
+    while parent is not None and node is right_of(parent):
+        node = parent
+        parent = parent_of(parent)
+
+    return parent
+
+
+def predecessor_of(node: Node):
+    """Finds the previous node in order before the provided node.
+
+    :param node: The node to start from.
+    :return: The in-order predecessor if found, otherwise None.
+    """
+    if node.left is not None:
+        node = node.left
+        while node.right is not None:
+            node = node.right
+        return node
+
+    parent = parent_of(node)
+
+    while parent is not None and node is left_of(parent):
+        node = parent
+        parent = parent_of(parent)
+
+    return parent
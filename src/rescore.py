@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+
+"""
+
+Recomputes the points of every player from the rounds they achieved and the
+scores of the opponents they beat, so that changes to the ranking points or
+tournament difficulties in resources apply to every season already played.
+
+"""
+
+from circuit import Circuit
+from config import LOADER_WORKERS, SEASON_CACHE_SIZE
+from hash_table import HashTable
+from linked_list import List
+from loader import compact_circuit, load_ranking_points, load_season, load_seasons, load_tournament_types, save_season
+
+
+def rescore_circuit(circuit: Circuit, workers=LOADER_WORKERS):
+    """Reloads the ranking points and tournament types from resources, then
+    rescores every season of a circuit. Seasons are loaded in batches, parsed
+    by worker processes when given more than one, and every scoreboard of a
+    changed season and of the circuit is rebuilt in bulk once rescored.
+
+    Season points are the sum of their tournament points, and circuit points
+    the sum of their season points, so both are totalled afresh rather than
+    adjusted, which also clears any rounding from the saved CSV files.
+
+    Each batch is saved once rescored, so that it may be evicted before the
+    next batch is loaded. Any unsaved progress is therefore saved first, so
+    the journal never replays matches over a season saved here.
+
+    :param circuit: The circuit to rescore.
+    :param workers: The number of worker processes loading the seasons.
+    :return: The number of tournament statistics whose points changed.
+    """
+    compact_circuit(circuit)
+    reload_points_tables(circuit)
+    seasons = list(circuit.ordered_seasons)
+    totals = HashTable()  # <(gender, player name), circuit points>
+    changed = 0
+
+    # Leave room in the season cache for the current and previous seasons,
+    # which are never evicted.
+    batch_size = max(1, SEASON_CACHE_SIZE - 2)
+
+    for start in range(0, len(seasons), batch_size):
+        batch = seasons[start:start + batch_size]
+        load_seasons(batch, workers)
+
+        for season in batch:
+            changed += rescore_season(season, totals)
+            save_rescored_season(season)
+
+        circuit.evict_seasons()
+
+    for gender in ('men', 'women'):
+        players = circuit.get_players(gender)
+
+        for name, player in players:
+            points = totals.find((gender, name), 0.0)
+
+            player.stats.points = points
+
+        scoreboard = Circuit.create_scoreboard((name, player.stats) for name, player in players)
+
+        if gender == 'men':
+            circuit.men_scoreboard = scoreboard
+        else:
+            circuit.women_scoreboard = scoreboard
+
+    return changed
+
+
+def reload_points_tables(circuit: Circuit):
+    """Replaces the ranking points of a circuit, and the difficulty and prizes
+    of each of its tournament types, with those in resources.
+
+    :param circuit: The circuit to update.
+    """
+    ranking_points = List()
+    load_ranking_points(ranking_points)
+    circuit.ranking_points = ranking_points
+    tournament_types = HashTable()
+    load_tournament_types(tournament_types)
+
+    for name, tournament_type in tournament_types:
+        existing = circuit.tournament_types.find(name)
+
+        if existing is None:
+            circuit.tournament_types.insert(name, tournament_type)
+        else:
+            existing.difficulty = tournament_type.difficulty
+            existing.prizes = tournament_type.prizes
+
+    # The tables are saved along with the circuit.
+    circuit.dirty = True
+
+
+def rescore_season(season, totals):
+    """Rescores every tournament of a season and totals the season points of
+    each player, then rebuilds both of its scoreboards if any points changed.
+
+    :param season: The season to rescore.
+    :param totals: The circuit points of each player, mapped by gender and
+                   name, to add the season points to.
+    :return: The number of tournament statistics whose points changed.
+    """
+    changed = 0
+
+    for name, tournament in season.tournaments:
+        for gender in ('men', 'women'):
+            changed += rescore_track(tournament, tournament.get_track(gender))
+
+    if changed > 0:
+        season.dirty = True
+
+    for gender in ('men', 'women'):
+        season_stats = season.get_stats(gender)
+
+        for name, stats in season_stats:
+            points = sum(tournament_stats.points for tournament_name, tournament_stats in stats.tournament_stats)
+            totals.insert((gender, name), totals.find((gender, name), 0.0) + points)
+
+            if points != stats.points:
+                stats.points = points
+                season.dirty = True
+
+        if season.dirty:
+            season.set_scoreboard(gender, Circuit.create_scoreboard(season_stats))
+
+    return changed
+
+
+def save_rescored_season(season):
+    """Saves a rescored season to its CSV files, so that it is no longer dirty
+    and may be evicted. A saved season is loaded from its CSV files from then
+    on, as any snapshot section it was restored from is now out of date.
+
+    :param season: The season to save.
+    """
+    if save_season(season) and season.loader is not None:
+        season.loader = load_season
+
+
+def rescore_track(tournament, track):
+    """Rescores every player of a track who has been scored, being those on the
+    track scoreboard, at the round they achieved.
+
+    :param tournament: The tournament of the track.
+    :param track: The track to rescore.
+    :return: The number of tournament statistics whose points changed.
+    """
+    players = list(track.scoreboard)
+    rounds = [stats.round_achieved for stats in players]
+    changed = 0
+
+    for stats, points in zip(players, tournament.score_players(track, players, rounds)):
+        if points != stats.points:
+            stats.points = points
+            changed += 1
+
+    if changed > 0:
+        track.dirty = True
+
+    return changed
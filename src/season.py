@@ -1,11 +1,37 @@
-from config import get_forfeit_score, get_winning_score
+from config import get_forfeit_score, get_winning_score, MAX_ROUNDS, SCOREBOARD_PAGE_SIZE
 from hash_table import HashTable
+from leaderboard import Leaderboard
 from linked_list import List
 from match import Track
-from player import TournamentStats, SeasonStats
+from pipe_sort import merge_sorted
+from player import TournamentStats, SeasonStats, TournamentStatsView
 from tournament import Tournament
 
 
+def loaded_field(name):
+    """Creates a property which reads and writes a field of a season, loading
+    the season first if it was deferred or evicted, and marking the season as
+    the most recently used.
+
+    :param name: The name of the field.
+    :return: The property.
+    """
+    field = '_' + name
+
+    def get(self):
+        if not self.loaded:
+            self.load()
+
+        self.circuit.season_clock += 1
+        self.last_used = self.circuit.season_clock
+        return getattr(self, field)
+
+    def set(self, value):
+        setattr(self, field, value)
+
+    return property(get, set)
+
+
 class Season:
     """A season, contains multiple tournaments and retains a scoreboard for
     both men and women player tracks.
@@ -18,19 +44,88 @@ class Season:
         women_stats: Maps all female player names to their season statistics.
         men_scoreboard: An array of male statistics for this season sorted by points.
         women_scoreboard: An array of female statistics for this season sorted by points.
+        dirty: True when the season progress or player statistics have changed
+               since they were last saved.
+        loader: Loads the statistics, scoreboards and tournaments of the season
+                when first used, or None if the season is always loaded.
+        loaded: True when the statistics, scoreboards and tournaments of the
+                season are in memory.
+        last_used: When the season was last used, by the clock of the circuit.
+        leaderboards: The wins, losses and win rate leaderboards of the
+                      season, mapped by gender, built when first used.
     """
 
-    def __init__(self, circuit, previous, name: str, complete: bool, men_stats, women_stats, men_scoreboard,
-                 women_scoreboard):
+    men_stats = loaded_field('men_stats')
+    women_stats = loaded_field('women_stats')
+    men_scoreboard = loaded_field('men_scoreboard')
+    women_scoreboard = loaded_field('women_scoreboard')
+    tournaments = loaded_field('tournaments')
+
+    def __init__(self, circuit, previous, name: str, complete: bool, men_stats=None, women_stats=None,
+                 men_scoreboard=None, women_scoreboard=None, loader=None):
         self.circuit = circuit
         self.previous = previous
         self.name = name
         self.complete = complete
+        self.dirty = False
+        self.loader = loader
+        self.loaded = loader is None
+        self.last_used = 0
         self.men_stats = men_stats
         self.women_stats = women_stats
         self.men_scoreboard = men_scoreboard
         self.women_scoreboard = women_scoreboard
         self.tournaments = HashTable()  # <tournament name, tournament>
+        self.leaderboards = HashTable()  # <gender, leaderboard>
+
+    def load(self, loader=None):
+        """Loads the statistics, scoreboards and tournaments of this season,
+        then evicts the least recently used seasons of the circuit beyond its
+        limit.
+
+        :param loader: Loads the season in place of its own loader, such as
+                       from files already parsed.
+        """
+        # The loader reads the fields it sets, which must not load again.
+        self.loaded = True
+
+        try:
+            (loader or self.loader)(self)
+        except BaseException:
+            # Discard whatever was loaded, so the season is loaded afresh when next used.
+            for gender in ('men', 'women'):
+                for name, player in self.circuit.get_players(gender):
+                    player.stats.season_stats.delete(self.name)
+
+            self.__clear()
+            raise
+
+        self.circuit.season_clock += 1
+        self.last_used = self.circuit.season_clock
+        self.circuit.evict_seasons(self)
+
+    def unload(self):
+        """Evicts the statistics, scoreboards and tournaments of this season
+        from memory, to be loaded again when next used. Only seasons with a
+        loader and no unsaved changes may be unloaded.
+        """
+        for gender in ('men', 'women'):
+            for name, stats in self.get_stats(gender):
+                stats.circuit.season_stats.delete(self.name)
+
+        self.__clear()
+
+    def __clear(self):
+        """Drops the statistics, scoreboards and tournaments of this season,
+        leaving it to be loaded when next used.
+        """
+        self._men_stats = None
+        self._women_stats = None
+        self._men_scoreboard = None
+        self._women_scoreboard = None
+        self._tournaments = None
+        self.leaderboards = HashTable()
+        self.loaded = False
 
     def run(self, tournament_name):
         """Runs the season, given a tournament name.
@@ -43,34 +138,52 @@ class Season:
             print('Starting a new tournament')
 
             # Check tournament type is valid.
-            tournament_type = self.circuit.tournament_types.find(tournament_name)
-
-            if tournament_type is None:
+            if self.circuit.tournament_types.find(tournament_name) is None:
                 print('A tournament by the name %s does not exist' % tournament_name)
                 return
 
-            # Create the tournament.
-            previous_tournament = None
-
-            if self.previous is not None:
-                previous_tournament = self.previous.tournaments.find(tournament_name)
-
-            tournament = Tournament(self, tournament_type, previous_tournament, False)
-            tournament.men_track = self.create_track(tournament, 'men')
-            tournament.women_track = self.create_track(tournament, 'women')
-
-            self.tournaments.insert(tournament_name, tournament)
+            tournament = self.create_tournament(tournament_name)
         else:
             print('Continuing tournament from saved progress')
 
         tournament.run()
 
         if len(self.tournaments) == len(self.circuit.tournament_types):
-            self.complete = True
+            self.complete_season()
             print('Season %s has successfully complete!' % self.name)
             self.print_scoreboard('men')
             self.print_scoreboard('women')
 
+    def create_tournament(self, tournament_name):
+        """Creates a new tournament of a given type in this season, and
+        records it in the circuit journal.
+
+        :param tournament_name: The name of the tournament type.
+        :return: The newly created tournament.
+        """
+        tournament_type = self.circuit.tournament_types.find(tournament_name)
+        tournament = Tournament(self, tournament_type, False)
+        tournament.men_track = self.create_track(tournament, 'men')
+        tournament.women_track = self.create_track(tournament, 'women')
+
+        self.tournaments.insert(tournament_name, tournament)
+        self.dirty = True
+
+        if self.circuit.journal is not None:
+            self.circuit.journal.commit(('tournament', self.name, tournament_name))
+
+        return tournament
+
+    def complete_season(self):
+        """Marks this season as complete, and records it in the circuit
+        journal.
+        """
+        self.complete = True
+        self.circuit.dirty = True
+
+        if self.circuit.journal is not None:
+            self.circuit.journal.commit(('complete', self.name))
+
     def create_track(self, tournament, gender):
         """Creates a new track for a given tournament and gender. Starts off
         with an empty scoreboard and mappings for the player stats.
@@ -79,30 +192,31 @@ class Season:
         :param gender: The gender of the track to create.
         :return: The newly created track.
         """
-        stats = HashTable()
+        players = self.circuit.get_players(gender)
+        stats = HashTable.with_capacity(len(players))
+        columns = self.circuit.open_columns((self.name, tournament.type.name), gender, True)
 
-        for player_name, player_profile in self.circuit.get_players(gender):
+        for player_name, player_profile in players:
             season_stats: SeasonStats = self.get_stats(gender).find(player_name)
-            tournament_stats = TournamentStats(player_profile, season_stats)
+
+            if columns is None:
+                tournament_stats = TournamentStats(player_profile, season_stats)
+            else:
+                tournament_stats = TournamentStatsView(player_profile, season_stats, columns, player_profile.player_id)
+
             season_stats.tournament_stats.insert(tournament.type.name, tournament_stats)
             stats.insert(player_name, tournament_stats)
 
         winning_score = get_winning_score(gender)
         forfeit_score = get_forfeit_score(gender)
 
-        previous_stats = None
-        previous_season_scoreboard = None
-
-        if tournament.previous is not None:
-            previous_stats = tournament.previous.get_track(gender).stats
-            previous_season_scoreboard = tournament.previous.season.get_scoreboard(gender)
-
         track_round = 1
         remaining = stats.clone()
         scoreboard = List()
 
-        return Track(gender, track_round, stats, remaining, winning_score, forfeit_score, scoreboard, previous_stats,
-                     previous_season_scoreboard)
+        track = Track(gender, track_round, stats, remaining, winning_score, forfeit_score, scoreboard, tournament)
+        track.dirty = True
+        return track
 
     def get_stats(self, gender):
         """Gets the season stat mappings for a given gender.
@@ -115,6 +229,22 @@ class Season:
     def get_scoreboard(self, gender):
         return self.men_scoreboard if gender == 'men' else self.women_scoreboard
 
+    def get_leaderboard(self, gender):
+        """Gets the wins, losses and win rate leaderboard for a given gender,
+        building it from the season stats when first used. It is then kept up
+        to date by every win and loss.
+
+        :param gender: The gender of the players.
+        :return: The leaderboard.
+        """
+        leaderboard = self.leaderboards.find(gender)
+
+        if leaderboard is None:
+            leaderboard = Leaderboard(self.get_stats(gender))
+            self.leaderboards.insert(gender, leaderboard)
+
+        return leaderboard
+
     def set_scoreboard(self, gender, scoreboard):
         """Updates the scoreboard for a given gender in the season.
 
@@ -126,15 +256,91 @@ class Season:
         else:
             self.women_scoreboard = scoreboard
 
-    def print_scoreboard(self, gender):
+    def print_scoreboard(self, gender, page=None):
         """Prints the scoreboard for the season, given the gender of the
         scoreboard track to print.
 
         :param gender: The gender of the track to use in printing the scoreboard.
+        :param page: The page of the scoreboard to print, or None to print the
+                     entire scoreboard.
         """
         print('Scoreboard for track %s in season %s' % (gender, self.name))
-        rank = 1
-        scoreboard = self.get_scoreboard(gender)
-        for points, stats in scoreboard:
-            print('#%d. %s at %.2f points' % (rank, stats.player.name, stats.points))
-            rank += 1
+        print_ranked_page(self.get_scoreboard(gender), page)
+
+    def print_combined_scoreboard(self, gender, page=None):
+        """Prints the track scoreboards of every tournament of the season as
+        one ranking by the round each player reached, merged lazily from the
+        track scoreboards, which are already in that order.
+
+        :param gender: The gender of the tracks.
+        :param page: The page of the ranking to print, or None to print the
+                     entire ranking.
+        """
+        print('Combined scoreboard for track %s across the tournaments of season %s, by round reached' %
+              (gender, self.name))
+        tournaments = sorted(self.tournaments, key=lambda pair: pair[0])
+        scoreboards = [(name, tournament.get_track(gender).scoreboard) for name, tournament in tournaments]
+        print_combined_page(scoreboards, lambda stats: stats.round_achieved, page,
+                            lambda stats: 'won' if stats.round_achieved > MAX_ROUNDS else
+                            'reached round %d' % stats.round_achieved)
+
+
+def print_ranked_page(scoreboard, page=None):
+    """Prints a page of a ranked scoreboard tree. Only the players on the
+    requested page are visited.
+
+    :param scoreboard: The scoreboard tree, ordered by points.
+    :param page: The page to print, starting from 1, or None to print the
+                 entire scoreboard.
+    """
+    if page is None:
+        start = 0
+        entries = iter(scoreboard)
+    else:
+        start = (page - 1) * SCOREBOARD_PAGE_SIZE
+        entries = scoreboard.iter_from_rank(start)
+
+    rank = start + 1
+    for points, stats in entries:
+        if page is not None and rank > start + SCOREBOARD_PAGE_SIZE:
+            break
+        print('#%d. %s at %.2f points' % (rank, stats.player.name, stats.points))
+        rank += 1
+
+
+def print_combined_page(scoreboards, key, page=None, describe=None):
+    """Prints a page of a ranking combining many scoreboards, each already
+    ordered from first to last. The scoreboards are merged lazily, so only the
+    players up to the requested page are visited.
+
+    :param scoreboards: The (scope, scoreboard) pairs, each scoreboard giving
+                        player statistics from first to last.
+    :param key: Gets the key of player statistics, with the highest first.
+    :param page: The page to print, starting from 1, or None to print the
+                 entire ranking.
+    :param describe: Describes the result of player statistics before their
+                     points, or None to show their points alone.
+    """
+    start = 0 if page is None else (page - 1) * SCOREBOARD_PAGE_SIZE
+    limit = None if page is None else start + SCOREBOARD_PAGE_SIZE
+    entries = merge_sorted([label_stats(scope, scoreboard) for scope, scoreboard in scoreboards],
+                           lambda entry: key(entry[1]), limit, True)
+    rank = 1
+
+    for scope, stats in entries:
+        if rank > start and describe is None:
+            print('#%d. %s in %s at %.2f points' % (rank, stats.player.name, scope, stats.points))
+        elif rank > start:
+            print('#%d. %s in %s %s at %.2f points' % (rank, stats.player.name, scope, describe(stats), stats.points))
+        rank += 1
+
+
+def label_stats(scope, scoreboard):
+    """Labels each player statistics of a scoreboard with its scope.
+
+    :param scope: The name of the season or tournament of the scoreboard.
+    :param scoreboard: The player statistics of the scoreboard.
+    :return: The iterator of (scope, player statistics) pairs.
+    """
+    for stats in scoreboard:
+        yield scope, stats
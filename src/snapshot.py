@@ -0,0 +1,343 @@
+#!/usr/bin/env python
+
+"""
+
+Saves and restores the entire state of a circuit to a single binary file, so
+that it may be restored without parsing or sorting anything. Seasons are held
+in separate sections, each restored only once its season is used.
+
+"""
+
+import os
+import pickle
+import struct
+
+from circuit import Circuit
+from config import get_forfeit_score, get_scoreboard_tree, get_winning_score
+from hash_table import HashTable
+from linked_list import List
+from match import Track
+from player import CircuitStats, Player, SeasonStats, TournamentStats
+from season import Season
+from tournament import Tournament, TournamentType
+
+# The bytes every snapshot file starts with.
+SNAPSHOT_MAGIC = b'TENNIS'
+
+# The version of the snapshot format, bumped whenever the records change.
+SNAPSHOT_VERSION = 3
+
+# The header of a snapshot file, holding the magic bytes, the version and the
+# offset of the season index.
+SNAPSHOT_HEADER = struct.Struct('>6sHQ')
+
+
+class SnapshotSection:
+    """The section of a snapshot file holding a season, which restores the
+    season when called. Used as the loader of seasons restored from snapshots.
+
+    Attributes:
+        data: The bytes of the whole snapshot file, held in memory so the file
+              may be closed straight away and replaced by a newer save.
+        start: The offset of the section within the file.
+        end: The offset just past the end of the section.
+    """
+
+    def __init__(self, data, start, end):
+        self.data = data
+        self.start = start
+        self.end = end
+
+    def __call__(self, season: Season):
+        """Restores the statistics, scoreboards and tournaments of a season
+        from this section.
+
+        :param season: The season to restore.
+        """
+        try:
+            restore_season(season, pickle.loads(self.read()))
+        except (EOFError, pickle.UnpicklingError) as error:
+            raise ValueError('Snapshot section for season %s is corrupt: %s' % (season.name, error))
+
+    def read(self):
+        """Reads the raw bytes of this section.
+
+        :return: The bytes of the section.
+        """
+        return memoryview(self.data)[self.start:self.end]
+
+
+def save_snapshot(circuit: Circuit, filename):
+    """Saves the whole circuit to a snapshot file. The file is written under a
+    temporary name first, then moved into place, so an interrupted save never
+    leaves a partial snapshot behind.
+
+    The file holds a header, followed by a section for the circuit, a section
+    for each season in order, then an index of the season sections. Each
+    section is a pickle of records made only of names and numbers, with every
+    scoreboard written in ranked order. Seasons not in memory which were
+    restored from a snapshot have their section copied as is.
+
+    :param circuit: The circuit to save.
+    :param filename: The file to save to.
+    """
+    directory = os.path.dirname(filename)
+
+    if directory != '' and not os.path.exists(directory):
+        os.makedirs(directory)
+
+    temporary_filename = filename + '.tmp'
+
+    with open(temporary_filename, 'wb') as the_file:
+        the_file.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0))
+        pickle.dump(snapshot_circuit(circuit), the_file, pickle.HIGHEST_PROTOCOL)
+        sections = List()
+
+        for season in circuit.ordered_seasons:
+            start = the_file.tell()
+
+            if not season.loaded and isinstance(season.loader, SnapshotSection):
+                the_file.write(season.loader.read())
+            else:
+                pickle.dump(snapshot_season(season), the_file, pickle.HIGHEST_PROTOCOL)
+
+            sections.append((season.name, season.complete, start, the_file.tell()))
+
+        index = the_file.tell()
+        pickle.dump(tuple(sections), the_file, pickle.HIGHEST_PROTOCOL)
+        the_file.seek(0)
+        the_file.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, index))
+
+    os.replace(temporary_filename, filename)
+
+
+def load_snapshot(filename):
+    """Restores a circuit from a snapshot file. Only the circuit and its
+    players are restored straight away, with each season restored from its
+    section once used.
+
+    :param filename: The file to restore from.
+    :return: The restored circuit.
+    """
+    # Every section is read now, so that no file is left open for a later
+    # save to replace, which some platforms do not allow.
+    with open(filename, 'rb') as the_file:
+        data = the_file.read()
+
+    header = data[:SNAPSHOT_HEADER.size]
+
+    if len(header) != SNAPSHOT_HEADER.size:
+        raise ValueError('Snapshot %s is truncated' % filename)
+
+    magic, version, index = SNAPSHOT_HEADER.unpack(header)
+
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError('%s is not a snapshot' % filename)
+
+    if version != SNAPSHOT_VERSION:
+        raise ValueError('Snapshot %s has unsupported version %d' % (filename, version))
+
+    try:
+        circuit = restore_circuit(pickle.loads(memoryview(data)[SNAPSHOT_HEADER.size:]))
+        sections = pickle.loads(memoryview(data)[index:])
+    except (EOFError, pickle.UnpicklingError) as error:
+        raise ValueError('Snapshot %s is corrupt: %s' % (filename, error))
+
+    season = None
+
+    for name, complete, start, end in sections:
+        season = Season(circuit, season, name, complete, loader=SnapshotSection(data, start, end))
+        circuit.seasons.insert(name, season)
+        circuit.ordered_seasons.append(season)
+        circuit.current_season = season
+
+    return circuit
+
+
+def snapshot_scores(scores):
+    """Flattens score mappings into a record.
+
+    :param scores: The score counts, mapped by (our score, opponent score).
+    :return: The tuple of (our score, opponent score, count) records.
+    """
+    return tuple((our_score, opponent_score, count) for (our_score, opponent_score), count in scores)
+
+
+def restore_scores(records):
+    """Restores score mappings from a record.
+
+    :param records: The tuple of (our score, opponent score, count) records.
+    :return: The score counts, mapped by (our score, opponent score).
+    """
+    return HashTable.from_pairs(((our_score, opponent_score), count) for our_score, opponent_score, count in records)
+
+
+def snapshot_circuit(circuit: Circuit):
+    """Flattens the circuit configuration and its players into a record.
+
+    :param circuit: The circuit to flatten.
+    :return: The circuit record.
+    """
+    tournament_types = tuple((name, tournament_type.difficulty, tuple(tournament_type.prizes))
+                             for name, tournament_type in circuit.tournament_types)
+    players = tuple(tuple((stats.player.name, stats.player.player_id, stats.wins, stats.losses, stats.points,
+                           snapshot_scores(stats.scores))
+                          for points, stats in circuit.get_scoreboard(gender))
+                    for gender in ('men', 'women'))
+    return tournament_types, tuple(circuit.ranking_points), players
+
+
+def restore_circuit(record):
+    """Restores a circuit and its players from a record.
+
+    :param record: The circuit record.
+    :return: The restored circuit, without any seasons.
+    """
+    tournament_types, ranking_points, players = record
+    circuit = Circuit()
+
+    for name, difficulty, prizes in tournament_types:
+        circuit.tournament_types.insert(name, TournamentType(name, HashTable.from_pairs(prizes), difficulty))
+
+    for points in ranking_points:
+        circuit.ranking_points.append(points)
+
+    circuit.men_scoreboard = restore_players(circuit.men, players[0])
+    circuit.women_scoreboard = restore_players(circuit.women, players[1])
+    return circuit
+
+
+def restore_players(profiles, records):
+    """Restores the players of one gender, along with their circuit scoreboard.
+
+    :param profiles: The player mappings to restore into.
+    :param records: The player records, in ranked order.
+    :return: The circuit scoreboard for these players.
+    """
+    pairs = List()
+
+    for name, player_id, wins, losses, points, scores in records:
+        player = Player(name, player_id=player_id)
+        player.stats = CircuitStats(player, wins, losses, points)
+        player.stats.scores = restore_scores(scores)
+        profiles.insert(name, player)
+        pairs.append((points, player.stats))
+
+    # Players were saved in ranked order, so need no sorting.
+    return get_scoreboard_tree().from_sorted(pairs, lambda a, b: b - a)
+
+
+def snapshot_season(season: Season):
+    """Flattens a season and all of its tournaments into a record.
+
+    :param season: The season to flatten.
+    :return: The season record.
+    """
+    stats = tuple(tuple((stats.player.name, stats.points, stats.wins, stats.losses, snapshot_scores(stats.scores))
+                        for points, stats in season.get_scoreboard(gender))
+                  for gender in ('men', 'women'))
+    tournaments = tuple((name, tournament.complete, snapshot_track(tournament.men_track),
+                         snapshot_track(tournament.women_track))
+                        for name, tournament in season.tournaments)
+    return season.name, season.complete, stats, tournaments
+
+
+def restore_season(season: Season, record):
+    """Restores the statistics, scoreboards and tournaments of a season from
+    a record.
+
+    :param season: The season to restore.
+    :param record: The season record.
+    """
+    name, complete, stats, tournaments = record
+    circuit = season.circuit
+    season.men_stats, season.men_scoreboard = restore_season_stats(circuit.men, season.name, stats[0])
+    season.women_stats, season.women_scoreboard = restore_season_stats(circuit.women, season.name, stats[1])
+    season.tournaments = HashTable()
+
+    for tournament_name, tournament_complete, men_track, women_track in tournaments:
+        tournament_type = circuit.tournament_types.find(tournament_name)
+        tournament = Tournament(season, tournament_type, tournament_complete)
+        tournament.men_track = restore_track(tournament, 'men', men_track)
+        tournament.women_track = restore_track(tournament, 'women', women_track)
+        season.tournaments.insert(tournament_name, tournament)
+
+
+def restore_season_stats(profiles, season_name, records):
+    """Restores the player statistics of one gender for a season, along with
+    its scoreboard.
+
+    :param profiles: The player circuit profiles of this gender.
+    :param season_name: The name of the season.
+    :param records: The season statistics records, in ranked order.
+    :return: The player season statistic mappings, and the scoreboard.
+    """
+    target = HashTable.with_capacity(len(records))
+    pairs = List()
+
+    for player_name, points, wins, losses, scores in records:
+        player: Player = profiles.find(player_name)
+        stats = SeasonStats(player, player.stats, points, wins, losses)
+        stats.scores = restore_scores(scores)
+        player.stats.season_stats.insert(season_name, stats)
+        target.insert(player_name, stats)
+        pairs.append((points, stats))
+
+    # Statistics were saved in ranked order, so need no sorting.
+    return target, get_scoreboard_tree().from_sorted(pairs, lambda a, b: b - a)
+
+
+def snapshot_track(track: Track):
+    """Flattens a track into a record.
+
+    :param track: The track to flatten.
+    :return: The track record.
+    """
+    stats = tuple((name, stats.round_achieved, stats.multiplier, stats.points, stats.wins, stats.losses,
+                   snapshot_scores(stats.scores), tuple(stats.opponent_scores))
+                  for name, stats in track.stats)
+    remaining = tuple(name for name, stats in track.remaining)
+    scoreboard = tuple(stats.player.name for stats in track.scoreboard)
+    return track.round, stats, remaining, scoreboard
+
+
+def restore_track(tournament: Tournament, gender, record):
+    """Restores a track from a record.
+
+    :param tournament: The tournament the track is part of.
+    :param gender: The gender of players on this track.
+    :param record: The track record.
+    :return: The restored track.
+    """
+    track_round, stats_records, remaining_names, scoreboard_names = record
+    season_stats = tournament.season.get_stats(gender)
+    stats = HashTable.with_capacity(len(stats_records))
+
+    for name, round_achieved, multiplier, points, wins, losses, scores, opponent_scores in stats_records:
+        player_season_stats: SeasonStats = season_stats.find(name)
+        tournament_stats = TournamentStats(player_season_stats.player, player_season_stats, round_achieved,
+                                           multiplier, points, wins, losses)
+        tournament_stats.scores = restore_scores(scores)
+
+        for score in opponent_scores:
+            tournament_stats.opponent_scores.append(score)
+
+        player_season_stats.tournament_stats.insert(tournament.type.name, tournament_stats)
+        stats.insert(name, tournament_stats)
+
+    remaining = HashTable.with_capacity(len(remaining_names))
+
+    for name in remaining_names:
+        remaining.insert(name, stats.find(name))
+
+    # Complete scoreboards are arrays, while those still being played are
+    # linked lists, as when loaded from CSV.
+    if tournament.complete:
+        scoreboard = [stats.find(name) for name in scoreboard_names]
+    else:
+        scoreboard = List()
+        for name in scoreboard_names:
+            scoreboard.append(stats.find(name))
+
+    return Track(gender, track_round, stats, remaining, get_winning_score(gender), get_forfeit_score(gender),
+                 scoreboard, tournament)
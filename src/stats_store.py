@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+
+"""
+
+A memory-mapped, columnar on-disk store for the numeric statistics of players,
+where each row belongs to the player with the same dense id.
+
+"""
+
+import mmap
+import os
+import struct
+from array import array
+
+from hash_table import HashTable
+
+# The bytes every column file starts with.
+COLUMNS_MAGIC = b'STATCOLS'
+
+# The version of the column file format.
+COLUMNS_VERSION = 1
+
+# The header of a column file, holding the magic bytes, version and row count.
+COLUMNS_HEADER = struct.Struct('>8sHQ')
+
+# The number of bytes reserved for the header, keeping every column aligned.
+COLUMNS_OFFSET = 64
+
+# The name and type code of every column, each 8 bytes wide.
+COLUMNS = (('points', 'd'), ('wins', 'q'), ('losses', 'q'), ('round_achieved', 'q'), ('multiplier', 'd'))
+
+# The width in bytes of a single value in any column.
+COLUMN_WIDTH = 8
+
+
+class StatsColumns:
+    """The statistics of every player for one scope, such as a season or
+    tournament track, stored as fixed-width columns in a memory-mapped file.
+
+    Columns are mapped copy-on-write, so only pages that are read get loaded,
+    and changes stay in memory until saved. The file therefore always matches
+    the last save, never a partially played session.
+
+    Attributes:
+        filename: The file the columns are mapped from.
+        rows: The number of rows, one per player.
+        created: True if the file did not exist or was unusable, so its rows
+                 hold defaults rather than saved statistics.
+        points: The points column.
+        wins: The wins column.
+        losses: The losses column.
+        round_achieved: The round achieved column.
+        multiplier: The multiplier column.
+    """
+
+    __slots__ = ('filename', 'rows', 'created', 'points', 'wins', 'losses', 'round_achieved', 'multiplier', '_file',
+                 '_map')
+
+    def __init__(self, filename, rows, reset=False):
+        """Opens the columns of a file, creating the file if required.
+
+        :param filename: The file to map.
+        :param rows: The number of rows the columns must have.
+        :param reset: Whether to replace any existing file with default rows.
+        """
+        self.filename = filename
+        self.rows = rows
+        self.created = reset or not self.__is_valid(filename, rows)
+
+        if self.created:
+            directory = os.path.dirname(filename)
+
+            if directory != '' and not os.path.exists(directory):
+                os.makedirs(directory)
+
+            with open(filename, 'wb') as the_file:
+                the_file.write(COLUMNS_HEADER.pack(COLUMNS_MAGIC, COLUMNS_VERSION, rows))
+                the_file.truncate(COLUMNS_OFFSET + rows * COLUMN_WIDTH * len(COLUMNS))
+
+        self._file = open(filename, 'r+b')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_COPY)
+        view = memoryview(self._map)
+
+        for i in range(0, len(COLUMNS)):
+            name, code = COLUMNS[i]
+            start = COLUMNS_OFFSET + i * rows * COLUMN_WIDTH
+            setattr(self, name, view[start:start + rows * COLUMN_WIDTH].cast(code))
+
+        view.release()
+
+        # Players start each tournament in the first round with no multiplier.
+        if self.created and rows > 0:
+            self.round_achieved[:] = array('q', [1]) * rows
+            self.multiplier[:] = array('d', [1.0]) * rows
+
+    @staticmethod
+    def __is_valid(filename, rows):
+        """Checks whether a file holds columns of the expected size.
+
+        :param filename: The file to check.
+        :param rows: The number of rows the columns must have.
+        :return: True if the file can be mapped, otherwise False.
+        """
+        if not os.path.isfile(filename):
+            return False
+
+        if os.path.getsize(filename) != COLUMNS_OFFSET + rows * COLUMN_WIDTH * len(COLUMNS):
+            return False
+
+        with open(filename, 'rb') as the_file:
+            header = the_file.read(COLUMNS_HEADER.size)
+
+        return header == COLUMNS_HEADER.pack(COLUMNS_MAGIC, COLUMNS_VERSION, rows)
+
+    def save(self):
+        """Writes every column back to the file.
+
+        :return: None
+        """
+        self._file.seek(COLUMNS_OFFSET)
+
+        for name, code in COLUMNS:
+            self._file.write(getattr(self, name))
+
+        self._file.flush()
+        self.created = False
+
+    def detach(self):
+        """Copies every column into memory, then releases the mapping and
+        closes the file, so that statistics views still holding these columns
+        keep working once the file is replaced. Detached columns are never
+        saved.
+
+        :return: None
+        """
+        for name, code in COLUMNS:
+            column = getattr(self, name)
+            setattr(self, name, array(code, column.tobytes()))
+            column.release()
+
+        self._map.close()
+        self._file.close()
+
+    def close(self):
+        """Releases the columns and closes the file, discarding unsaved changes.
+
+        :return: None
+        """
+        for name, code in COLUMNS:
+            getattr(self, name).release()
+
+        self._map.close()
+        self._file.close()
+
+
+class StatsStore:
+    """A directory of statistics columns, one file per scope and gender.
+
+    Attributes:
+        directory: The directory holding all column files.
+        _columns: The opened columns, mapped by file name.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._columns = HashTable()
+
+    def columns(self, scope, gender, rows, reset=False):
+        """Opens the columns for the players of a gender within a scope.
+
+        :param scope: The path of the scope, such as the season name followed
+                      by the tournament name.
+        :param gender: The gender of the players.
+        :param rows: The number of players of this gender.
+        :param reset: Whether the scope is new, so any existing file should be
+                      replaced with default rows.
+        :return: The opened columns.
+        """
+        filename = os.path.join(self.directory, *scope, '%s.columns' % gender)
+        columns = self._columns.find(filename)
+
+        # Views of the statistics may still hold replaced columns, so they are
+        # detached rather than closed.
+        if columns is not None:
+            if not reset and columns.rows == rows:
+                return columns
+            columns.detach()
+
+        columns = StatsColumns(filename, rows, reset)
+        self._columns.insert(filename, columns)
+        return columns
+
+    def save(self, changed=True):
+        """Writes opened sets of columns back to their files. Columns created
+        this session are always written, as until then their files hold only
+        defaults, which the next session would trust.
+
+        :param changed: Whether any statistics changed since the last save, so
+                        every opened set of columns must be written.
+        :return: None
+        """
+        for filename, columns in self._columns:
+            if changed or columns.created:
+                columns.save()
+
+    def close(self):
+        """Closes every opened set of columns, discarding unsaved changes.
+
+        :return: None
+        """
+        for filename, columns in self._columns:
+            columns.close()
+
+        self._columns = HashTable()
@@ -1,10 +1,11 @@
 import math
 
-from config import MAX_ROUNDS, apply_multiplier, get_multiplier, MAX_PLAYERS
+from config import MAX_ROUNDS, apply_multiplier, MAX_PLAYERS, SCOREBOARD_PAGE_SIZE
 from hash_table import HashTable
 from linked_list import List
 from match import Track, Match
 from player import TournamentStats
+from points import compute_points
 from ranked_tree import Tree
 from user_input import next_gender, next_bool, next_input_type, FILE, next_string, MALE
 
@@ -31,20 +32,29 @@ class Tournament:
     Attributes:
         type: The type of tournament this is.
         season: The season this tournament was held in.
-        previous: The same type of tournament held last season.
         complete: True when the tournament is complete.
         men_track: The men's track for this tournament.
         women_track: The women's track for this tournament.
     """
 
-    def __init__(self, season, tournament_type: TournamentType, previous, complete):
+    def __init__(self, season, tournament_type: TournamentType, complete):
         self.type = tournament_type
         self.season = season
-        self.previous = previous
         self.complete = complete
         self.men_track: Track = None
         self.women_track: Track = None
 
+    @property
+    def previous(self):
+        """The same type of tournament held last season, or None if there is
+        none. Found when used, so the previous season is only loaded when
+        required.
+        """
+        if self.season.previous is None:
+            return None
+
+        return self.season.previous.tournaments.find(self.type.name)
+
     def run(self):
         """Runs the tournament."""
         if self.complete:
@@ -59,8 +69,7 @@ class Tournament:
             track = self.men_track if gender == MALE else self.women_track
             self.play_round(track)
 
-            if self.men_track.round > MAX_ROUNDS and self.women_track.round > MAX_ROUNDS:
-                self.complete = True
+            if self.complete:
                 print("Tournament is complete")
                 return
 
@@ -98,25 +107,12 @@ class Tournament:
             # Find the winner and add them to the next batch.
             winner, winner_score, loser, loser_score = match.run(track.winning_score, track.remaining)
             winners.insert(winner.player.name, winner)
-            winner: TournamentStats = winner
-            loser: TournamentStats = loser
-
-            # Update the winner profile.
-            winner.win()
-            winner.add_score(winner_score, loser_score)
-
-            # Update the loser profile.
-            loser.loss()
-            loser.add_score(loser_score, winner_score)
-
-            apply_multiplier(track.name, winner, loser_score)
-            self.update_points(loser, track)
+            self.apply_match(track, winner, winner_score, loser, loser_score)
 
         if track.round == MAX_ROUNDS:
             print('Tournament %s successfully complete for the %s\'s track' % (self.type.name, track.name))
             print('Winner for the final round: %s' % winner.player.name)
-            track.round += 1
-            self.update_points(winner, track)
+            self.complete_round(track, winners, winner)
             self.print_scoreboard(track.name)
             return
 
@@ -125,8 +121,72 @@ class Tournament:
         for name, stats in winners:
             print('- %s' % name)
 
-        track.remaining = winners
-        track.round += 1
+        self.complete_round(track, winners, winner)
+
+    def apply_match(self, track: Track, winner: TournamentStats, winner_score, loser: TournamentStats, loser_score):
+        """Applies the result of a match to the statistics of both players,
+        and records it in the circuit journal.
+
+        :param track: The track the match was played in.
+        :param winner: The winners statistics profile for this tournament.
+        :param winner_score: The winners score.
+        :param loser: The losers statistics profile for this tournament.
+        :param loser_score: The losers score.
+        """
+        # The match changes the track, along with the season and circuit
+        # statistics of its players.
+        track.dirty = True
+        self.season.dirty = True
+        self.season.circuit.dirty = True
+
+        # Update the winner profile.
+        winner.win()
+        winner.add_score(winner_score, loser_score)
+
+        # Update the loser profile.
+        loser.loss()
+        loser.add_score(loser_score, winner_score)
+
+        apply_multiplier(track.name, winner, loser_score)
+
+        # The loser is scored along with every other loser once the round is complete.
+        track.losers.append(loser)
+
+        journal = self.season.circuit.journal
+
+        if journal is not None:
+            journal.write(('match', self.season.name, self.type.name, track.name, track.round, winner.player.name,
+                           winner_score, loser.player.name, loser_score))
+
+    def complete_round(self, track: Track, winners, winner: TournamentStats):
+        """Completes the current round of a track once all of its matches have
+        been applied, moving the winners on to the next round. Completes the
+        tournament once both tracks have played their final round.
+
+        :param track: The track that played this round.
+        :param winners: The winners statistics profiles, mapped by name.
+        :param winner: The winner of the last match played this round.
+        """
+        track_round = track.round
+        self.update_points(track.losers, track)
+        track.losers = List()
+
+        if track_round == MAX_ROUNDS:
+            track.round += 1
+            self.update_points((winner,), track)
+        else:
+            track.remaining = winners
+            track.round += 1
+
+        if self.men_track.round > MAX_ROUNDS and self.women_track.round > MAX_ROUNDS:
+            self.complete = True
+            self.season.dirty = True
+
+        # The round record commits every match record of this round.
+        journal = self.season.circuit.journal
+
+        if journal is not None:
+            journal.commit(('round', self.season.name, self.type.name, track.name, track_round))
 
     @staticmethod
     def seed_manual(track, matches):
@@ -142,17 +202,25 @@ class Tournament:
 
     def seed_file(self, track):
         """Creates a round of matches, filled in by the contents of a file.
+        The file is read in full before any match is played, and asked for
+        again if it can not be read, so an invalid file leaves the track
+        untouched.
 
         :param track: The track that should be played for this round.
         :return: The matches loaded from file.
         """
+        from loader import load_round, round_file
+
         # Get the file to load the round data from.
-        default_round_file = '../resources/%s/%s/%s/round_%d.csv' % \
-                             (self.season.name, self.type.name.lower(), track.name, track.round)
-        round_file = next_string('Enter file for round %d' % track.round, default_round_file)
-        from loader import load_round
-        matches = load_round(round_file, track)
-        return matches
+        default_round_file = round_file(self.season.name, self.type.name, track.name, track.round)
+
+        while True:
+            filename = next_string('Enter file for round %d' % track.round, default_round_file)
+
+            try:
+                return load_round(filename, track)
+            except (OSError, ValueError) as error:
+                print('The round could not be loaded: %s' % error)
 
     @staticmethod
     def seed_automatic_first(track, matches):
@@ -163,10 +231,8 @@ class Tournament:
         :param track: The track that should be played for this round.
         :param matches: The matches collection to load in.
         """
-        front_iterator = iter(track.previous_season_scoreboard)
-        back_iterator = iter(track.previous_season_scoreboard)
-        for i in range(0, int(MAX_PLAYERS / 2)):
-            next(back_iterator)
+        front_iterator = track.previous_season_scoreboard.iter_from_rank(0)
+        back_iterator = track.previous_season_scoreboard.iter_from_rank(int(MAX_PLAYERS / 2))
         for i in range(0, int(MAX_PLAYERS / 2)):
             player_a = next(front_iterator)[1].player.name
             player_b = next(back_iterator)[1].player.name
@@ -210,47 +276,53 @@ class Tournament:
                 match = Match(track, player_a=player_a, player_b=player_b)
                 matches.append(match)
 
-    def update_points(self, stats: TournamentStats, track: Track):
-        """Updates the points of a players stats once they've either lost the
-        tournament, or the tournament has been complete.
+    def update_points(self, players, track: Track):
+        """Updates the points of players once they've either lost the
+        tournament, or the tournament has been complete. All the players are
+        scored together, then moved on both scoreboards.
 
-        :param stats: The players statistics profile for this tournament.
-        :param track: The track the player is in.
+        :param players: The players statistics profiles for this tournament.
+        :param track: The track the players are in.
         """
-        total_points = 0
-        ranking_points_iterator = iter(self.season.circuit.ranking_points)
-        opponent_scores_iterator = iter(stats.opponent_scores)
-        previous = track.previous_stats
+        players = list(players)
+        all_points = self.score_players(track, players, [track.round] * len(players))
+        circuit_scoreboard: Tree = self.season.circuit.get_scoreboard(track.name)
+        season_scoreboard: Tree = self.season.get_scoreboard(track.name)
 
-        for i in range(0, max(0, track.round - 1)):
-            points = next(ranking_points_iterator)
-            loser_score = next(opponent_scores_iterator)
+        for stats, total_points in zip(players, all_points):
+            circuit_points = stats.season.circuit.points
+            season_points = stats.season.points
+            stats.add_points(total_points)
 
-            # Do not add semi-finals score to the winner.
-            if track.round > MAX_ROUNDS and i == (MAX_ROUNDS - 2):
-                continue
+            # Move the player to their new position on both scoreboards.
+            circuit_scoreboard.update_key(circuit_points, stats.season.circuit.points, stats.season.circuit)
+            season_scoreboard.update_key(season_points, stats.season.points, stats.season)
+            track.scoreboard.append_front(stats)
 
-            # Do not apply multiplier for semi-finals scores.
-            if track.round == MAX_ROUNDS and i == (MAX_ROUNDS - 2):
-                multiplier = 1.0
-            else:
-                multiplier = get_multiplier(track.name, loser_score)
+    def score_players(self, track: Track, players, rounds):
+        """Computes the points of players of a track, without applying them.
+
+        :param track: The track the players are in.
+        :param players: The players statistics profiles for this tournament.
+        :param rounds: The round each player is scored at, which is the round
+                       they lost, or one beyond the final for the winner.
+        :return: The points of each player.
+        """
+        previous = track.previous_stats
+        opponent_scores = []
+        difficulties = []
 
-            total_points += points * multiplier
+        for stats, track_round in zip(players, rounds):
+            opponent_scores.append(stats.opponent_scores)
 
-        # Do not apply difficulty factor if player has not achieved at last as
-        # much as the previous season.
-        if previous is None or previous.find(stats.player.name).round_achieved >= track.round:
-            total_points *= self.type.difficulty
+            # Do not apply difficulty factor if player has not achieved at last
+            # as much as the previous season.
+            if previous is None or previous.find(stats.player.name).round_achieved >= track_round:
+                difficulties.append(self.type.difficulty)
+            else:
+                difficulties.append(None)
 
-        circuit_scoreboard: Tree = self.season.circuit.get_scoreboard(track.name)
-        circuit_scoreboard.delete(stats.season.circuit.points, stats.season.circuit)
-        season_scoreboard: Tree = self.season.get_scoreboard(track.name)
-        season_scoreboard.delete(stats.season.points, stats.season)
-        stats.add_points(total_points)
-        circuit_scoreboard.insert(stats.season.circuit.points, stats.season.circuit)
-        season_scoreboard.insert(stats.season.points, stats.season)
-        track.scoreboard.append_front(stats)
+        return compute_points(track.name, rounds, opponent_scores, self.season.circuit.ranking_points, difficulties)
 
     def get_track(self, gender):
         """Gets the track of this tournament for a gender.
@@ -260,10 +332,12 @@ class Tournament:
         """
         return self.men_track if gender == 'men' else self.women_track
 
-    def print_scoreboard(self, gender):
+    def print_scoreboard(self, gender, page=None):
         """Prints a scoreboard for a track of this tournament.
 
         :param gender: The gender of the track.
+        :param page: The page of the scoreboard to print, or None to print the
+                     entire scoreboard.
         """
         track: Track = self.get_track(gender)
 
@@ -273,8 +347,14 @@ class Tournament:
 
         print('Scoreboard for track %s in tournament %s' % (track.name, self.type.name))
         rank = 1
+        start = 0 if page is None else (page - 1) * SCOREBOARD_PAGE_SIZE
 
         for stats in track.scoreboard:
+            if rank <= start:
+                rank += 1
+                continue
+            if page is not None and rank > start + SCOREBOARD_PAGE_SIZE:
+                break
             prize = self.type.prizes.find(rank, '0')
             print('#%d. %s at %.2f points wins £%s' % (rank, stats.player.name, stats.points, prize))
             rank += 1